@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# random access into an FFNContentArchive written by export_story_content.py
+#   ./bench_content_archive.py dir [count]
+# reads count chapters picked at random from the index, then every chapter
+# of as many random fics
+import sys
+import time
+import random
+from minerva import FFNContentArchive
+
+def main() -> int:
+	if len(sys.argv) not in {2, 3}:
+		print(f"usage: {sys.argv[0]} dir [count]")
+		return 1
+	archive = FFNContentArchive(sys.argv[1])
+	count = int(sys.argv[2]) if len(sys.argv) == 3 else 10000
+	if len(archive) == 0:
+		print("empty archive")
+		return 1
+	keys = [archive.record(random.randrange(len(archive)))[:2]
+			for _ in range(count)]
+	print(f"{len(archive)} chapters, watermark {archive.watermark}")
+
+	size = 0
+	start = time.perf_counter()
+	for fid, cid in keys:
+		c = archive.get(fid, cid)
+		assert(c is not None and c.content is not None)
+		size += len(c.content)
+	took = time.perf_counter() - start
+	print(f"get:   {count / took:.0f} chapters/s, {took / count * 1e6:.1f}us each, "
+			+ f"{size / took / 1e6:.1f} MB/s")
+
+	size, chapters = 0, 0
+	start = time.perf_counter()
+	for fid, _ in keys:
+		for c in archive.fetch(fid):
+			assert(c.content is not None)
+			size += len(c.content)
+			chapters += 1
+	took = time.perf_counter() - start
+	print(f"fetch: {count / took:.0f} fics/s, {chapters / took:.0f} chapters/s, "
+			+ f"{size / took / 1e6:.1f} MB/s")
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# compression ratio and encode/decode speed of FFNFicContent codecs
+#   ./bench_content_codec.py [rounds]                chapters from ./corpus/
+#   ./bench_content_codec.py [rounds] stripe|main n  n rows sampled from the db
+# codecs are trained on every other chapter and measured on the rest, one
+# chapter at a time like rows are stored
+import os
+import sys
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+from oil.util import compress, uncompress
+from minerva import FFNContentCodec
+from minerva.ffn.content_codec import defaultLevels, haveZstd, zlibKind, \
+		zstdKind
+from process_story_content import extractContent
+
+corpusDirs = ['./corpus/ffn/chapter/', './corpus/ffn/story/',
+		'./corpus/htmlview/']
+
+def loadCorpus() -> List[bytes]:
+	chapters: List[bytes] = []
+	for d in corpusDirs:
+		for fname in sorted(os.listdir(d)):
+			if not fname.endswith('.html'):
+				continue
+			with open(os.path.join(d, fname)) as f:
+				html = f.read()
+			# stored content is what process_story_content extracts
+			if d != corpusDirs[-1]:
+				try:
+					html = extractContent(html)
+				except Exception:
+					continue
+			chapters += [html.encode('utf-8')]
+	return chapters
+
+def loadDb(stripe: Optional[int], count: int) -> List[bytes]:
+	from oil import oil
+	from minerva import FFNFicContent
+	with oil.open() as db:
+		return [c.content for c in FFNFicContent.sample(db, count, stripe)
+				if c.content is not None]
+
+def codecs(train: List[bytes]
+		) -> Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+	res: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+		'oil.util.compress': (compress, uncompress),
+		# the same level without a dictionary, to show what the dictionary buys
+		zlibKind: (lambda c: zlib.compress(c, defaultLevels[zlibKind]),
+			zlib.decompress),
+	}
+	codec = FFNContentCodec.build(train, zlibKind)
+	res[f'{zlibKind}+dict'] = (codec.compress, codec.decompress)
+	if haveZstd():
+		import zstandard # type: ignore
+		res[zstdKind] = (
+				zstandard.ZstdCompressor(level = defaultLevels[zstdKind]).compress,
+				zstandard.ZstdDecompressor().decompress)
+		codec = FFNContentCodec.build(train, zstdKind)
+		res[f'{zstdKind}+dict'] = (codec.compress, codec.decompress)
+	return res
+
+def main() -> int:
+	args = sys.argv[1:]
+	rounds = int(args[0]) if len(args) > 0 else 5
+	if len(args) == 3:
+		chapters = loadDb(None if args[1] == 'main' else int(args[1]),
+				int(args[2]))
+	else:
+		chapters = loadCorpus()
+	train, test = chapters[0::2], chapters[1::2]
+	raw = sum(len(c) for c in test)
+	print(f"{len(train)} chapters to train on, {len(test)} to measure "
+			+ f"({raw} bytes)")
+
+	print(f"{'codec':<20} {'ratio':>7} {'enc MB/s':>9} {'dec MB/s':>9}")
+	for name, (enc, dec) in codecs(train).items():
+		packed = [enc(c) for c in test]
+		if [dec(p) for p in packed] != test:
+			print(f"{name}: round trip failed")
+			return 1
+		start = time.perf_counter()
+		for _ in range(rounds):
+			for c in test:
+				enc(c)
+		encTime = time.perf_counter() - start
+		start = time.perf_counter()
+		for _ in range(rounds):
+			for p in packed:
+				dec(p)
+		decTime = time.perf_counter() - start
+		mb = raw * rounds / 1e6
+		print(f"{name:<20} {sum(map(len, packed)) / raw:>7.3f} "
+				+ f"{mb / encTime:>9.1f} {mb / decTime:>9.1f}")
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
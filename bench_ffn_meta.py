@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# compare meta span parsing throughput against the old per-field regex scan
+import os
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from bs4 import BeautifulSoup # type: ignore
+from minerva.ffn.meta import FFNMetaSpan, genres
+
+corpusDir = './corpus/ffn/'
+
+def loadSpans() -> List[Tuple[str, str, str]]:
+	spans: List[Tuple[str, str, str]] = []
+	for kind in ['story', 'zlist']:
+		d = os.path.join(corpusDir, kind)
+		for fname in sorted(os.listdir(d)):
+			with open(os.path.join(d, fname)) as f:
+				soup = BeautifulSoup(f.read(), 'html5lib')
+			found: List[Any] = []
+			if kind == 'story':
+				profile_top = soup.find(id='profile_top')
+				if profile_top is not None:
+					found = [profile_top.find('span', { 'class': 'xgray' })]
+			else:
+				found = list(soup.find_all('div', { 'class': 'xgray' }))
+			for span in found:
+				if span is None:
+					raise Exception(f'unable to find meta span in {fname}')
+				spans += [(kind, span.getText(), span.decode_contents())]
+	return spans
+
+# the pre-FFNMetaSpan story page path: a re.search per field over the text,
+# the xutimes again over the html, then a full parse/rebuild/reparse
+legacyStoryPatterns = {
+	'ageRating': 'Rated:\\s+(?:Fiction)?\\s*(K|K\\+|T|M)\\s',
+	'chapterCount?': 'Chapters:\\s+(\\d+)',
+	'wordCount': 'Words:\\s+(\\S+)',
+	'reviews?': 'Reviews:\\s+(\\S+)',
+	'favorites?': 'Favs:\\s+(\\S+)',
+	'follows?': 'Follows:\\s+(\\S+)',
+	'updated?': 'Updated:\\s+(\\S+)',
+	'published': 'Published:\\s+([^-]+)',
+}
+legacyZListPatterns = dict(legacyStoryPatterns)
+legacyZListPatterns['ageRating'] = 'Rated:\\s+(?:Fiction)?\\s*(\\S+)'
+
+def legacyMatch(text: str, patterns: Dict[str, str]) -> Dict[str, str]:
+	res = {}
+	for which in patterns:
+		match = re.search(patterns[which], text)
+		if match is not None:
+			res[which.rstrip('?')] = match.group(1)
+		elif not which.endswith('?'):
+			raise Exception(f'error: cannot find {which} in {text}')
+	return res
+
+def legacyIsGenres(text: str) -> bool:
+	if text in genres:
+		return True
+	for g1 in genres:
+		for g2 in genres:
+			if text == f'{g1}/{g2}':
+				return True
+	return False
+
+def legacySpan(metaSpan: str) -> Dict[str, str]:
+	res: Dict[str, str] = {}
+	text = metaSpan.strip()
+	match = re.search("^Rated:\\s+<[^>]*>Fiction\\s*(K|K\\+|T|M)<[^>]*>($| - )", text)
+	if match is None:
+		raise Exception(f'error: cannot find rated in {text}')
+	res['rated'] = match.group(1)
+	text = text[len(match.group(0)):].strip()
+
+	tend = text.find(' - ')
+	res['language'], text = text[:tend], text[tend + len(' - '):]
+
+	rkeys = [
+			('id', "id:\\s+(\\d+)"),
+			('status?', "Status:\\s+(\\S+)"),
+			('published', "Published:\\s+<span data-xutime=['\"](\\d+)['\"]>(\\S+)</span>"),
+			('updated?', "Updated:\\s+<span data-xutime=['\"](\\d+)['\"]>(\\S+)</span>"),
+			('follows?', "Follows:\\s+(\\S+)"),
+			('favorites?', "Favs:\\s+(\\S+)"),
+			('reviews?', "Reviews:\\s+<[^>]*>(\\S+)<[^>]*>"),
+			('words', "Words:\\s+(\\S+)"),
+			('chapters?', "Chapters:\\s+(\\S+)"),
+		]
+	for n, kre in rkeys:
+		match = re.search(f'(^| - ){kre}$', text)
+		if match is not None:
+			res[n.rstrip('?')] = match.group(2)
+			text = text[:-len(match.group(0))].strip()
+
+	if text.find(' - ') >= 0:
+		tend = text.find(' - ')
+		res['genres'], res['characters'] = text[:tend].strip(), text[tend + 3:].strip()
+	elif len(text) > 0 and legacyIsGenres(text):
+		res['genres'] = text
+	elif len(text) > 0:
+		res['characters'] = text
+	return res
+
+def legacyStory(text: str, contents: str) -> Any:
+	res = legacyMatch(text, legacyStoryPatterns)
+	res.update(legacyMatch(contents, {
+		'updated?': "Updated: <span data-xutime=['\"](\\d+)['\"]>",
+		'published': "Published: <span data-xutime=['\"](\\d+)['\"]>",
+	}))
+	# parse, rebuild, and reparse to check the round trip
+	spanRes = legacySpan(contents)
+	fields = [
+			('rated', 'Rated: <>Fiction ZZZ</>'), ('language', 'ZZZ'),
+			('genres', 'ZZZ'), ('characters', 'ZZZ'), ('chapters', 'Chapters: ZZZ'),
+			('words', 'Words: ZZZ'), ('reviews', 'Reviews: <>ZZZ</>'),
+			('favorites', 'Favs: ZZZ'), ('follows', 'Follows: ZZZ'),
+			('updated', 'Updated: <span data-xutime="ZZZ">TODO</span>'),
+			('published', 'Published: <span data-xutime="ZZZ">TODO</span>'),
+			('status', 'Status: ZZZ'), ('id', 'id: ZZZ'),
+		]
+	legacySpan(' - '.join([f[1].replace('ZZZ', spanRes[f[0]])
+		for f in fields if f[0] in spanRes]))
+	return res
+
+def legacyZList(text: str, contents: str) -> Any:
+	return legacyMatch(text, legacyZListPatterns)
+
+def bench(name: str, spans: List[Tuple[str, str, str]], rounds: int,
+		f: Callable[[str, str, str], Any]) -> float:
+	start = time.perf_counter()
+	for _ in range(rounds):
+		for kind, text, contents in spans:
+			f(kind, text, contents)
+	elapsed = time.perf_counter() - start
+	rate = rounds * len(spans) / elapsed
+	print(f"{name}: {rate:.0f} spans/sec")
+	return rate
+
+def main() -> None:
+	rounds = 2000 if len(sys.argv) < 2 else int(sys.argv[1])
+	spans = loadSpans()
+	print(f"corpus: {len(spans)} meta spans, {rounds} rounds")
+
+	before = bench('before (RegexMatcher)', spans, rounds,
+			lambda k, t, c: legacyStory(t, c) if k == 'story' else legacyZList(t, c))
+	after = bench('after (FFNMetaSpan)', spans, rounds,
+			lambda k, t, c: FFNMetaSpan.parse(c))
+	print(f"speedup: {after / before:.2f}x")
+
+if __name__ == '__main__':
+	main()
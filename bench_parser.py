@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# offline throughput and latency benchmarks over ./corpus/ffn/
+#   ./bench_parser.py [rounds] [--save] [--profile] [name ...]
+# results are compared against bench_parser.baseline.json if it exists;
+# --save overwrites it with this run. exits 1 if anything regressed.
+# --profile also prints the time HtmlView spent in each normalization rewrite
+import os
+import sys
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from minerva import FFNParser, extractFFNDeathCode
+from htmlView import HtmlView
+from process_story_content import extractContent
+
+corpusDir = './corpus/ffn/'
+baselineFileName = './bench_parser.baseline.json'
+# flag anything this much slower than the baseline
+regressionThreshold = 0.15
+
+def loadDir(kind: str) -> List[Tuple[str, str]]:
+	d = os.path.join(corpusDir, kind)
+	pages: List[Tuple[str, str]] = []
+	for fname in sorted(os.listdir(d)):
+		with open(os.path.join(d, fname), 'rb') as f:
+			raw = f.read()
+		# odd encodings are named like cp1252_story.cp1252.html
+		parts = fname.split('.')
+		codec = parts[-2] if kind == 'encoding' and len(parts) > 2 else 'utf-8'
+		pages += [(f'{kind}/{fname}', raw.decode(codec))]
+	return pages
+
+def loadCorpus() -> Dict[str, List[Tuple[str, str]]]:
+	return {kind: loadDir(kind)
+			for kind in ['story', 'zlist', 'death', 'encoding', 'chapter']}
+
+def storyPages(corpus: Dict[str, List[Tuple[str, str]]]
+		) -> List[Tuple[str, str]]:
+	return corpus['story'] + corpus['encoding'] + corpus['chapter']
+
+# name -> (inputs, function)
+def buildBenchmarks(corpus: Dict[str, List[Tuple[str, str]]],
+		htmlProfile: Dict[str, float] = None
+		) -> Dict[str, Tuple[List[Tuple[str, str]], Callable[[str], Any]]]:
+	parser = FFNParser()
+	contents = [(n, extractContent(h)) for n, h in corpus['chapter']]
+	return {
+		'FFNParser.parseHtml': (storyPages(corpus),
+			lambda h: parser.parseHtml(1, 1700000000, h)),
+		'FFNParser.parseListing': (corpus['zlist'],
+			lambda h: parser.parseListing(1700000000, h)),
+		'extractFFNDeathCode': (corpus['death'] + storyPages(corpus),
+			extractFFNDeathCode),
+		'extractContent': (storyPages(corpus), extractContent),
+		'HtmlView': (contents, lambda h: HtmlView(h, profile = htmlProfile)),
+		'HtmlView.dualLines': (contents,
+			lambda h: HtmlView(profile = htmlProfile).dualLines(h)),
+	}
+
+def percentile(sortedValues: List[float], p: float) -> float:
+	idx = min(len(sortedValues) - 1, int(p * len(sortedValues)))
+	return sortedValues[idx]
+
+def bench(inputs: List[Tuple[str, str]], f: Callable[[str], Any],
+		rounds: int) -> Dict[str, float]:
+	for _, h in inputs:
+		f(h) # warm up caches and lazy regexes
+	latencies: List[float] = []
+	start = time.perf_counter()
+	for _ in range(rounds):
+		for _, h in inputs:
+			s = time.perf_counter()
+			f(h)
+			latencies += [time.perf_counter() - s]
+	elapsed = time.perf_counter() - start
+	latencies.sort()
+	return {
+		'calls': len(latencies),
+		'perSec': len(latencies) / elapsed,
+		'p50Us': percentile(latencies, 0.50) * 1e6,
+		'p90Us': percentile(latencies, 0.90) * 1e6,
+		'p99Us': percentile(latencies, 0.99) * 1e6,
+	}
+
+def main() -> int:
+	args = [a for a in sys.argv[1:] if not a.startswith('--')]
+	save = '--save' in sys.argv[1:]
+	profile = '--profile' in sys.argv[1:]
+	rounds = 50
+	if len(args) > 0 and args[0].isnumeric():
+		rounds = int(args[0])
+		args = args[1:]
+
+	# profiling adds timer calls, so don't compare or save those runs
+	htmlProfile: Optional[Dict[str, float]] = {} if profile else None
+	if profile:
+		save = False
+	benchmarks = buildBenchmarks(loadCorpus(), htmlProfile)
+	names = [n for n in benchmarks if len(args) == 0 or n in args]
+
+	baseline: Dict[str, Dict[str, float]] = {}
+	if os.path.exists(baselineFileName):
+		with open(baselineFileName) as f:
+			baseline = json.load(f)
+
+	results: Dict[str, Dict[str, float]] = {}
+	regressions: List[str] = []
+	print(f"{'name':<24} {'calls/s':>10} {'p50us':>9} {'p90us':>9} {'p99us':>9}")
+	for name in names:
+		inputs, fn = benchmarks[name]
+		r = bench(inputs, fn, rounds)
+		results[name] = r
+		line = f"{name:<24} {r['perSec']:>10.0f} {r['p50Us']:>9.1f} " \
+				+ f"{r['p90Us']:>9.1f} {r['p99Us']:>9.1f}"
+		if name in baseline and not profile:
+			ratio = r['perSec'] / baseline[name]['perSec']
+			line += f"  {ratio:.2f}x baseline"
+			if ratio < 1 - regressionThreshold:
+				line += '  REGRESSION'
+				regressions += [name]
+		print(line)
+
+	if htmlProfile is not None and len(htmlProfile) > 0:
+		total = sum(htmlProfile.values())
+		print(f"\n{'HtmlView rewrite':<24} {'seconds':>10} {'share':>9}")
+		for rule, secs in sorted(htmlProfile.items(), key = lambda kv: -kv[1]):
+			print(f"{rule:<24} {secs:>10.4f} {secs / total:>9.1%}")
+
+	if save:
+		baseline.update(results)
+		with open(baselineFileName, 'w') as f:
+			json.dump(baseline, f, indent='\t', sort_keys=True)
+		print(f"saved baseline to {baselineFileName}")
+
+	if len(regressions) > 0:
+		print(f"regressed: {', '.join(regressions)}")
+		return 1
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
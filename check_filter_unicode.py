@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# check htmlView.filterUnicode and filterUnicodeMany against the original
+# replace-chain implementation, on text from ./corpus/htmlview/ and on random
+# lines built from the characters the rules care about
+#   ./check_filter_unicode.py [randomCount]
+import os
+import re
+import sys
+import html
+import time
+import random
+from typing import Callable, List
+from htmlView import filterUnicode, filterUnicodeMany
+
+corpusDir = './corpus/htmlview/'
+
+def legacyFilterUnicode(line: str) -> str:
+	spaceSqeeezeRe = re.compile('\\s{2,}')
+	ellipseSqueezeRe = re.compile('(…\\s*){2,}')
+	punctuation = '"”?\\.\'\\)_*'
+	ellipseSpaceRe = re.compile('…([^ {}])'.format(punctuation))
+
+	for d in ['–', '—', '-', '\xad', '―']:
+		line = line.replace(d, '-')
+	for rm in ['■']:
+		line = line.replace(rm, '')
+	for apo in ['ʼ', 'ʻ']:
+		line = line.replace(apo, "'")
+	for dq in ['❝', '❞']:
+		line = line.replace(dq, '"')
+
+	line = line.replace('...', '…')
+	line = line.replace('. . .', '…')
+	line = ellipseSqueezeRe.sub('…', line)
+	line = line.replace(' …', '…')
+	line = line.replace(' ,', ',')
+	line = spaceSqeeezeRe.sub(' ', line)
+	line = ellipseSpaceRe.sub('… \\1', line)
+	return line
+
+def corpusLines() -> List[str]:
+	lines: List[str] = []
+	for fname in sorted(os.listdir(corpusDir)):
+		if not fname.endswith('.html'):
+			continue
+		with open(os.path.join(corpusDir, fname)) as f:
+			text = f.read()
+		lines += [html.unescape(t) for t in re.split('<[^>]*>', text)
+				if len(t) > 0]
+	return lines
+
+def randomLines(count: int) -> List[str]:
+	rng = random.Random(0)
+	pieces = ['a', 'word', ' ', '  ', '\t', '\n', '\xa0', ' ', '.', '. ',
+			'...', '. . .', '…', ' …', '… ', '……', ',', ' ,', '"', '”', '?',
+			"'", ')', '_', '*', '–', '—', '-', '\xad', '―', '■', 'ʼ', 'ʻ',
+			'❝', '❞', '“', '’', 'é']
+	return [''.join(rng.choice(pieces) for _ in range(rng.randint(0, 16)))
+			for _ in range(count)]
+
+def timeIt(f: Callable[[], object]) -> float:
+	start = time.perf_counter()
+	f()
+	return time.perf_counter() - start
+
+def main() -> int:
+	count = 200000
+	if len(sys.argv) > 1:
+		count = int(sys.argv[1])
+
+	lines = corpusLines() + randomLines(count)
+	expected = [legacyFilterUnicode(line) for line in lines]
+	single = [filterUnicode(line) for line in lines]
+	many = filterUnicodeMany(lines)
+
+	failed = 0
+	for line, e, s, m in zip(lines, expected, single, many):
+		if e != s or e != m:
+			failed += 1
+			if failed <= 10:
+				print(f"mismatch on {line!r}: {e!r} {s!r} {m!r}")
+	print(f"{len(lines) - failed}/{len(lines)} lines match")
+
+	sample = corpusLines()
+	legacy = timeIt(lambda: [legacyFilterUnicode(line) for line in sample])
+	current = timeIt(lambda: [filterUnicode(line) for line in sample])
+	batch = timeIt(lambda: filterUnicodeMany(sample))
+	print(f"corpus lines: legacy {legacy * 1e3:.1f}ms, "
+			+ f"filterUnicode {current * 1e3:.1f}ms, "
+			+ f"filterUnicodeMany {batch * 1e3:.1f}ms")
+	return 1 if failed > 0 else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
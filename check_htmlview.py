@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# run HtmlView over the golden corpus and compare against the saved output
+#   ./check_htmlview.py [--update] [name ...]
+# inputs are ./corpus/htmlview/<name>.html, expected output is saved as
+# expected/<name>.md (markdown) and expected/<name>.html (strong/em tags);
+# --update rewrites the expected files from the current HtmlView (if any
+# change, htmlView.htmlViewVersion needs a bump so cached markdown from the
+# old version isn't reused). the streaming HtmlView.lines output (fed in
+# small chunks) and both forms from HtmlView.dualLines must match as well
+import os
+import sys
+from typing import List, Tuple
+from htmlView import HtmlView, htmlViewVersion
+
+corpusDir = './corpus/htmlview/'
+expectedDir = os.path.join(corpusDir, 'expected')
+
+def render(html: str, markdown: bool) -> str:
+	try:
+		return '\n'.join(HtmlView(html, markdown = markdown).text) + '\n'
+	except Exception as e:
+		return f'error: {e}\n'
+
+def renderStream(html: str, markdown: bool) -> str:
+	chunks = [html[i:i + 512] for i in range(0, len(html), 512)]
+	try:
+		return '\n'.join(HtmlView(markdown = markdown).lines(chunks)) + '\n'
+	except Exception as e:
+		return f'error: {e}\n'
+
+def renderDual(html: str) -> Tuple[str, str]:
+	try:
+		md, tags = HtmlView().dualLines(html)
+		return ('\n'.join(md) + '\n', '\n'.join(tags) + '\n')
+	except Exception as e:
+		return (f'error: {e}\n', f'error: {e}\n')
+
+def outputs(name: str, html: str) -> List[Tuple[str, str]]:
+	return [(os.path.join(expectedDir, f'{name}.md'), render(html, True)),
+			(os.path.join(expectedDir, f'{name}.html'), render(html, False))]
+
+def main() -> int:
+	args = [a for a in sys.argv[1:] if not a.startswith('--')]
+	update = '--update' in sys.argv[1:]
+	names = [f[:-len('.html')] for f in sorted(os.listdir(corpusDir))
+			if f.endswith('.html')]
+	names = [n for n in names if len(args) == 0 or n in args]
+
+	if update:
+		os.makedirs(expectedDir, exist_ok = True)
+
+	failed: List[str] = []
+	changed = 0
+	for name in names:
+		with open(os.path.join(corpusDir, f'{name}.html')) as f:
+			html = f.read()
+		for fname, out in outputs(name, html):
+			if update:
+				if not os.path.exists(fname) or open(fname).read() != out:
+					changed += 1
+				with open(fname, 'w') as f:
+					f.write(out)
+				continue
+			if not os.path.exists(fname):
+				print(f"{name}: missing {fname}")
+				failed += [name]
+				continue
+			with open(fname) as f:
+				expected = f.read()
+			if out != expected:
+				print(f"{name}: {fname} differs")
+				failed += [name]
+		for markdown in [True, False]:
+			if renderStream(html, markdown) != render(html, markdown):
+				print(f"{name}: streamed output differs (markdown={markdown})")
+				failed += [name]
+		if renderDual(html) != (render(html, True), render(html, False)):
+			print(f"{name}: dual output differs")
+			failed += [name]
+
+	if update:
+		print(f"updated {len(names)} expected outputs, {changed} files changed")
+		if changed > 0:
+			print(f"bump htmlViewVersion (currently {htmlViewVersion})")
+		return 0
+	print(f"{len(names) - len(set(failed))}/{len(names)} match")
+	return 1 if len(failed) > 0 else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
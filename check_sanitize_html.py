@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# compare the streaming sanitizeHtml against the html5lib sanitizeHtmlSoup.
+# their html differs in structure (html5lib implies html/head/body and
+# reparents misnested tags), so they're compared on what HtmlView makes of it
+#   ./check_sanitize_html.py [file ...]   (default: ./corpus/htmlview/*.html)
+import os
+import sys
+import time
+from typing import List
+from htmlView import HtmlView, sanitizeHtml, sanitizeHtmlChunks, \
+		sanitizeHtmlSoup
+
+corpusDir = './corpus/htmlview/'
+
+def main() -> int:
+	fnames: List[str] = sys.argv[1:]
+	if len(fnames) == 0:
+		fnames = [os.path.join(corpusDir, f) for f in sorted(os.listdir(corpusDir))
+				if f.endswith('.html')]
+
+	failed = 0
+	soupTime, streamTime = 0.0, 0.0
+	for fname in fnames:
+		with open(fname) as f:
+			html = f.read()
+
+		start = time.perf_counter()
+		soup = sanitizeHtmlSoup(html)
+		soupTime += time.perf_counter() - start
+		start = time.perf_counter()
+		stream = sanitizeHtml(html)
+		streamTime += time.perf_counter() - start
+
+		chunks = [html[i:i + 256] for i in range(0, len(html), 256)]
+		if ''.join(sanitizeHtmlChunks(chunks)) != stream:
+			print(f"{fname}: chunked output differs")
+			failed += 1
+			continue
+
+		if HtmlView(soup).text != HtmlView(stream).text:
+			print(f"{fname}: HtmlView output differs")
+			failed += 1
+
+	print(f"{len(fnames) - failed}/{len(fnames)} match")
+	print(f"sanitizeHtmlSoup {soupTime * 1e3:.1f}ms, "
+			+ f"sanitizeHtml {streamTime * 1e3:.1f}ms")
+	return 1 if failed > 0 else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# compare the soup-free story page fast path against the html5lib path
+#   ./diff_ffn_story_page.py [dir_or_file ...]   (default: ./corpus/ffn/story/)
+#   ./diff_ffn_story_page.py --wid start end
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Tuple
+from bs4 import BeautifulSoup # type: ignore
+from minerva import FFNMetaSpan, FFNStoryPage
+
+def plog(msg: str, fname: str = "./diff_ffn_story_page.log") -> None:
+	with open(fname, 'a') as f:
+		f.write(msg + '\n')
+		print(msg)
+
+def summarize(page: FFNStoryPage) -> Dict[str, Any]:
+	assert(page.author is not None and page.metaSpan is not None)
+	return {
+			'authorId': page.author.id,
+			'author': page.author.name,
+			'title': page.title,
+			'description': page.description,
+			'preStoryLinks': page.preStoryLinks,
+			'meta': FFNMetaSpan.parse(page.metaSpan).__dict__,
+		}
+
+def compare(name: str, html: str) -> str:
+	fast = FFNStoryPage.fromHtml(html)
+	try:
+		slow = FFNStoryPage.fromSoup(BeautifulSoup(html, 'html5lib'))
+	except SystemExit as e:
+		raise
+	except:
+		return 'skipped' if fast is None else 'fast-only'
+	if fast is None:
+		plog(f"{name}: fell back to html5lib")
+		return 'fallback'
+
+	fs, ss = summarize(fast), summarize(slow)
+	if fs == ss:
+		return 'same'
+	for k in ss:
+		if fs[k] != ss[k]:
+			plog(f"{name}: {k} differs:\n  fast: {fs[k]!r}\n  soup: {ss[k]!r}")
+	return 'different'
+
+def corpusPages(paths: List[str]) -> Iterator[Tuple[str, str]]:
+	for path in paths:
+		fnames = [path] if os.path.isfile(path) \
+				else [os.path.join(path, f) for f in sorted(os.listdir(path))]
+		for fname in fnames:
+			with open(fname) as f:
+				yield fname, f.read()
+
+def webPages(start: int, end: int) -> Iterator[Tuple[str, str]]:
+	from oil import oil
+	from weaver import Web
+	import weaver.enc as enc
+	with oil.open() as db:
+		for w in Web.fetchIdRange_g(db, start, end,
+				ulike='https://www.fanfiction.net/s/%/%'):
+			if w.response is None or len(w.response) < 1:
+				continue
+			dec = enc.decode(w.response, w.url)
+			if dec is None:
+				continue
+			yield f"wid {w.id}", dec[1]
+
+def main() -> int:
+	if len(sys.argv) == 4 and sys.argv[1] == '--wid':
+		pages = webPages(int(sys.argv[2]), int(sys.argv[3]))
+	else:
+		pages = corpusPages(sys.argv[1:] if len(sys.argv) > 1 \
+				else ['./corpus/ffn/story/'])
+
+	counts: Dict[str, int] = {}
+	for name, html in pages:
+		r = compare(name, html)
+		counts[r] = counts.get(r, 0) + 1
+
+	plog(f"results: {counts}")
+	return 1 if counts.get('different', 0) + counts.get('fast-only', 0) > 0 \
+			else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# delete FFNContentBlob bodies no FFNFicContent row uses any more
+#   ./drop_content_blobs.py
+# a chapter rewritten (with or without useContentBlobs in
+# process_story_content.py) stops using the blob it had, which stays behind
+# until this runs. it scans all of FFNFicContent while process_story_content.py
+# writers with blobs wait on it, so run it between their runs
+import sys
+import time
+import psycopg2
+from oil import oil
+import oil.util as util
+from minerva import FFNFicContent
+
+logFileName = './drop_content_blobs.log'
+
+def plog(msg: str) -> None:
+	global logFileName
+	print(f'{int(time.time())}|{msg}')
+	util.logMessage(msg, fname = logFileName, logDir = './')
+
+def main(db: 'psycopg2.connection') -> None:
+	if len(sys.argv) != 1:
+		print(f"usage: {sys.argv[0]}")
+		sys.exit(1)
+	start = time.time()
+	dropped = FFNFicContent.dropUnusedBlobs(db)
+	plog(f"dropped {dropped} unused blobs in {time.time() - start:.1f}s")
+
+if __name__ == '__main__':
+	with oil.open() as db:
+		main(db)
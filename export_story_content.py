@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# copy FFNFicContent into an FFNContentArchive, for reading without a database
+#   ./export_story_content.py dir [startWid]
+# each run adds the rows with a wid past the archive's watermark, up to the
+# max wid when it started. a row stored later with a wid at or below the
+# watermark (from a process_story_content.py stripe running behind, say) is
+# only picked up by passing an earlier startWid
+import sys
+import time
+import psycopg2
+from typing import Iterator
+from oil import oil
+import oil.util as util
+from minerva import FFNFicContent, FFNContentArchive
+
+logFileName = './export_story_content.log'
+
+# wids read per transaction
+blockSize = 100000
+logEvery = 100000
+
+def plog(msg: str) -> None:
+	global logFileName
+	print(f'{int(time.time())}|{msg}')
+	util.logMessage(msg, fname = logFileName, logDir = './')
+
+def contents(db: 'psycopg2.connection', start: int, end: int
+		) -> Iterator[FFNFicContent]:
+	rows, size = 0, 0
+	for beg in range(start, end + 1, blockSize):
+		for c in FFNFicContent.fetchWidRange(db, beg,
+				min(end, beg + blockSize - 1)):
+			rows += 1
+			size += c.storedSize or 0
+			if rows % logEvery == 0:
+				plog(f"  at wid {c.wid}: {rows} rows, {size} bytes")
+			yield c
+
+def main(db: 'psycopg2.connection') -> None:
+	if len(sys.argv) not in {2, 3}:
+		print(f"usage: {sys.argv[0]} dir [startWid]")
+		sys.exit(1)
+
+	archive = FFNContentArchive(sys.argv[1])
+	plog(f"archive {sys.argv[1]}: {len(archive)} chapters, "
+			+ f"watermark {archive.watermark}")
+	start = archive.watermark + 1 if len(sys.argv) < 3 else int(sys.argv[2])
+	end = FFNFicContent.maxWid(db)
+	if end < start:
+		plog("nothing new")
+		return
+
+	plog(f"exporting wids [{start}, {end}]")
+	added = archive.append(contents(db, start, end), end)
+	plog(f"added {added} chapters, {len(archive)} in the archive")
+
+if __name__ == '__main__':
+	with oil.open() as db:
+		main(db)
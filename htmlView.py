@@ -1,33 +1,38 @@
-from typing import TYPE_CHECKING, List, Set
+from typing import TYPE_CHECKING, Callable, Dict, FrozenSet, Iterable, \
+		Iterator, List, Mapping, Optional, Tuple, Union
+from types import MappingProxyType
+from html.parser import HTMLParser
 import re
 import html
-
-spaceSqeeezeRe = None
-ellipseSqueezeRe = None
-ellipseSpaceRe = None
-
-# convert unicode to ascii for display
-def filterUnicode(line: str) -> str:
-	global spaceSqeeezeRe, ellipseSqueezeRe, ellipseSpaceRe
-	if spaceSqeeezeRe is None:
-		spaceSqeeezeRe = re.compile('\s{2,}')
-	if ellipseSqueezeRe is None:
-		ellipseSqueezeRe = re.compile('(…\s*){2,}')
-	if ellipseSpaceRe is None:
-		punctuation = '"”?\\.\'\\)_*'
-		ellipseSpaceRe = re.compile('…([^ {}])'.format(punctuation))
-
-	# remove some unicode characters
-	# ['“', '”'] ['‘', '’'] "…"
-	for d in ['–', '—', '-', '­', '―']:
-		line = line.replace(d, '-')
-	for rm in ['■']:
-		line = line.replace(rm, '')
-	for apo in ['ʼ', 'ʻ']:
-		line = line.replace(apo, "'")
-	for dq in ['❝', '❞']:
-		line = line.replace(dq, '"')
-
+import time
+
+# bump whenever HtmlView output changes for some input (check_htmlview.py
+# --update will say so); cached conversions from other versions aren't used
+htmlViewVersion = 1
+
+# single characters converted by filterUnicode; ['“', '”'] ['‘', '’'] "…" stay
+unicodeChars = {
+		'–': '-', '—': '-', '\xad': '-', '―': '-',
+		'■': None,
+		'ʼ': "'", 'ʻ': "'",
+		'❝': '"', '❞': '"',
+	}
+unicodeTable = str.maketrans(unicodeChars)
+unicodeCharRe = re.compile('[' + ''.join(unicodeChars) + ']')
+
+# runs of two or more ellipses; matches the same as '(…\s*){2,}' without a
+# capture per ellipsis
+ellipseSqueezeRe = re.compile('…\s*…[…\s]*')
+# same as '\s{2,}', which the re module is slower at
+spaceSqueezeRe = re.compile('\s\s+')
+ellipseSpaceRe = re.compile('…([^ "”?\\.\')_*])')
+# filterUnicodeMany runs the rules once over its lines joined by this; none
+# of them match it, so no rewrite crosses from one line into the next
+batchSeparator = '\x00'
+batchEllipseSpaceRe = re.compile('…([^ "”?\\.\')_*\x00])')
+
+# everything in filterUnicode after the single character conversions
+def filterPunctuation(line: str) -> str:
 	# move bold/italic past dots for ellipses squeeze
 	#line = re.sub('([_*]+)(\.+)', '\\2\\1')
 
@@ -35,21 +40,53 @@ def filterUnicode(line: str) -> str:
 	line = line.replace('...', '…')
 	line = line.replace('. . .', '…')
 
-	# squeeze extra ellipses
-	line = ellipseSqueezeRe.sub('…', line)
-
-	# remove extra space before punctuation
-	line = line.replace(' …', '…')
+	hasEllipsis = line.find('…') != -1
+	if hasEllipsis:
+		# squeeze extra ellipses
+		line = ellipseSqueezeRe.sub('…', line)
+		# remove extra space before punctuation
+		line = line.replace(' …', '…')
 	line = line.replace(' ,', ',')
 
-	# squeeze strings of repeat spaces
-	line = spaceSqeeezeRe.sub(' ', line)
+	# squeeze strings of repeat spaces; a printable line can't have any
+	# whitespace other than ' '
+	if not line.isprintable() or line.find('  ') != -1:
+		line = spaceSqueezeRe.sub(' ', line)
 
 	# make sure ellipses are followed by a space or punctuation
-	line = ellipseSpaceRe.sub('… \\1', line)
+	if hasEllipsis:
+		line = ellipseSpaceRe.sub('… \\1', line)
 
 	return line
 
+# convert unicode to ascii for display
+def filterUnicode(line: str) -> str:
+	if not line.isascii() and unicodeCharRe.search(line) is not None:
+		line = line.translate(unicodeTable)
+	return filterPunctuation(line)
+
+# filterUnicode over many lines, as one pass over them all instead of one
+# per line
+def filterUnicodeMany(lines: Iterable[str]) -> List[str]:
+	lines = list(lines)
+	text = batchSeparator.join(lines)
+	if text.count(batchSeparator) != len(lines) - 1:
+		return [filterUnicode(line) for line in lines]
+
+	# translate is slow over long non-ascii text, and few characters match
+	if not text.isascii():
+		text = unicodeCharRe.sub(lambda m: unicodeChars[m.group()] or '', text)
+	text = text.replace('...', '…').replace('. . .', '…')
+	hasEllipsis = text.find('…') != -1
+	if hasEllipsis:
+		text = ellipseSqueezeRe.sub('…', text)
+		text = text.replace(' …', '…')
+	text = text.replace(' ,', ',')
+	text = spaceSqueezeRe.sub(' ', text)
+	if hasEllipsis:
+		text = batchEllipseSpaceRe.sub('… \\1', text)
+	return text.split(batchSeparator)
+
 def filterEmptyTags(line: str) -> str:
 	# remove empty open/close italics and bolds
 	line = line.replace('_ _', ' ')
@@ -60,100 +97,583 @@ def filterEmptyTags(line: str) -> str:
 
 	return line
 
-def sanitizeHtml(html: str) -> str:
+# sanitizer rules
+# extracted entirely
+sanitizeBlacklist = frozenset({'script', 'style'})
+# attrs stripped
+sanitizeWhitelist = frozenset({'em', 'i', 'strong', 'b', 'bold', 'hr', 'br', 's'})
+# turned into p
+sanitizeBlockWhitelist = frozenset({'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'})
+# turned into span
+sanitizeSpanWhitelist: FrozenSet[str] = frozenset()
+
+# tags that never have content, serialized as <tag/> like BeautifulSoup does
+voidTags = frozenset({'area', 'base', 'br', 'col', 'embed', 'hr', 'img',
+		'input', 'keygen', 'link', 'menuitem', 'meta', 'param', 'source', 'track',
+		'wbr', 'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex',
+		'nextid', 'spacer'})
+
+def sanitizeTagName(name: str) -> str:
+	name = name.lower()
+	if name in sanitizeWhitelist:
+		return name
+	elif name in sanitizeSpanWhitelist:
+		return "span"
+	elif name in sanitizeBlockWhitelist:
+		return "p"
+	return "span"
+
+# the original sanitizer: build an html5lib tree, rewrite it, serialize it
+def sanitizeHtmlSoup(html: str) -> str:
 	from bs4 import BeautifulSoup # type: ignore
 
-	# extracted entirely
-	blacklist = {'script', 'style'}
-	# attrs stripped
-	whitelist = {'em', 'i', 'strong', 'b', 'bold', 'hr', 'br', 's'}
-	# turned into p
-	blockWhitelist = {'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
-	# turned into span
-	spanWhitelist: Set[str] = set()
-
 	soup = BeautifulSoup(html, 'html5lib')
 	for tag in soup.find_all():
-		if tag.name.lower() in blacklist:
+		if tag.name.lower() in sanitizeBlacklist:
 			tag.extract() # strip tag and children
 			continue
 		tag.attrs.clear()
-		if tag.name.lower() in whitelist:
-			continue
-		elif tag.name.lower() in spanWhitelist:
-			tag.name = "span"
-		elif tag.name.lower() in blockWhitelist:
-			tag.name = "p"
-		else:
-			tag.name = "span"
+		tag.name = sanitizeTagName(tag.name)
 
 	return str(soup)
 
+# the sanitizer rules applied in one forward pass over the tokens; output
+# builds up as chunks are fed and is collected with take(). unlike html5lib
+# nothing is reparented and no missing html/head/body tags are implied, but
+# elements still open at close() are closed
+class HtmlSanitizer(HTMLParser):
+	def __init__(self) -> None:
+		super().__init__(convert_charrefs = True)
+		self.out: List[str] = []
+		# (tag, sanitized name) of elements still open
+		self.open: List[Tuple[str, str]] = []
+		# > 0 while inside a blacklisted tag
+		self.skipDepth = 0
+
+	def take(self) -> str:
+		out = ''.join(self.out)
+		self.out = []
+		return out
+
+	def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]
+			) -> None:
+		if tag in sanitizeBlacklist:
+			self.skipDepth += 1
+			return
+		if self.skipDepth > 0:
+			return
+		name = sanitizeTagName(tag)
+		if tag in voidTags:
+			self.out.append(f'<{name}/>')
+			return
+		self.out.append(f'<{name}>')
+		self.open.append((tag, name))
+
+	def handle_startendtag(self, tag: str,
+			attrs: List[Tuple[str, Optional[str]]]) -> None:
+		# like html5lib, a self closing slash on a normal element is ignored
+		self.handle_starttag(tag, attrs)
+
+	def handle_endtag(self, tag: str) -> None:
+		if tag in sanitizeBlacklist:
+			self.skipDepth = max(0, self.skipDepth - 1)
+			return
+		if self.skipDepth > 0 or tag in voidTags:
+			return
+		# close anything left open inside of it, ignore strays
+		if all(t != tag for t, _ in self.open):
+			return
+		while len(self.open) > 0:
+			t, name = self.open.pop()
+			self.out.append(f'</{name}>')
+			if t == tag:
+				break
+
+	def handle_data(self, data: str) -> None:
+		if self.skipDepth == 0:
+			self.out.append(html.escape(data, quote = False))
+
+	def handle_comment(self, data: str) -> None:
+		if self.skipDepth == 0:
+			self.out.append(f'<!--{data}-->')
+
+	def handle_decl(self, decl: str) -> None:
+		self.out.append(f'<!{decl}>')
+
+	def close(self) -> None:
+		super().close()
+		while len(self.open) > 0:
+			self.out.append(f'</{self.open.pop()[1]}>')
+
+# sanitize html given in chunks, yielding sanitized html as it's produced
+def sanitizeHtmlChunks(chunks: Iterable[str]) -> Iterator[str]:
+	sanitizer = HtmlSanitizer()
+	for chunk in chunks:
+		sanitizer.feed(chunk)
+		out = sanitizer.take()
+		if len(out) > 0:
+			yield out
+	sanitizer.close()
+	out = sanitizer.take()
+	if len(out) > 0:
+		yield out
+
+def sanitizeHtml(html: str) -> str:
+	return ''.join(sanitizeHtmlChunks([html]))
+
+# whole lines (markup stripped, lowercased) that are really scene breaks
+hrRes = [
+		'[!/\\\\&#~*_XxIiOoHhPpsVv80°¤ :.…=><12)(+\[\]-]{3,}',
+		'[~0-9]{3,}', '[ua-]{5,}',
+		'(.)\\1{10,}', '(.)(.)(\\1\\2){5,}\\1?\\2?',
+		'(.)(.)(.)(\\1\\2\\3){5,}\\1?\\2?\\3?',
+		'(.{2,}) ?(\\1 ?){3,}', '(.{5,}) ?(\\1 ?){2,}',
+		'[\'~`^,._-]{4,}',
+	]
+
+# join patterns into one alternation, shifting the backreferences of each
+# pattern past the groups of the ones before it
+def combinePatterns(patterns: List[str]) -> str:
+	escapeRe = re.compile(r'\\(\d+|.)')
+	parts: List[str] = []
+	offset = 0
+	for p in patterns:
+		def renumber(m: 're.Match[str]') -> str:
+			if not m.group(1).isdigit():
+				return m.group(0)
+			return '\\' + str(int(m.group(1)) + offset)
+		parts += [escapeRe.sub(renumber, p)]
+		offset += re.compile(p).groups
+	return '|'.join(parts)
+
+hrRe = re.compile('^(?:' + combinePatterns(hrRes) + ')$')
+gamerRe = re.compile('^[HhMmXx][Pp]:? [0-9]+')
+spaceRe = re.compile('\s+')
+
+# lines that are dropped entirely
+skipLines = frozenset(['Work Text:', 'Chapter Text', 'Next Chapter',
+		'Last Chapter Next Chapter', '_‗_', '___', 'Prev Main Next'])
+
+# known scene break titles, compared against the lowercased line
+hrTitles = frozenset(t.lower() for t in [
+		"~~bonds of blood~~", "~~bonds of bloods~~",
+		"- dp & sw: ribsr -", "- dp & sw: tfop -",
+		"hp & ha - safh",
+		"_‗_", "-==(oio)==-", '\\""/', 'ˇ',
+		'#', '##', '###', '* *', ' ', '.',
+		'-.-fh-.-', '-break-', 'oracle2phoenix', '/', '(break)',
+		'dghpdghpdghp', 'my', 'hp*the aftermath*hp',
+		'~~~core threads~~~',
+		'-saving her saving himself-',
+		'{1}', '{2}', '{3}',
+		'scene break', 'scenebreak', 'xxscenebreakxx',
+		'[-]', '{-}',
+		'x', '_x_', '%', '[{o}]', 'section break', '- break -',
+		'-- story --', '(line break)', '-()-', '<>', '~<>~', '~',
+		'(⊙_⊙) ', '(∞)', '!', "','", '!ditg!', '-{}-',
+		'┐(￣ヘ￣)┌┐(￣ヘ￣)┌┐(￣ヘ￣)┌',
+		"'OvO'", 'www', '-|-|-', '~•~', '::', 'scene break>', '-l-l-l-',
+		'-line break-', ':)', ';)', ':', '-= LP =-', 'f/klpt',
+		'~*~*~*~*~ harry&pansy ~*~*~*~*~', '....', '….', '%%%',
+		'˄', '˅', '-----===ͽ ˂ O ˃ ͼ===-----', '-----===ͽ Δ ͼ===-----',
+		'xxxxxxx story xxxxxxx', 'line break', 'titanfall'])
+
+# ~squiggled~ lines that are scene breaks
+squiggleBreaks = frozenset(['flashback', 'end flashback', 'time skip'])
+
+# tags that are skipped entirely (compared lowercased)
+ignoreTags = [
+		'!doctype', '!--', 'html', '/html',
+		'head', '/head', 'peta', '/peta', 'title', '/title',
+		'body', '/body', 'pont', '/pont', 'font', '/font',
+		'o:p', '/o:p', 'fido', '/fido',
+		'o:documentproperties', '/o:documentproperties',
+		'o:author', '/o:author',
+		'o:company', '/o:company',
+		'o:lastauthor', '/o:lastauthor',
+		'o:revision', '/o:revision',
+		'o:version', '/o:version',
+		'o:totaltime', '/o:totaltime',
+		'o:created', '/o:created',
+		'o:lastsaved', '/o:lastsaved',
+		'o:pages', '/o:pages',
+		'o:words', '/o:words',
+		'o:characters', '/o:characters',
+		'o:characterswithspaces', '/o:characterswithspaces',
+		'o:lines', '/o:lines',
+		'o:paragraphs', '/o:paragraphs',
+		'o:template', '/o:template',
+		'div', '/div', 'span', '/span',
+		'h2',
+		'/hr', '/br',
+		'select', '/select', 'option',
+		'button', '/button',
+		'center', '/center',
+		'a', '/a', 'img', '/img', 'sup', '/sup',
+		'h3', 'ul', '/ul', 'li', '/li',
+		'iframe', '/iframe',
+		'h1', 'u', '/u',
+		'del', '/del', 'address', '/address',
+		'big', '/big', 'ol', '/ol',
+		'table', '/table', 'tbody', '/tbody', 'tr', '/tr', 'td', '/td',
+		'time', '/time', 'footer', '/footer',
+		'small', '/small',
+		'xtml', '/xtml', 'xead', '/xead', 'dir', '/dir',
+		'x1', 'xink',
+		'strike', '/strike', # TODO don't ignore
+		'h4', '/h4', 'h5', '/h5', 'h6', '/h6',
+		'pre', '/pre', # TODO
+		'article', '/article',
+		'aside', '/aside', # TODO
+		'noscript', '/noscript', # TODO
+		'dl', '/dl', 'dt', '/dt', 'dd', '/dd', # TODO
+		'script', '/script', # TODO: dump contents too
+		'![cdata[', # TODO
+		'ppan', '/ppan', # TODO
+		'cite', '/cite', # TODO
+		'abbr', '/abbr', # TODO
+		'sub', '/sub', # TODO
+		'code', '/code', # TODO
+		'meta', # TODO
+		'kbd', '/kbd', # TODO
+		'link', # TODO
+		'acronym', '/acronym', # TODO
+
+		'xml', '/xml', 'style', '/style', 'form', '/form', 'object', '/object',
+		'ptyle', '/ptyle',
+		'al', '/al', 'blink', '/blink', 'blue', '/blue', 'doc', '/doc',
+		'input', '/input', 'marquee', '/marquee', 'noembed', '/noembed',
+		'option', '/option', 'o:smarttagtype', '/o:smarttagtype',
+		'u1:p', '/u1:p', 'u2:p', '/u2:p',
+
+		'th', '/th', 'tt', '/tt',
+		'url', '/url', 'vr', '/vr', 'wbr', '/wbr',
+
+		'fieldset', '/fieldset',
+		'legend', '/legend',
+
+		'nav', '/nav',
+
+		'caption', '/caption', # TODO
+		'section', '/section', # TODO
+		'header', '/header', # TODO
+		'base', '/base', # TODO
+		'label', '/label', # TODO
+		'![endif]--', # TODO
+		'![endif]', # TODO
+		'![if', # TODO
+
+		'ruby', '/ruby', 'rb', '/rb', 'rp', '/rp', 'rt', '/rt', # TODO oogways owl
+	]
+
+# tags starting with any of these are skipped too
+ignorePrefixes = ('!--', 'st1:', 'st2:', '/st1:', '/st2:',
+		'o:', 'w:', '/o:', '/w:')
+
+# st1: and st2: ?
+#	city, place, country-region, placename, platetype, postalcode, street,
+#	address, state, time, date, personname, givenname, sn,
+#	metricconverter, stockticker, numconv, middlename
+
+# what HtmlView.__processHTML does with a tag
+ignoreAction = 0
+hrAction = 1 # flush the line and add a scene break
+brAction = 2 # flush the line unless it's only an opening markup char
+lineAction = 3 # flush the line if it's not empty
+boldAction = 4
+boldCloseAction = 5
+italicAction = 6
+italicCloseAction = 7
+strikeAction = 8
+
+# lowercased first word of the tag => action
+tagActions: Mapping[str, int] = MappingProxyType({
+		**{t: hrAction for t in ['hr', 'hr/', 'blockquote', '/blockquote']},
+		**{t: brAction for t in ['br', 'br/']},
+		**{t: lineAction for t in ['p', '/p', '/h1', '/h2', '/h3']},
+		**{t: boldAction for t in ['strong', 'b', 'bold']},
+		**{t: boldCloseAction for t in ['/strong', '/b', '/bold']},
+		**{t: italicAction for t in ['em', 'i']},
+		**{t: italicCloseAction for t in ['/em', '/i']},
+		**{t: strikeAction for t in ['s', '/s']},
+		**{t: ignoreAction for t in ignoreTags},
+	})
+
+scriptRe = re.compile('<script>.*?</script>', re.DOTALL)
+noscriptRe = re.compile('<noscript>.*?</noscript>', re.DOTALL)
+oldIeRe = re.compile('<!--\[if lt IE 8\]>.*?<!\[endif\]-->', re.DOTALL)
+spacebattlesAd = 'Buy our stuff, go here to find out more: <a href="https://forums.spacebattles.com/threads/spacebattles-merchandise.398032/">https://forums.spacebattles.com/threads/spacebattles-merchandise.398032/</A>'
+redundantTagRe = re.compile('</(strong|b|bold|em|i)><\\1>')
+breakRe = re.compile('<p>([\s\n]*<br/?>[\s\n]*)+</p>', re.MULTILINE)
+
+markupTags = ['strong', 'b', 'bold', 'em', 'i']
+
+def stripScripts(htmlText: str) -> str:
+	# strip simple scripts TODO needs to be much better...
+	htmlText = scriptRe.sub('', htmlText)
+	htmlText = noscriptRe.sub('', htmlText)
+	htmlText = oldIeRe.sub('', htmlText)
+	return htmlText.replace(spacebattlesAd, '')
+
+def unescapeBackslashes(htmlText: str) -> str:
+	# bleh, remove badly encoded newlines and extra backslashes
+	if htmlText.find('\\') == -1:
+		return htmlText
+	htmlText = htmlText.replace('\\n', '\n')
+	htmlText = htmlText.replace('\\r', '\n')
+	return htmlText.replace('\\\\', '\\')
+
+def dropRedundantTags(htmlText: str) -> str:
+	# remove redundant open/close tags; prevents extra space from next step.
+	# removing one pair can expose another (</em></b><b><em>) so the tags
+	# still go one at a time, but only when there's any pair at all
+	if redundantTagRe.search(htmlText) is None:
+		return htmlText
+	for t in markupTags:
+		htmlText = htmlText.replace(f'</{t}><{t}>', '')
+	return htmlText
+
+def dropSpaceMarkup(htmlText: str) -> str:
+	# strip pointless tags around spaces (one at a time for the same reason)
+	if htmlText.find('> </') == -1:
+		return htmlText
+	for t in markupTags:
+		htmlText = htmlText.replace(f'<{t}> </{t}>', ' ')
+	return htmlText
+
+def squashEmptyParagraphs(htmlText: str) -> str:
+	emptyThreshold = 0.35
+	# if more than emptyThreshold% of all paragraphs are empty, then the text
+	# is probably double spaced and we can just remove the empty ones
+	emptyP = '<p>\xa0</p>'
+	emptyCount = htmlText.count(emptyP)
+	if emptyCount == 0:
+		return htmlText
+	if (emptyCount > emptyThreshold * htmlText.count('<p>')):
+		return htmlText.replace(emptyP, '')
+
+	# otherwise double spacing is probably meant to be a scene break
+	if emptyCount <= 160:
+		htmlText = htmlText.replace(emptyP, '<hr />')
+	return htmlText
+
+# normalize all spaces into actual spaces (newlines, tabs, etc), the same as
+# re.sub('\s+', ' ', htmlText) but without a substitution for every word
+def squeezeSpaces(htmlText: str) -> str:
+	squeezed = ' '.join(htmlText.split())
+	if len(squeezed) == 0:
+		return ' ' if len(htmlText) > 0 else htmlText
+	if htmlText[0].isspace():
+		squeezed = ' ' + squeezed
+	if htmlText[-1].isspace():
+		squeezed += ' '
+	return squeezed
+
+# the rewrites made over a whole chapter before HtmlView walks its tags, in
+# order. each is only a scan when there's nothing to rewrite, and groups of
+# rewrites are skipped entirely when one check shows none of them can apply
+normalizeRules: List[Tuple[str, Callable[[str], str]]] = [
+		('scripts', stripScripts),
+		('backslashes', unescapeBackslashes),
+		('redundantTags', dropRedundantTags),
+		('emptySpan', lambda h: h.replace('<span/>', '')),
+		# add an extra space after em close, it'll get squashed later if it's a
+		# duplicate, otherwise it keeps words from running together
+		('emCloseSpace', lambda h: h.replace('</em>', '</em> ')),
+		# decode nbsp into regular space
+		('spaceEntities',
+			lambda h: h.replace("&nbsp;", ' ').replace('&#8203;', ' ')),
+		# squash two single quotes into double quotes
+		('doubleQuotes', lambda h:
+			h.replace("‘’", '"').replace("’’", '"').replace("''", '"')),
+		('spaceMarkup', dropSpaceMarkup),
+		('emptyParagraphs', squashEmptyParagraphs),
+		# squash multiple breaks embedded in paragraphs into a single scene break
+		('paragraphBreaks', lambda h: breakRe.sub('<hr />', h)),
+		# replace unicode nbsp with regular space
+		('unicodeSpaces',
+			lambda h: h.replace('\xa0', ' ').replace('\u200b', ' ')),
+		# replace centered stars with scene break
+		('centeredStars', lambda h: h.replace(
+			'<div style="text-align: center">*** </div>', '<hr />')),
+		# fix annoying <<< >>> scene breaks...
+		# looking at you stranger in an unholy land
+		('angleBreaks', lambda h: h.replace('<<< >>>', '<hr />')),
+		('spaces', squeezeSpaces),
+		('xTags', lambda h: h if h.find('<x') == -1
+			else h.replace('<xr>', '<br>').replace('<x2>', '<h2>')),
+	]
+
+# run normalizeRules over htmlText; with profile, the seconds spent in each
+# rule are added to profile[name]
+def normalizeHtml(htmlText: str, profile: Dict[str, float] = None) -> str:
+	if profile is None:
+		for _, rule in normalizeRules:
+			htmlText = rule(htmlText)
+		return htmlText
+	for name, rule in normalizeRules:
+		start = time.perf_counter()
+		htmlText = rule(htmlText)
+		profile[name] = profile.get(name, 0.0) + time.perf_counter() - start
+	return htmlText
+
+# lines that are dropped when they're at the very end
+trailingNavLines = frozenset(['< Prev', 'Next >'])
+
+# the line HtmlView is building; kept as parts with running character counts
+# so the checks made on every tag don't rescan (or recopy) the whole line.
+# whitespace has already been squeezed to single spaces by then, so ' ' is the
+# only character strip() would remove
+class LineBuffer:
+	def __init__(self) -> None:
+		self.clear()
+
+	def clear(self) -> None:
+		self.parts: List[str] = []
+		self.length = 0
+		self.solid = 0 # not ' '
+		self.nonItalic = 0 # not ' ' or '_'
+		self.nonMarkup = 0 # not ' ', '*', or '_'
+
+	def append(self, s: str) -> None:
+		if len(s) == 0:
+			return
+		self.parts.append(s)
+		self.length += len(s)
+		self.solid += len(s) - s.count(' ')
+		nonItalic = len(s) - s.count(' ') - s.count('_')
+		self.nonItalic += nonItalic
+		self.nonMarkup += nonItalic - s.count('*')
+
+	# line.strip() is empty
+	def isBlank(self) -> bool:
+		return self.solid == 0
+
+	# line.strip() is a single '*' or '_'
+	def isLoneMarkup(self) -> bool:
+		return self.solid == 1 and self.nonMarkup == 0
+
+	# line.strip('_ ') is empty
+	def isItalicOnly(self) -> bool:
+		return self.nonItalic == 0
+
+	def endsWithSpace(self) -> bool:
+		return len(self.parts) > 0 and self.parts[-1].endswith(' ')
+
+	# line[:-1] + s for a line ending in a space
+	def replaceTrailingSpace(self, s: str) -> None:
+		self.parts[-1] = self.parts[-1][:-1]
+		self.length -= 1
+		if len(self.parts[-1]) == 0:
+			self.parts.pop()
+		self.append(s)
+
+	def take(self) -> str:
+		line = ''.join(self.parts)
+		self.clear()
+		return line
+
+# one output form of HtmlView: the line being built and the finished lines
+# not yet handed out
+class LineStream:
+	def __init__(self, markdown: bool) -> None:
+		self.markdown = markdown
+		self.cline = LineBuffer()
+		# the rules that look back only ever touch the last line or a trailing
+		# run of nav lines
+		self.window: List[str] = []
+		# markdown markup takes the space after its tag; drop it from the text
+		# that follows
+		self.skip = False
+
 class HtmlView:
-	def __init__(self, html: str, markdown: bool = True,
-			extraTitles: List[str] = None) -> None:
-		hrRes = [
-				'[!/\\\\&#~*_XxIiOoHhPpsVv80°¤ :.…=><12)(+\[\]-]{3,}',
-				'[~0-9]{3,}', '[ua-]{5,}',
-				'(.)\\1{10,}', '(.)(.)(\\1\\2){5,}\\1?\\2?',
-				'(.)(.)(.)(\\1\\2\\3){5,}\\1?\\2?\\3?',
-				'(.{2,}) ?(\\1 ?){3,}', '(.{5,}) ?(\\1 ?){2,}',
-				'[\'~`^,._-]{4,}',
-			]
-		self.gamerRe = re.compile('^[HhMmXx][Pp]:? [0-9]+')
-		self.hrRes = [re.compile('^' + r + '$') for r in hrRes]
+	def __init__(self, html: str = None, markdown: bool = True,
+			extraTitles: List[str] = None, profile: Dict[str, float] = None
+			) -> None:
 		self.extraTitles: List[str] = [] if extraTitles is None else extraTitles
-		self.spaceRe = re.compile('\s+')
-		self.text: List[str] = []
+		self.hrTitles = hrTitles if len(self.extraTitles) == 0 \
+				else hrTitles | frozenset(t.lower() for t in self.extraTitles)
 		self.markdown = markdown
-		self.__processHTML(html)
-
-	def __addLines(self, lines: List[str]) -> None:
+		# seconds spent in each normalizeRules rewrite, if given
+		self.profile = profile
+		# the last line cleaned by __addLine, shared between output forms
+		self.__lastRaw: Optional[str] = None
+		self.__lastClean: Optional[Tuple[str, str]] = None
+		self.text: List[str] = []
+		if html is not None:
+			self.text = list(self.lines(html))
+
+	# yield finished lines as soon as they're known. html may also be given as
+	# chunks, but they're joined before the normalization pass since deciding
+	# whether empty paragraphs are double spacing or scene breaks needs counts
+	# over the whole chapter
+	def lines(self, html: Union[str, Iterable[str]]) -> Iterator[str]:
+		htmlText = html if isinstance(html, str) else ''.join(html)
+		stream = LineStream(self.markdown)
+		for _ in self.__processHTML(htmlText, [stream]):
+			yield from self.__ready(stream)
+		yield from stream.window
+
+	# markdown and strong/em html lines (what markdown=True and markdown=False
+	# would give) from one normalization and tokenization pass
+	def dualLines(self, html: Union[str, Iterable[str]]
+			) -> Tuple[List[str], List[str]]:
+		htmlText = html if isinstance(html, str) else ''.join(html)
+		md, tags = LineStream(True), LineStream(False)
+		mdLines: List[str] = []
+		tagLines: List[str] = []
+		for _ in self.__processHTML(htmlText, [md, tags]):
+			mdLines += self.__ready(md)
+			tagLines += self.__ready(tags)
+		return (mdLines + md.window, tagLines + tags.window)
+
+	# hand out every line that can no longer change
+	def __ready(self, stream: LineStream) -> List[str]:
+		window = stream.window
+		keep = 0
+		while keep < len(window) and window[-1 - keep] in trailingNavLines:
+			keep += 1
+		keep = max(keep, 1)
+		if len(window) <= keep:
+			return []
+		ready = window[:-keep]
+		del window[:-keep]
+		return ready
+
+	def __trimNav(self, stream: LineStream) -> None:
+		while len(stream.window) > 0 and stream.window[-1] in trailingNavLines:
+			stream.window.pop()
+
+	def __addLines(self, stream: LineStream, lines: List[str]) -> None:
 		for line in lines:
-			self.__addLine(line)
+			self.__addLine(stream, line)
+
+	def __addLine(self, stream: LineStream, line: str) -> None:
+		if line == self.__lastRaw:
+			clean = self.__lastClean
+		else:
+			clean = self.__cleanLine(line)
+			self.__lastRaw, self.__lastClean = line, clean
+		if clean is None:
+			return
+		if clean[0] == '<hr />' and len(stream.window) > 0 \
+				and stream.window[-1] == '<hr />':
+			return
+		stream.window.append(clean[1])
 
-	def __addLine(self, line: str) -> None:
+	# None for a line that's dropped, otherwise the line before and after
+	# filterEmptyTags (a scene break right after another is dropped based on
+	# the former)
+	def __cleanLine(self, line: str) -> Optional[Tuple[str, str]]:
 		line = html.unescape(line)
 		line = filterUnicode(line)
 
 		line = line.replace('Sony', 'Sonny') # TODO: hack...
 		line = line.strip()
 
-		if line == 'Work Text:' or line == 'Chapter Text' \
-				or line == 'Next Chapter' or line == 'Last Chapter Next Chapter':
-			return
-
-		# filter out blank/all-space lines
-		if line.isspace() or len(line) == 0:
-			return
-
-		if line.strip() == '_‗_' or line.strip() == '___' \
-				or line.strip() == 'Prev Main Next':
-			return
-
-		hrTitles = ["~~bonds of blood~~", "~~bonds of bloods~~",
-				"- dp & sw: ribsr -", "- dp & sw: tfop -",
-				"hp & ha - safh",
-				"_‗_", "-==(oio)==-", '\\""/', 'ˇ',
-				'#', '##', '###', '* *', ' ', '.',
-				'-.-fh-.-', '-break-', 'oracle2phoenix', '/', '(break)',
-				'dghpdghpdghp', 'my', 'hp*the aftermath*hp',
-				'~~~core threads~~~',
-				'-saving her saving himself-',
-				'{1}', '{2}', '{3}',
-				'scene break', 'scenebreak', 'xxscenebreakxx',
-				'[-]', '{-}',
-				'x', '_x_', '%', '[{o}]', 'section break', '- break -',
-				'-- story --', '(line break)', '-()-', '<>', '~<>~', '~',
-				'(⊙_⊙) ', '(∞)', '!', "','", '!ditg!', '-{}-',
-				'┐(￣ヘ￣)┌┐(￣ヘ￣)┌┐(￣ヘ￣)┌',
-				"'OvO'", 'www', '-|-|-', '~•~', '::', 'scene break>', '-l-l-l-',
-				'-line break-', ':)', ';)', ':', '-= LP =-', 'f/klpt',
-				'~*~*~*~*~ harry&pansy ~*~*~*~*~', '....', '….', '%%%',
-				'˄', '˅', '-----===ͽ ˂ O ˃ ͼ===-----', '-----===ͽ Δ ͼ===-----',
-				'xxxxxxx story xxxxxxx', 'line break', 'titanfall'] + self.extraTitles
-
-		squiggleBreaks = ['flashback', 'end flashback', 'time skip']
+		# filter out boilerplate and blank/all-space lines
+		if line in skipLines or line.isspace() or len(line) == 0:
+			return None
 
 		# strip markdown tags
 		mhr = line.strip('*_').lower()
@@ -166,29 +686,16 @@ class HtmlView:
 			if (mhr.startswith('<em>') and mhr.endswith('</em>')):
 				mhr = mhr[len('<em>'):-len('</em>')]
 
-		matchesHrRe = False
-		for hrRe in self.hrRes:
-			if hrRe.match(mhr) is not None:
-				matchesHrRe = True
-				break
+		matchesHrRe = hrRe.match(mhr) is not None
 		if mhr == '"yes." "yes." "yes."' or mhr.startswith('hp: '):
 			matchesHrRe = False
-		if matchesHrRe and self.gamerRe.match(mhr):
+		if matchesHrRe and gamerRe.match(mhr):
 			matchesHrRe = False
 		# normalize weird h-rules
 		if line == '***' or mhr == '<hr />' or mhr == '-' or mhr == '--' \
-				or (len(line) > 0 and len(mhr) == 0) or matchesHrRe:
+				or (len(line) > 0 and len(mhr) == 0) or matchesHrRe \
+				or mhr in self.hrTitles or mhr.strip('~') in squiggleBreaks:
 			line = '<hr />'
-		else:
-			for hrTitle in hrTitles:
-				if mhr == hrTitle.lower():
-					line = '<hr />'
-					break
-			sq = mhr.strip('~')
-			for squiggleBreak in squiggleBreaks:
-				if sq == squiggleBreak:
-					line = '<hr />'
-					break
 		if (len(line) - len(line.strip('=')) > 8) \
 				and (line.strip('=') == 'HG/MM' or line.strip('=') == 'MM/HG'):
 			line = '<hr />'
@@ -201,185 +708,30 @@ class HtmlView:
 		if len(mhr) > 10 and mhr.count('x') > len(mhr) * 0.7:
 			line = '<hr />'
 
-		if len(self.text) > 0 and line == '<hr />' and self.text[-1] == '<hr />':
-			return
-
-		line = filterEmptyTags(line)
+		clean = filterEmptyTags(line)
 
 		# blow up on very long lines (TODO: graceful)
-		if len(line) > (80 * 60 * 1000000): # TODO
+		if len(clean) > (80 * 60 * 1000000): # TODO
 			raise Exception('error: extremely long line: {}\n{}'.format(
-				len(line), line))
-
-		self.text += [line]
-
-	def __processHTML(self, htmlText: str) -> None:
-		# strip simple scripts TODO needs to be much better...
-		try:
-			htmlText = re.sub('<script>.*?</script>', '', htmlText, flags=re.DOTALL)
-			htmlText = re.sub('<noscript>.*?</noscript>', '', htmlText, flags=re.DOTALL)
-			htmlText = re.sub('<!--\[if lt IE 8\]>.*?<!\[endif\]-->', '', htmlText, flags=re.DOTALL)
-			htmlText = htmlText.replace(
-					'Buy our stuff, go here to find out more: <a href="https://forums.spacebattles.com/threads/spacebattles-merchandise.398032/">https://forums.spacebattles.com/threads/spacebattles-merchandise.398032/</A>',
-					'')
-		except:
-			pass
-
-		# bleh, remove badly encoded newlines and extra backslashes
-		htmlText = htmlText.replace('\\n', '\n') # bleh
-		htmlText = htmlText.replace('\\r', '\n') # bleh
-		htmlText = htmlText.replace('\\\\', '\\') # bleh
-
-		# remove redundant open/close tags; prevents extra space from next step
-		for t in ['strong', 'b', 'bold', 'em', 'i']:
-			htmlText = htmlText.replace(f'</{t}><{t}>', '')
-
-		for t in ['span']:
-			htmlText = htmlText.replace(f'<{t}/>', '')
-
-		# add an extra space after em close, it'll get squashed later if it's a
-		# duplicate, otherwise it keeps words from running together
-		htmlText = htmlText.replace('</em>', '</em> ')
-
-		# decode nbsp into regular space
-		htmlText = htmlText.replace("&nbsp;", ' ').replace('&#8203;', ' ')
-
-		# squash two single quotes into double quotes
-		htmlText = htmlText.replace("‘’", '"').replace("’’", '"').replace("''", '"')
-
-		# strip pointless tags around spaces
-		for t in ['strong', 'b', 'bold', 'em', 'i']:
-			htmlText = htmlText.replace(f'<{t}> </{t}>', ' ')
-
-		emptyThreshold = 0.35
-		# if more than emptyThreshold% of all paragraphs are empty, then the text
-		# is probably double spaced and we can just remove the empty ones
-		emptyP = '<p> </p>'
-		if (htmlText.count(emptyP) > emptyThreshold * htmlText.count('<p>')):
-			htmlText = htmlText.replace(emptyP, '')
-
-		# otherwise double spacing is probably meant to be a scene break
-		if htmlText.count('<p> </p>') <= 160:
-			htmlText = htmlText.replace('<p> </p>', '<hr />')
-
-		# squash multiple breaks embedded in paragraphs into a single scene break
-		breakRe = re.compile('<p>([\s\n]*<br/?>[\s\n]*)+</p>', re.MULTILINE)
-		htmlText = breakRe.sub('<hr />', htmlText)
-		htmlText = htmlText.replace('<p><br/>\n<br/>\n</p>', '<hr />')
-		htmlText = htmlText.replace('<p><br/>\n<br/>\n<br/>\n</p>', '<hr />')
+				len(clean), clean))
 
-		# replace unicode nbsp with regular space
-		htmlText = htmlText.replace(' ', ' ').replace(u'\u200b', ' ')
-
-		# replace centered stars with scene break
-		htmlText = htmlText.replace('<div style="text-align: center">*** </div>', '<hr />')
-
-		# fix annoying <<< >>> scene breaks...
-		# looking at you stranger in an unholy land
-		htmlText = htmlText.replace('<<< >>>', '<hr />')
+		return (line, clean)
 
-		# normalize all spaces into actual spaces (newlines, tabs, etc)
-		htmlText = self.spaceRe.sub(' ', htmlText)
+	# runs the streams over htmlText in step, yielding whenever lines may have
+	# been finished; once it returns, whatever is left in their windows is too
+	def __processHTML(self, htmlText: str, streams: List[LineStream]
+			) -> Iterator[None]:
+		self.__lastRaw, self.__lastClean = None, None
+		htmlText = normalizeHtml(htmlText, self.profile)
 
 		if htmlText.find('<') == -1:
-			self.__addLine(htmlText)
+			for s in streams:
+				self.__addLine(s, htmlText)
 			return
 
-		htmlText = htmlText.replace('<xr>', '<br>').replace('<x2>', '<h2>')
-
-		# skip all tags that start with... (case insensitive)
-		ignoreTags = [
-				'!doctype', '!--', 'html', '/html',
-				'head', '/head', 'peta', '/peta', 'title', '/title',
-				'body', '/body', 'pont', '/pont', 'font', '/font',
-				'o:p', '/o:p', 'fido', '/fido',
-				'o:documentproperties', '/o:documentproperties',
-				'o:author', '/o:author',
-				'o:company', '/o:company',
-				'o:lastauthor', '/o:lastauthor',
-				'o:revision', '/o:revision',
-				'o:version', '/o:version',
-				'o:totaltime', '/o:totaltime',
-				'o:created', '/o:created',
-				'o:lastsaved', '/o:lastsaved',
-				'o:pages', '/o:pages',
-				'o:words', '/o:words',
-				'o:characters', '/o:characters',
-				'o:characterswithspaces', '/o:characterswithspaces',
-				'o:lines', '/o:lines',
-				'o:paragraphs', '/o:paragraphs',
-				'o:template', '/o:template',
-				'div', '/div', 'span', '/span',
-				'h2',
-				'/hr', '/br',
-				'select', '/select', 'option',
-				'button', '/button',
-				'center', '/center',
-				'a', '/a', 'img', '/img', 'sup', '/sup',
-				'h3', 'ul', '/ul', 'li', '/li',
-				'iframe', '/iframe',
-				'h1', 'u', '/u',
-				'del', '/del', 'address', '/address',
-				'big', '/big', 'ol', '/ol',
-				'table', '/table', 'tbody', '/tbody', 'tr', '/tr', 'td', '/td',
-				'time', '/time', 'footer', '/footer',
-				'small', '/small',
-				'xtml', '/xtml', 'xead', '/xead', 'dir', '/dir',
-				'x1', 'xink',
-				'strike', '/strike', # TODO don't ignore
-				'h4', '/h4', 'h5', '/h5', 'h6', '/h6',
-				'pre', '/pre', # TODO
-				'article', '/article',
-				'aside', '/aside', # TODO
-				'noscript', '/noscript', # TODO
-				'dl', '/dl', 'dt', '/dt', 'dd', '/dd', # TODO
-				'script', '/script', # TODO: dump contents too
-				'![cdata[', # TODO
-				'ppan', '/ppan', # TODO
-				'cite', '/cite', # TODO
-				'abbr', '/abbr', # TODO
-				'sub', '/sub', # TODO
-				'code', '/code', # TODO
-				'meta', # TODO
-				'kbd', '/kbd', # TODO
-				'link', # TODO
-				'acronym', '/acronym', # TODO
-
-				'xml', '/xml', 'style', '/style', 'form', '/form', 'object', '/object',
-				'ptyle', '/ptyle',
-				'al', '/al', 'blink', '/blink', 'blue', '/blue', 'doc', '/doc',
-				'input', '/input', 'marquee', '/marquee', 'noembed', '/noembed',
-				'option', '/option', 'o:smarttagtype', '/o:smarttagtype',
-				'u1:p', '/u1:p', 'u2:p', '/u2:p',
-
-				'th', '/th', 'tt', '/tt',
-				'url', '/url', 'vr', '/vr', 'wbr', '/wbr',
-
-				'fieldset', '/fieldset',
-				'legend', '/legend',
-
-				'nav', '/nav',
-
-				'caption', '/caption', # TODO
-				'section', '/section', # TODO
-				'header', '/header', # TODO
-				'base', '/base', # TODO
-				'label', '/label', # TODO
-				'![endif]--', # TODO
-				'![endif]', # TODO
-				'![if', # TODO
-
-				'ruby', '/ruby', 'rb', '/rb', 'rp', '/rp', 'rt', '/rt', # TODO oogways owl
-			]
 		# FIXME nested tags: <!-- <p>thing</p> -->
 
-		# st1: and st2: ?
-		#	city, place, country-region, placename, platetype, postalcode, street,
-		#	address, state, time, date, personname, givenname, sn,
-		#	metricconverter, stockticker, numconv, middlename
-
 		tagCount = 0
-		cline = ""
 		idx = 0
 		textLen = len(htmlText)
 
@@ -389,12 +741,12 @@ class HtmlView:
 
 			# if there are no more tags, the rest is pure text
 			if nopen == -1:
-				cline += htmlText[idx:]
+				self.__addText(streams, htmlText[idx:])
 				break
 
 			# if there's text before the tag, add it to the current line
 			if nopen != 0:
-				cline += htmlText[idx:nopen]
+				self.__addText(streams, htmlText[idx:nopen])
 				idx = nopen
 
 			tagCount += 1
@@ -408,128 +760,116 @@ class HtmlView:
 			inner = htmlText[nopen + 1:nclose].strip().lower()
 			inner = inner.split()[0] # only look at the initial piece of the tag
 
-			if inner.startswith('!--'):
-				idx = nclose + 1
-				continue
+			action = tagActions.get(inner)
+			if action is None and inner.startswith(ignorePrefixes):
+				action = ignoreAction
+			idx = nclose + 1
 
-			# check if it's in our generic ignore list
-			didIgnore = False
-			for itag in ignoreTags:
-				if inner == itag:
-					idx = nclose + 1
-					didIgnore = True
-					break
-			if inner[:4] == 'st1:' or inner[:4] == 'st2:' \
-					or inner[:5] == '/st1:' or inner[:5] == '/st2:':
-				idx = nclose + 1
-				didIgnore = True
-			if not didIgnore \
-					and (inner.startswith('o:') or inner.startswith('w:') \
-						or inner.startswith('/o:') or inner.startswith('/w:')):
-				idx = nclose + 1
-				didIgnore = True
-			if didIgnore:
+			if action == ignoreAction:
 				continue
 
 			# horizontal rules remain like html; translate blockquote into hr
-			if inner == 'hr' or inner == 'hr/' \
-					or inner == 'blockquote' or inner == '/blockquote':
-				self.__addLines([cline, '<hr />'])
-				cline = ''
-				idx = nclose + 1
+			if action == hrAction:
+				for s in streams:
+					self.__addLines(s, [s.cline.take(), '<hr />'])
+				yield
 				continue
 
 			# a few things advance to the next line
-			if inner == 'br' or inner == 'br/':
-				# if we've just got a start tag don't actually advance the line
-				if not (len(cline.strip()) == 1 and len(cline.strip().strip('*_')) == 0):
-					self.__addLine(cline)
-					cline = ''
-				idx = nclose + 1
-				continue
-
-			if inner == 'p' or inner == '/p' \
-					or inner == '/h2' or inner == '/h3' or inner == '/h1':
-				if len(cline) > 0:
-					self.__addLine(cline)
-				cline = ''
-				idx = nclose + 1
-				continue
-
-			# if our target is not markdown, only standardize on strong and em
-			if self.markdown == False:
-				if (inner == 'strong' or inner == 'b' or inner == 'bold'):
-					cline += '<strong>'
-					idx = nclose + 1
-					continue
-				if (inner == '/strong' or inner == '/b' or inner == '/bold'):
-					cline += '</strong>'
-					idx = nclose + 1
-					continue
-				if (inner == 'em' or inner == 'i'):
-					cline += '<em>'
-					idx = nclose + 1
-					continue
-				if (inner == '/em' or inner == '/i'):
-					cline += '</em>'
-					idx = nclose + 1
-					continue
-
-
-			# convert bold into markdown bold
-			if inner == 'strong' or inner == 'b' or inner == 'bold':
-				if (nclose + 1) < textLen and htmlText[nclose + 1] == ' ':
-					cline += ' *'
-					idx = nclose + 2
-				else:
-					cline += "*"
-					idx = nclose + 1
-				continue
-			if inner == '/strong' or inner == '/b' or inner == '/bold':
-				if len(cline.strip()) == 0 and len(self.text) > 0 \
-						and self.text[-1] != '<hr />':
-					self.text[-1] += '*'
-				elif cline.endswith(' '):
-					cline = cline[:-1] + '* '
-				else:
-					cline += '*'
-				idx = nclose + 1
-				continue
-
-			# convert italics into markdown italics
-			if inner == 'em' or inner == 'i':
-				if (nclose + 1) < textLen and htmlText[nclose + 1] == ' ':
-					cline += ' _'
-					idx = nclose + 2
-				else:
-					cline += '_'
-					idx = nclose + 1
-				continue
-			if inner == '/em' or inner == '/i':
-				if len(cline.strip()) == 0 and len(self.text) > 0 \
-						and self.text[-1] != '<hr />':
-					self.text[-1] += '_'
-				elif cline.endswith(' '):
-					cline = cline[:-1] + '_ '
-				else:
-					cline += '_'
-				if len(cline.strip('_ \t\r\n')) == 0:
-					cline = ''
-				idx = nclose + 1
+			if action == brAction:
+				for s in streams:
+					# if we've just got a start tag don't actually advance the line
+					if not s.cline.isLoneMarkup():
+						self.__addLine(s, s.cline.take())
+				yield
 				continue
 
-			# strikethrough
-			if inner == 's' or inner == '/s':
-				cline += '-'
-				idx = nclose + 1
+			if action == lineAction:
+				for s in streams:
+					if s.cline.length > 0:
+						self.__addLine(s, s.cline.take())
+				yield
 				continue
 
-			# unable to categorize tag, dump debugging info
-			raise Exception('unable to process tag "{}":\n{}'.format(
-				inner, htmlText[idx - 90:nclose + 90]))
-
-		self.__addLine(cline)
+			if action is None:
+				# unable to categorize tag, dump debugging info
+				raise Exception('unable to process tag "{}":\n{}'.format(
+					inner, htmlText[nopen - 90:nclose + 90]))
+
+			spaceAfter = idx < textLen and htmlText[idx] == ' '
+			for s in streams:
+				self.__addMarkup(s, action, spaceAfter)
+
+		for s in streams:
+			self.__addLine(s, s.cline.take())
+			self.__trimNav(s)
+
+	def __addText(self, streams: List[LineStream], text: str) -> None:
+		for s in streams:
+			if s.skip:
+				s.cline.append(text[1:])
+				s.skip = False
+			else:
+				s.cline.append(text)
+
+	def __addMarkup(self, stream: LineStream, action: int, spaceAfter: bool
+			) -> None:
+		cline = stream.cline
+
+		# if our target is not markdown, only standardize on strong and em
+		if stream.markdown == False:
+			if action == boldAction:
+				cline.append('<strong>')
+				return
+			if action == boldCloseAction:
+				cline.append('</strong>')
+				return
+			if action == italicAction:
+				cline.append('<em>')
+				return
+			if action == italicCloseAction:
+				cline.append('</em>')
+				return
+
+		# convert bold into markdown bold
+		if action == boldAction:
+			if spaceAfter:
+				cline.append(' *')
+				stream.skip = True
+			else:
+				cline.append('*')
+			return
+		if action == boldCloseAction:
+			if cline.isBlank() and len(stream.window) > 0 \
+					and stream.window[-1] != '<hr />':
+				stream.window[-1] += '*'
+			elif cline.endsWithSpace():
+				cline.replaceTrailingSpace('* ')
+			else:
+				cline.append('*')
+			return
 
-		while len(self.text) > 0 and self.text[-1] in ['< Prev', 'Next >']:
-			self.text = self.text[:-1]
+		# convert italics into markdown italics
+		if action == italicAction:
+			if spaceAfter:
+				cline.append(' _')
+				stream.skip = True
+			else:
+				cline.append('_')
+			return
+		if action == italicCloseAction:
+			if cline.isBlank() and len(stream.window) > 0 \
+					and stream.window[-1] != '<hr />':
+				stream.window[-1] += '_'
+			elif cline.endsWithSpace():
+				cline.replaceTrailingSpace('_ ')
+			else:
+				cline.append('_')
+			if cline.isItalicOnly():
+				cline.clear()
+			return
 
+		# strikethrough
+		if action == strikeAction:
+			cline.append('-')
+			return
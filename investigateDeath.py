@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 import sys
 import psycopg2
-from bs4 import BeautifulSoup # type: ignore
 from oil import oil
 from weaver import Web, WebBase
 import weaver.enc as enc
@@ -46,7 +45,8 @@ def main(db: 'psycopg2.connection') -> None:
 		raise Exception("unknown encoding")
 	html = dec[1]
 
-	code = extractFFNDeathCode(html)
+	# one page at a time, so double check the raw classifier against html5lib
+	code = extractFFNDeathCode(html, verify = True)
 	if code != 0:
 		plog(f"  dead: {code}")
 		c = FFNFic.bury(db, fid, code, w.created, True)
@@ -58,7 +58,7 @@ def main(db: 'psycopg2.connection') -> None:
 		try:
 			ffnParser = FFNParser()
 			ts = int(w.created / 1000)
-			fic = ffnParser.get(db, fid, ts, BeautifulSoup(html, 'html5lib'))
+			fic = ffnParser.getFromHtml(db, fid, ts, html)
 			plog(f"{fic.__dict__}")
 		except:
 			plog(f"{w.url} is broken")
@@ -0,0 +1,164 @@
+import time
+import sqlite3
+from typing import Dict, List, Optional, Set, Tuple
+from oil.util import compress, uncompress
+import weaver.enc as enc
+from minerva.ffn.content import contentHash
+from htmlView import HtmlView, htmlViewVersion
+
+defaultCachePath = './md_cache.sqlite'
+defaultMaxBytes = 16 * 1024 * 1024 * 1024
+# once over maxBytes, evict down to this fraction of it so a full cache isn't
+# evicting on every flush
+evictTo = 0.9
+
+def contentToMd(content: bytes, id_: str) -> str:
+	dec = enc.decode(content, id_)
+	if dec is None:
+		raise Exception("unknown encoding")
+	return '\n'.join(HtmlView().lines(dec[1]))
+
+# markdown from HtmlView keyed by (hash of the raw chapter bytes,
+# htmlViewVersion), stored compressed in a local sqlite file. entries are
+# evicted least recently used first, and entries from other HtmlView versions
+# before any of those, once the stored markdown passes maxBytes. writes and
+# recency updates are batched until flush (or close). several reindex
+# processes may share one cache file, so the stored size is kept in the file
+# (mdSize) and updated in the same transactions as md
+class MdCache:
+	def __init__(self, path: str = defaultCachePath,
+			maxBytes: int = defaultMaxBytes, version: int = htmlViewVersion
+			) -> None:
+		self.path = path
+		self.maxBytes = maxBytes
+		self.version = version
+		self.conn = sqlite3.connect(path, timeout = 120)
+		self.conn.execute('pragma journal_mode = wal')
+		self.conn.execute('pragma synchronous = normal')
+		with self.conn:
+			self.conn.execute('''
+				create table if not exists md (
+					hash blob not null,
+					version integer not null,
+					used integer not null,
+					size integer not null,
+					md blob not null,
+
+					primary key(hash, version)
+				) without rowid''')
+			self.conn.execute('''
+				create index if not exists md_used_idx on md(used)''')
+			self.conn.execute('''
+				create table if not exists mdSize (
+					id integer primary key check (id = 0),
+					size integer not null
+				)''')
+			self.conn.execute('''
+				insert or ignore into mdSize(id, size)
+				select 0, coalesce(sum(size), 0) from md''')
+		# by hash, so a chapter body put twice is only written (and counted)
+		# once
+		self.pending: Dict[bytes, Tuple[bytes, int, int, int, bytes]] = {}
+		self.touched: Set[bytes] = set()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, hash_: bytes) -> Optional[str]:
+		p = self.pending.get(hash_)
+		if p is not None:
+			self.hits += 1
+			return uncompress(p[4]).decode('utf-8')
+		r = self.conn.execute('''
+			select md from md where hash = ? and version = ?
+		''', (hash_, self.version)).fetchone()
+		if r is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.touched.add(hash_)
+		return uncompress(r[0]).decode('utf-8')
+
+	def put(self, hash_: bytes, md: str) -> None:
+		data = compress(md.encode('utf-8'))
+		self.pending[hash_] = \
+				(hash_, self.version, int(time.time()), len(data), data)
+
+	# the markdown for a chapter, converting and caching it on a miss
+	def markdown(self, content: bytes, id_: str) -> str:
+		hash_ = contentHash(content)
+		md = self.get(hash_)
+		if md is None:
+			md = contentToMd(content, id_)
+			self.put(hash_, md)
+		return md
+
+	def flush(self) -> None:
+		if len(self.pending) == 0 and len(self.touched) == 0:
+			return
+		now = int(time.time())
+		with self.conn:
+			# take the write lock up front so the sizes read here stay right
+			self.conn.execute('begin immediate')
+			added = sum(p[3] for p in self.pending.values())
+			# less anything being replaced
+			for hash_, version, _, _, _ in self.pending.values():
+				r = self.conn.execute('''
+					select size from md where hash = ? and version = ?
+				''', (hash_, version)).fetchone()
+				if r is not None:
+					added -= int(r[0])
+			self.conn.executemany('''
+				insert or replace into md(hash, version, used, size, md)
+				values(?, ?, ?, ?, ?)
+			''', list(self.pending.values()))
+			self.conn.executemany('''
+				update md set used = ? where hash = ? and version = ?
+			''', [(now, h, self.version) for h in self.touched])
+			self.conn.execute('update mdSize set size = size + ?', (added,))
+		self.pending = {}
+		self.touched = set()
+		if self.storedSize() > self.maxBytes:
+			self.evict(int(self.maxBytes * evictTo))
+
+	# bytes of markdown stored, by every process using the file
+	def storedSize(self) -> int:
+		r = self.conn.execute('select size from mdSize').fetchone()
+		return 0 if r is None else int(r[0])
+
+	def evict(self, target: int) -> None:
+		with self.conn:
+			# another process may have evicted since flush looked, so look again
+			# while holding the write lock
+			self.conn.execute('begin immediate')
+			size = self.storedSize()
+			if size <= target:
+				return
+			r = self.conn.execute('''
+				select coalesce(sum(size), 0) from md where version != ?
+			''', (self.version,)).fetchone()
+			if int(r[0]) > 0:
+				self.conn.execute('delete from md where version != ?',
+						(self.version,))
+				size -= int(r[0])
+			while size > target:
+				rows = self.conn.execute('''
+					select hash, size from md where version = ?
+					order by used asc limit 1000
+				''', (self.version,)).fetchall()
+				if len(rows) == 0:
+					size = 0
+					break
+				drop: List[Tuple[bytes, int]] = []
+				for hash_, rowSize in rows:
+					if size <= target:
+						break
+					drop += [(hash_, self.version)]
+					size -= int(rowSize)
+				self.conn.executemany('''
+					delete from md where hash = ? and version = ?
+				''', drop)
+			self.conn.execute('update mdSize set size = ?', (size,))
+
+	def close(self) -> None:
+		self.flush()
+		self.conn.close()
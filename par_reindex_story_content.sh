@@ -1,10 +1,7 @@
 #!/usr/bin/bash
 
+# one reader feeding a pool of conversion workers; pass a workerCount to
+# override the default of cpus - 1
 beg="${1-0}"
 
-for s in {0..5}; do
-	./reindex_story_content.py ${beg} 6 ${s} &
-done
-
-wait
-
+./reindex_story_content.py ${beg} 1 0 ${2-}
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# move FFNFicContent to the hash partitioned layout in sql/minerva.sql
+#   ./partition_story_content.py stripeCount [jobCount]
+# this is what creates FFNFicContent's stripeCount partitions, on a fresh
+# schema too; process_story_content.py only writes into them. a plain
+# FFNFicContent is renamed out of the way and a partitioned one created in
+# its place. FFNFicContent_{stripe} tables process_story_content.py wrote
+# before partitioning are attached as they are when they only hold that
+# stripe's fids (fid % stripeCount = stripe), otherwise they're renamed and
+# their rows moved like the old FFNFicContent's: jobCount processes at a time,
+# each moving one stripe into its partition. it can be stopped and run again
+import re
+import sys
+import time
+import multiprocessing
+import psycopg2
+from typing import List, Tuple
+from oil import oil
+import oil.util as util
+from minerva import FFNFicContent
+
+logFileName = './partition_story_content.log'
+
+batchSize = 1000
+
+def plog(msg: str) -> None:
+	global logFileName
+	print(f'{int(time.time())}|{msg}')
+	util.logMessage(msg, fname = logFileName, logDir = './')
+
+# (source, stripeCount, stripe) => rows moved
+def moveStripe(task: Tuple[str, int, int]) -> int:
+	source, stripeCount, stripe = task
+	fid, cid = -1, -1
+	moved = 0
+	with oil.open() as db:
+		while True:
+			n, last = FFNFicContent.moveRows(db, source, fid, cid, batchSize,
+					stripeCount, stripe)
+			if last is None:
+				break
+			fid, cid = last
+			moved += n
+	plog(f"  moved {moved} rows from {source} into "
+			+ FFNFicContent.tableName(stripe))
+	return moved
+
+def main(db: 'psycopg2.connection') -> None:
+	if len(sys.argv) not in {2, 3}:
+		print(f"usage: {sys.argv[0]} stripeCount [jobCount]")
+		sys.exit(1)
+
+	stripeCount = int(sys.argv[1])
+	jobCount = int(sys.argv[2]) if len(sys.argv) == 3 else stripeCount
+	plog(f"stripeCount: {stripeCount}")
+	plog(f"jobCount: {jobCount}")
+
+	if not FFNFicContent.isPartitioned(db):
+		plog("creating partitioned FFNFicContent")
+		FFNFicContent.createPartitioned(db)
+
+	# a partition of one stripeCount overlaps every other stripeCount's
+	existing = set(FFNFicContent.partitions(db).values())
+	if len(existing - { stripeCount }) > 0:
+		plog(f"FFNFicContent is already partitioned into {sorted(existing)} "
+				+ f"stripes, not {stripeCount}")
+		sys.exit(1)
+
+	# attaching locks out the other attaches anyway, so these go one at a time
+	sources: List[str] = []
+	for table in FFNFicContent.looseTables(db):
+		m = re.match('^ffnficcontent_([0-9]+)$', table)
+		if m is None:
+			sources += [table]
+			continue
+		plog(f"attaching {table}")
+		old = FFNFicContent.attachPartition(db, stripeCount, int(m.group(1)))
+		if old is not None:
+			plog(f"  it has rows from other stripes, renamed to {old}")
+			sources += [old]
+
+	FFNFicContent.createPartitions(db, stripeCount)
+
+	tasks = [(source, stripeCount, stripe)
+			for source in sources for stripe in range(stripeCount)]
+	plog(f"moving rows from {', '.join(sources) or 'nothing'}")
+	with multiprocessing.Pool(jobCount) as pool:
+		moved = sum(pool.imap_unordered(moveStripe, tasks))
+	plog(f"moved {moved} rows")
+
+	for source in sources:
+		if FFNFicContent.dropIfEmpty(db, source):
+			plog(f"dropped {source}")
+		else:
+			plog(f"{source} still has rows")
+
+	# autovacuum analyzes the partitions but never the parent
+	with db, db.cursor() as curs:
+		curs.execute('analyze FFNFicContent')
+	plog("done")
+
+if __name__ == '__main__':
+	with oil.open() as db:
+		main(db)
@@ -7,7 +7,7 @@ from bs4 import BeautifulSoup # type: ignore
 from oil import oil
 from weaver import WebScraper
 import weaver.enc as enc
-from minerva import FFNCommunity
+from minerva import FFNCommunity, extractFFNCommunityDeathCode
 
 def plog(msg: str, fname: str = "./pffnc.log") -> None:
 	with open(fname, 'a') as f:
@@ -52,9 +52,10 @@ def prescrapeCommunity(db: 'psycopg2.connection', scraper: WebScraper,
 		plog("  {comm.id} has unknown encoding")
 		return
 	html = dec[1]
-	if len(html) < 1:
-		plog(f"  {comm.id} is freshly dead: 1")
-		FFNCommunity.bury(db, comm.id, 1, w.created)
+	code = extractFFNCommunityDeathCode(html)
+	if code != 0:
+		plog(f"  {comm.id} is freshly dead: {code}")
+		FFNCommunity.bury(db, comm.id, code, w.created)
 
 	pages = getPageCount(comm, html)
 	if pages > 1:
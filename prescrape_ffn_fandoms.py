@@ -3,12 +3,12 @@ import sys
 import time
 import random
 import psycopg2
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from bs4 import BeautifulSoup # type: ignore
 from oil import oil
 from weaver import RemoteWebScraper
 import weaver.enc as enc
-from minerva import FFNFandom, FFNFandomDeltaResult
+from minerva import FFNBatchWriter, FFNFandom, FFNFandomDeltaResult, FFNParser
 
 def plog(msg: str, fname: str = "./pffnf.log") -> None:
 	with open(fname, 'a') as f:
@@ -103,54 +103,66 @@ def prescrapeFandom(db: 'psycopg2.connection', scraper: RemoteWebScraper,
 	deltaResult = FFNFandomDeltaResult.create(
 			db, fandom.id, crossover=crossover)
 
-	page = 1
-	pages = 1
-	fanMinTs = None
-	fanMaxTs = None
-	while page <= pages:
-		if pages > 1:
-			plog(f"  grabbing page {page}/{pages}")
-		url = fandom.getUrl(db, page) if not crossover \
-				else fandom.getAllCrossoversUrl(page)
-		w = scraper.softScrape(url)
-		dec = enc.decode(w.response, url)
-		if dec is None:
-			plog("  {fandom.id} has unknown encoding")
-			return
-		html = dec[1]
-		if len(html) < 1:
-			plog(f"  {fandom.id} is freshly dead: 1")
-			#minerva.buryCommunity(comm.id, 1, w.created)
-			return
-
-		soup = BeautifulSoup(html, 'html5lib')
-
-		pages = getPageCount(db, fandom, soup, crossover)
-		page += 1
-
-		ficTs = getFicTimestamps(soup)
-		if len(ficTs) == 0:
-			break
-
-		minTs = getMinFicTs(ficTs)
-		maxTs = getMaxFicTs(ficTs)
-
-		if fanMinTs is None:
-			fanMinTs = minTs
-		if fanMaxTs is None:
-			fanMaxTs = maxTs
-		if minTs is not None:
-			assert(fanMinTs is not None)
-			fanMinTs = min(fanMinTs, minTs)
-		if maxTs is not None:
-			assert(fanMaxTs is not None)
-			fanMaxTs = max(fanMaxTs, maxTs)
-
-		deltaResult.update(db, page - 1, pages, fanMinTs, fanMaxTs)
-
-		if maxTs is not None and maxTs <= scrollDate:
-			break
-
+	parser = FFNParser()
+	# flushed as the block exits, early returns included
+	with FFNBatchWriter(db) as writer:
+		page = 1
+		pages = 1
+		fanMinTs = None
+		fanMaxTs = None
+		while page <= pages:
+			if pages > 1:
+				plog(f"  grabbing page {page}/{pages}")
+			url = fandom.getUrl(db, page) if not crossover \
+					else fandom.getAllCrossoversUrl(page)
+			w = scraper.softScrape(url)
+			dec = enc.decode(w.response, url)
+			if dec is None:
+				plog("  {fandom.id} has unknown encoding")
+				return
+			html = dec[1]
+			if len(html) < 1:
+				plog(f"  {fandom.id} is freshly dead: 1")
+				#minerva.buryCommunity(comm.id, 1, w.created)
+				return
+
+			soup = BeautifulSoup(html, 'html5lib')
+
+			pages = getPageCount(db, fandom, soup, crossover)
+			page += 1
+
+			# every fic on the listing, no chapter-1 fetch needed
+			assert(w.created is not None)
+			errors: List[Tuple[int, str]] = []
+			writer.addMany(parser.parseListing(int(w.created / 1000), html,
+				fandomId1 = None if crossover else fandom.id, errors = errors))
+			for fid, err in errors:
+				plog(f"  {fid} is broken: {err.strip().splitlines()[-1]}")
+
+			ficTs = getFicTimestamps(soup)
+			if len(ficTs) == 0:
+				break
+
+			minTs = getMinFicTs(ficTs)
+			maxTs = getMaxFicTs(ficTs)
+
+			if fanMinTs is None:
+				fanMinTs = minTs
+			if fanMaxTs is None:
+				fanMaxTs = maxTs
+			if minTs is not None:
+				assert(fanMinTs is not None)
+				fanMinTs = min(fanMinTs, minTs)
+			if maxTs is not None:
+				assert(fanMaxTs is not None)
+				fanMaxTs = max(fanMaxTs, maxTs)
+
+			deltaResult.update(db, page - 1, pages, fanMinTs, fanMaxTs)
+
+			if maxTs is not None and maxTs <= scrollDate:
+				break
+
+	plog(f"  upserted {writer.ficCount} fics")
 	deltaResult.finish(db, page - 1, pages, fanMinTs, fanMaxTs)
 
 def prescrapeFandomBlock(db: 'psycopg2.connection', scraper: RemoteWebScraper,
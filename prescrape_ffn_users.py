@@ -7,45 +7,13 @@ from typing import List, Set
 from oil import oil
 from weaver import WebScraper, Web
 import weaver.enc as enc
-from minerva import FFNUser
+from minerva import FFNUser, extractFFNUserDeathCode
 
 def plog(msg: str, fname: str = "./pffnu.log") -> None:
 	with open(fname, 'a') as f:
 		f.write(msg + '\n')
 		print(msg)
 
-def extractFFNUserDeathCode(html: str) -> int:
-	if html.find('id=content_wrapper') >= 0:
-		return 0
-	deletedCodes = [
-			# probably never created
-			('User does not exist or is no longer an active member.', 0),
-			# probably deleted
-			('User is no longer an active member.', 1),
-		]
-
-	from bs4 import BeautifulSoup # type: ignore
-	soup = BeautifulSoup(html, 'html5lib')
-	content_wrapper = soup.find(id='content_wrapper')
-	if content_wrapper is not None:
-		return 0
-
-	# story might've been deleted
-	gui_warnings = soup.find_all('span', { 'class': 'gui_warning' })
-	for gui_warning in gui_warnings:
-		for dc in deletedCodes:
-			if gui_warning.get_text() == dc[0]:
-				return dc[1]
-
-	# might be in the abbreviated page message box
-	gui_normal = soup.find_all('span', { 'class': 'gui_normal' })
-	for msg in gui_normal:
-		for dc in deletedCodes:
-			if msg.get_text().find(dc[0]) >= 0:
-				return dc[1]
-
-	return -1 # retry later
-
 def getUrl(uid: int) -> str:
 	return f"https://www.fanfiction.net/u/{uid}"
 
@@ -9,13 +9,20 @@ from oil import oil
 import oil.util as util
 from weaver import Web
 import weaver.enc as enc
-from minerva import FFNFicContent, extractFFNDeathCode
+from minerva import FFNFicContent, FFNContentWriter, extractFFNDeathCode
 
 processType = 'content'
 storyUrlPrefix = 'https://www.fanfiction.net/s/'
 
 logFileName = f'./process_story_{processType}.log'
 
+# store chapter bodies once in FFNContentBlob however many fics have them;
+# bodies no chapter uses any more are left until drop_content_blobs.py
+useContentBlobs = False
+# keep what a chapter said before an update, as an FFNContentRevision.
+# chapters that already have revisions keep getting them with this off too
+keepContentHistory = False
+
 def plog(msg: str) -> None:
 	global logFileName
 	print(msg)
@@ -43,8 +50,8 @@ def extractContent(html: str) -> str:
 		parts = parts[:-1]
 	return ' '.join(parts)
 
-def handleStoryPage(db: 'psycopg2.connection', w: Web, stripeCount: int,
-		stripe: int) -> None:
+def handleStoryPage(db: 'psycopg2.connection', writer: FFNContentWriter,
+		w: Web, stripeCount: int, stripe: int) -> None:
 	assert(w.url is not None and w.created is not None and w.id is not None)
 	global storyUrlPrefix
 	if not w.url.startswith(storyUrlPrefix):
@@ -74,7 +81,7 @@ def handleStoryPage(db: 'psycopg2.connection', w: Web, stripeCount: int,
 	try:
 		# try to grab just the story content
 		content = extractContent(html)
-		FFNFicContent.upsert(db, fid, cid, w.id, content, stripe)
+		writer.add(fid, cid, w.id, content)
 		#plog(f"{w.url} has content len: {len(content)}")
 	except:
 		plog(f"{w.url} is broken")
@@ -83,12 +90,12 @@ def handleStoryPage(db: 'psycopg2.connection', w: Web, stripeCount: int,
 		plog(traceback.format_exc())
 		raise
 
-def handlePage(db: 'psycopg2.connection', w: Web, stripeCount: int,
-		stripe: int) -> None:
+def handlePage(db: 'psycopg2.connection', writer: FFNContentWriter, w: Web,
+		stripeCount: int, stripe: int) -> None:
 	global storyUrlPrefix
 	assert(w.url is not None)
 	if w.url.startswith(storyUrlPrefix):
-		handleStoryPage(db, w, stripeCount, stripe)
+		handleStoryPage(db, writer, w, stripeCount, stripe)
 		return
 
 def main(db: 'psycopg2.connection') -> None:
@@ -126,7 +133,14 @@ def main(db: 'psycopg2.connection') -> None:
 	plog(f"from {start} to {end}")
 	blockSize = 1000 * stripeCount
 
-	FFNFicContent.createStripeTable(db, stripe)
+	# postgres routes chapters to their partitions; with partitions of this
+	# stripeCount, this stripe's all land in the one for it
+	partitionCount = FFNFicContent.partitionStripeCount(db)
+	if partitionCount is None:
+		plog("FFNFicContent has no complete set of partitions, run "
+				+ "partition_story_content.py stripeCount first")
+		sys.exit(1)
+	plog(f"partitions: {partitionCount}")
 
 	fidx = start - blockSize
 	while fidx < end:
@@ -135,12 +149,17 @@ def main(db: 'psycopg2.connection') -> None:
 		plog(f"  doing ids [{fidx}, {eidx})")
 
 		try:
-			with db:
+			# chapters are written a batch at a time, and all of them before the
+			# block commits
+			with db, FFNContentWriter(db, stripe, blobs = useContentBlobs,
+					history = keepContentHistory) as writer:
 				for s in Web.fetchIdRange_g(db, fidx, eidx,
 						ulike='https://www.fanfiction.net/s/%/%'):
 					if s.response is None or len(s.response) < 1:
 						continue
-					handlePage(db, s, stripeCount, stripe)
+					handlePage(db, writer, s, stripeCount, stripe)
+			plog(f"    {writer.inserted} inserted, {writer.updated} updated, "
+					+ f"{writer.skipped} unchanged")
 		except SystemExit as e:
 			raise
 		except:
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# reparse story metadata out of the Web table:
+#   one reader streams wid blocks, a pool of workers decodes and parses them,
+#   and a single writer upserts FFNUser/FFNFic rows in large transactions
+import os
+import sys
+import queue
+import traceback
+import multiprocessing
+import psycopg2
+from typing import Any, Dict, List, Optional, Set, Tuple
+from oil import oil
+import oil.util as util
+from weaver import Web
+import weaver.enc as enc
+from minerva import FFNBatchWriter, FFNFandomResolver, FFNParser, FFNFic, \
+		FFNUser, extractFFNDeathCode
+
+storyUrlPrefix = 'https://www.fanfiction.net/s/'
+logFileName = './process_story_meta.log'
+checkpointFileName = './process_story_meta.checkpoint'
+
+blockSize = 1000
+# records buffered by the writer before it commits
+transactionSize = 20000
+# seconds runPipeline waits on a queue or child before checking the others
+pollInterval = 5
+
+# (wid, url, created, response)
+RawPage = Tuple[int, str, int, bytes]
+# (blockStart, blockEnd, records, errors, deadCount)
+ParsedBlock = Tuple[int, int, List[Tuple[FFNFic, FFNUser]],
+		List[Tuple[int, str]], int]
+
+def plog(msg: str) -> None:
+	global logFileName
+	print(msg)
+	util.logMessage(msg, fname = logFileName, logDir = './')
+
+def readCheckpoint() -> Optional[int]:
+	if not os.path.exists(checkpointFileName):
+		return None
+	with open(checkpointFileName) as f:
+		return int(f.read().strip())
+
+def writeCheckpoint(wid: int) -> None:
+	tmpName = checkpointFileName + '.tmp'
+	with open(tmpName, 'w') as f:
+		f.write(f'{wid}\n')
+	os.replace(tmpName, checkpointFileName)
+
+def parseBlock(parser: FFNParser, fidx: int, eidx: int, pages: List[RawPage]
+		) -> ParsedBlock:
+	toParse: List[Tuple[int, int, str]] = []
+	errors: List[Tuple[int, str]] = []
+	deadCount = 0
+	for wid, url, created, response in pages:
+		fid = -1
+		try:
+			fid = int(url[len(storyUrlPrefix):].split('/')[0])
+			dec = enc.decode(response, url)
+			if dec is None:
+				errors += [(fid, f'wid {wid}: unknown encoding')]
+				continue
+			html = dec[1]
+			if extractFFNDeathCode(html) != 0:
+				deadCount += 1
+				continue
+			toParse += [(fid, int(created / 1000), html)]
+		except SystemExit:
+			raise
+		except:
+			errors += [(fid, f'wid {wid}: {traceback.format_exc()}')]
+
+	parseErrors: List[Tuple[int, str]] = []
+	records = parser.parseMany(toParse, parseErrors)
+	errors += parseErrors
+	return (fidx, eidx, records, errors, deadCount)
+
+def readBlocks(db: 'psycopg2.connection', fidx: int, eidx: int
+		) -> List[RawPage]:
+	pages: List[RawPage] = []
+	with db:
+		for w in Web.fetchIdRange_g(db, fidx, eidx,
+				ulike='https://www.fanfiction.net/s/%/%'):
+			if w.response is None or len(w.response) < 1:
+				continue
+			assert(w.id is not None and w.url is not None and w.created is not None)
+			pages += [(w.id, w.url, w.created, bytes(w.response))]
+	return pages
+
+# the writer counts these sentinels, so one is sent even if parsing fails
+def parseWorker(inq: Any, outq: Any) -> None:
+	try:
+		parser = FFNParser()
+		while True:
+			task = inq.get()
+			if task is None:
+				break
+			fidx, eidx, pages = task
+			outq.put(parseBlock(parser, fidx, eidx, pages))
+	finally:
+		outq.put(None)
+
+class Checkpointer:
+	def __init__(self, start: int) -> None:
+		self.next = start
+		self.done: Set[int] = set()
+		self.ends: Dict[int, int] = {}
+
+	# blocks finish out of order; only advance over a contiguous prefix
+	def finish(self, fidx: int, eidx: int) -> Optional[int]:
+		self.done |= { fidx }
+		self.ends[fidx] = eidx
+		advanced = False
+		while self.next in self.done:
+			self.done.remove(self.next)
+			self.next = self.ends.pop(self.next)
+			advanced = True
+		return self.next if advanced else None
+
+def writeBlocks(writer: FFNBatchWriter, checkpointer: Checkpointer,
+		pending: List[Tuple[int, int]]) -> None:
+	writer.flush()
+	for fidx, eidx in pending:
+		wid = checkpointer.finish(fidx, eidx)
+		if wid is not None:
+			writeCheckpoint(wid)
+			plog(f"  committed through wid {wid}")
+
+def handleParsedBlock(block: ParsedBlock, writer: FFNBatchWriter,
+		pending: List[Tuple[int, int]]) -> int:
+	fidx, eidx, records, errors, deadCount = block
+	plog(f"  parsed [{fidx}, {eidx}): {len(records)} ok, {deadCount} dead, "
+			+ f"{len(errors)} broken")
+	for fid, err in errors:
+		plog(f"  {fid} is broken: {err.strip().splitlines()[-1]}")
+	writer.addMany(records)
+	pending += [(fidx, eidx)]
+	return len(records)
+
+def writerMain(outq: Any, workerCount: int, start: int) -> None:
+	with oil.open() as db:
+		writer = FFNBatchWriter(db, batchSize = transactionSize,
+				resolver = FFNFandomResolver(db))
+		checkpointer = Checkpointer(start)
+		pending: List[Tuple[int, int]] = []
+		buffered = 0
+		finished = 0
+		while finished < workerCount:
+			block = outq.get()
+			if block is None:
+				finished += 1
+				continue
+			buffered += handleParsedBlock(block, writer, pending)
+			if buffered >= transactionSize:
+				writeBlocks(writer, checkpointer, pending)
+				pending, buffered = [], 0
+		writeBlocks(writer, checkpointer, pending)
+		plog(f"wrote {writer.ficCount} fics, {writer.authorCount} users")
+
+def blockRanges(start: int, end: int) -> List[Tuple[int, int]]:
+	return [(fidx, min(fidx + blockSize, end))
+			for fidx in range(start, end, blockSize)]
+
+def runSerial(db: 'psycopg2.connection', start: int, end: int) -> None:
+	parser = FFNParser()
+	writer = FFNBatchWriter(db, batchSize = transactionSize,
+			resolver = FFNFandomResolver(db))
+	checkpointer = Checkpointer(start)
+	pending: List[Tuple[int, int]] = []
+	buffered = 0
+	for fidx, eidx in blockRanges(start, end):
+		plog(f"  doing ids [{fidx}, {eidx})")
+		block = parseBlock(parser, fidx, eidx, readBlocks(db, fidx, eidx))
+		buffered += handleParsedBlock(block, writer, pending)
+		if buffered >= transactionSize:
+			writeBlocks(writer, checkpointer, pending)
+			pending, buffered = [], 0
+	writeBlocks(writer, checkpointer, pending)
+	plog(f"wrote {writer.ficCount} fics, {writer.authorCount} users")
+
+def checkChildren(procs: List[Any]) -> None:
+	for p in procs:
+		if p.exitcode is not None and p.exitcode != 0:
+			raise Exception(f"{p.name} failed: {p.exitcode}")
+
+# a dead worker or writer would leave this blocked on a full queue forever
+def putChecked(q: Any, item: Any, procs: List[Any]) -> None:
+	while True:
+		checkChildren(procs)
+		try:
+			q.put(item, timeout = pollInterval)
+			return
+		except queue.Full:
+			pass
+
+def runPipeline(db: 'psycopg2.connection', start: int, end: int,
+		workerCount: int) -> None:
+	# bounded so a slow writer throttles the reader instead of piling up pages
+	inq: Any = multiprocessing.Queue(maxsize = workerCount * 2)
+	outq: Any = multiprocessing.Queue(maxsize = workerCount * 2)
+
+	workers = [multiprocessing.Process(target = parseWorker, args = (inq, outq),
+			name = f'worker {i}') for i in range(workerCount)]
+	writer = multiprocessing.Process(target = writerMain,
+			args = (outq, workerCount, start), name = 'writer')
+	procs = workers + [writer]
+	for p in procs:
+		p.start()
+
+	# any child failing stops the rest; blocks the writer didn't commit are
+	# past the checkpoint, so a rerun picks them up
+	try:
+		for fidx, eidx in blockRanges(start, end):
+			plog(f"  doing ids [{fidx}, {eidx})")
+			putChecked(inq, (fidx, eidx, readBlocks(db, fidx, eidx)), procs)
+		for _ in workers:
+			putChecked(inq, None, procs)
+		for p in procs:
+			while p.exitcode is None:
+				checkChildren(procs)
+				p.join(pollInterval)
+		checkChildren(procs)
+	except:
+		inq.cancel_join_thread()
+		for p in procs:
+			if p.is_alive():
+				p.terminate()
+		for p in procs:
+			p.join()
+		raise
+
+def main(db: 'psycopg2.connection') -> None:
+	if len(sys.argv) not in {1, 2, 3}:
+		print(f"usage: {sys.argv[0]} [start [workerCount]]")
+		sys.exit(1)
+
+	plog(f"using log {logFileName}")
+
+	maxId = Web.maxId(db)
+	plog(f"maxId: {maxId}")
+
+	roundTo = 100
+	start = 0
+	end = maxId
+	end = int((end + roundTo -1) / roundTo) * roundTo
+
+	checkpoint = readCheckpoint()
+	if checkpoint is not None:
+		start = checkpoint
+		plog(f"resuming from checkpoint {checkpoint}")
+	if len(sys.argv) >= 2:
+		start = int(sys.argv[1])
+
+	# leave a core for the reader and one for the writer
+	workerCount = max(1, (os.cpu_count() or 1) - 2)
+	if len(sys.argv) >= 3:
+		workerCount = int(sys.argv[2])
+
+	plog(f"from {start} to {end}")
+	plog(f"workerCount: {workerCount}")
+
+	if workerCount == 0:
+		runSerial(db, start, end)
+	else:
+		runPipeline(db, start, end, workerCount)
+
+if __name__ == '__main__':
+	with oil.open() as db:
+		main(db)
+	sys.exit(0)
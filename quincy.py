@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 import sys
 import psycopg2
-from bs4 import BeautifulSoup # type: ignore
 from oil import oil
 from weaver import Web, WebBase, RemoteWebScraper
 import weaver.enc as enc
@@ -91,7 +90,7 @@ def refreshMeta(db: 'psycopg2.connection', scraper: RemoteWebScraper, fid: int
 	try:
 		ffnParser = FFNParser()
 		ts = int(w.created / 1000)
-		pfic = ffnParser.get(db, fid, ts, BeautifulSoup(html, 'html5lib'))
+		pfic = ffnParser.getFromHtml(db, fid, ts, html)
 	except:
 		raise
 
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# rewrite a content table with a dictionary trained FFNContentCodec
+#   ./recompress_story_content.py stripe|main [zstd|zlib|codecId]
+# without a codecId a new codec (zstd if zstandard is installed) is trained on
+# a sample of the table first; pass the id it logs to resume. it works a batch
+# at a time and leaves alone rows upserted since they were read, so it can
+# run next to process_story_content.py
+import os
+import sys
+import time
+import psycopg2
+from typing import Optional
+from oil import oil
+import oil.util as util
+from minerva import FFNFicContent, FFNContentCodec
+
+logFileName = './recompress_story_content.log'
+
+sampleCount = 2000
+batchSize = 500
+# seconds between batches, leaving the archive disks to everything else
+pause = 0.25
+
+def plog(msg: str) -> None:
+	global logFileName
+	print(f'{int(time.time())}|{msg}')
+	util.logMessage(msg, fname = logFileName, logDir = './')
+
+def trainCodec(db: 'psycopg2.connection', stripe: Optional[int],
+		kind: Optional[str]) -> FFNContentCodec:
+	table = FFNFicContent.tableName(stripe)
+	samples = [c.content for c in FFNFicContent.sample(db, sampleCount, stripe)
+			if c.content is not None]
+	plog(f"training on {len(samples)} rows ({sum(map(len, samples))} bytes)")
+	codec = FFNContentCodec.train(db, samples, kind, stripe = stripe,
+			label = f'{table} sample of {len(samples)}')
+	plog(f"trained {codec.kind} codec {codec.id}, {len(codec.dict or b'')} "
+			+ "byte dictionary")
+	return codec
+
+def main(db: 'psycopg2.connection') -> None:
+	if len(sys.argv) not in {2, 3}:
+		print(f"usage: {sys.argv[0]} stripe|main [zstd|zlib|codecId]")
+		sys.exit(1)
+
+	stripe = None if sys.argv[1] == 'main' else int(sys.argv[1])
+	if stripe is not None:
+		global logFileName
+		logFileName = f'./recompress_story_content_{stripe}.log'
+	plog(f"using log {logFileName}")
+	plog(f"table: {FFNFicContent.tableName(stripe)}")
+
+	if len(sys.argv) == 3 and sys.argv[2].isdigit():
+		codec = FFNContentCodec.get(db, int(sys.argv[2]))
+		plog(f"resuming with {codec.kind} codec {codec.id}")
+	else:
+		kind = sys.argv[2] if len(sys.argv) == 3 else None
+		codec = trainCodec(db, stripe, kind)
+	assert(codec.id is not None)
+
+	fid, cid = -1, -1
+	rows, rewritten, raw, stored = 0, 0, 0, 0
+	start = time.time()
+	while True:
+		contents = FFNFicContent.fetchAfter(db, fid, cid, batchSize, stripe,
+				codec.id)
+		if len(contents) == 0:
+			break
+		last = contents[-1]
+		assert(last.fid is not None and last.cid is not None)
+		fid, cid = last.fid, last.cid
+
+		n, size = FFNFicContent.recompress(db, contents, codec, stripe)
+		rows += len(contents)
+		rewritten += n
+		raw += sum(len(c.content) for c in contents if c.content is not None)
+		stored += size
+
+		plog(f"  at {fid}/{cid}: {rewritten}/{rows} rows rewritten, "
+				+ f"{raw} => {stored} bytes ({stored / max(1, raw):.3f}), "
+				+ f"{rows / max(1.0, time.time() - start):.1f} rows/s")
+		time.sleep(pause)
+
+	plog(f"done: {rewritten}/{rows} rows rewritten, {raw} => {stored} bytes")
+
+if __name__ == '__main__':
+	# stay out of the way of the scrapers and reindexing
+	os.nice(10)
+	with oil.open() as db:
+		main(db)
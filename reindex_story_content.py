@@ -5,18 +5,35 @@ import math
 import time
 import signal
 import traceback
+import multiprocessing
+import multiprocessing.connection
 import psycopg2
 import elasticsearch.helpers # type: ignore
 from elasticsearch import Elasticsearch
-from typing import Any, List, Dict, Optional, Iterator
+from typing import Any, List, Dict, Optional, Iterable, Iterator, Tuple
 from oil import oil
 import oil.util as util
 import weaver.enc as enc
 from minerva import FFNFicContent
 from htmlView import HtmlView
+from mdCache import MdCache, contentHash, contentToMd
 
 logFileName = f'./reindex_story_content.log'
 
+# seconds a worker gets to convert one chapter before it's killed and replaced
+convertDeadline = 3.0
+# workers are also replaced after this many chapters to keep memory flat
+tasksPerWorker = 5000
+# converted markdown is cached by content hash, so a reindex of unchanged
+# chapters (after a mapping change, say) doesn't run HtmlView again
+mdCachePath = './md_cache.sqlite'
+mdCacheMaxBytes = 16 * 1024 * 1024 * 1024
+# chapters read from the database per round trip, and converted by the pool
+# per batch; with workerCount this bounds how many are held at once
+contentFetchSize = 100
+# empty chapters aren't indexed
+emptyHash = contentHash(b'')
+
 def plog(msg: str) -> None:
 	global logFileName
 	print(f'{int(time.time())}|{msg}')
@@ -54,12 +71,30 @@ class timeout:
 
 def htmlToMd(html: str) -> str:
 	with timeout(seconds=3):
-		v = HtmlView(html)
-		return  '\n'.join(v.text)
+		return '\n'.join(HtmlView().lines(html))
+
+def contentDoc(c: FFNFicContent, md: str) -> Dict[str, Any]:
+	return { '_id': f'{c.fid}/{c.cid}', 'fid': c.fid, 'cid': c.cid,
+			'content': md, }
+
+def dumpBroken(c: FFNFicContent, err: str) -> None:
+	plog(f"{c.wid} is broken")
+	assert(c.content is not None)
+	dec = enc.decode(c.content, f'{c.fid}/{c.cid}')
+	with open(f"./edump/edump_wid_{c.wid}.html", 'w') as f:
+		f.write(c.content.decode('utf-8', 'replace') if dec is None else dec[1])
+	plog(err)
 
-def handleContent(db: 'psycopg2.connection', c: FFNFicContent
-		) -> Optional[Dict[str, Any]]:
+def handleContent(db: 'psycopg2.connection', cache: Optional[MdCache],
+		c: FFNFicContent) -> Optional[Dict[str, Any]]:
 	#if fid % stripeCount != stripe: return
+	hash_ = c.getHash()
+	assert(hash_ is not None)
+	cached = None if cache is None else cache.get(hash_)
+	if cached is not None:
+		return contentDoc(c, cached)
+
+	assert(c.content is not None)
 	id_ = f'{c.fid}/{c.cid}'
 	dec = enc.decode(c.content, id_)
 	if dec is None:
@@ -69,33 +104,205 @@ def handleContent(db: 'psycopg2.connection', c: FFNFicContent
 	try:
 		# try to grab just the story content
 		md = htmlToMd(html)
+		if cache is not None:
+			cache.put(hash_, md)
 
-		return { '_id': id_, 'fid': c.fid, 'cid': c.cid, 'content': md, }
+		return contentDoc(c, md)
 		#res = es.index(index="ffn", id=id_, body=doc)
 		#print(res['result'])
 	except:
-		plog(f"{c.wid} is broken")
-		with open(f"./edump/edump_wid_{c.wid}.html", 'w') as f:
-			f.write(html)
-		plog(traceback.format_exc())
+		dumpBroken(c, traceback.format_exc())
 	return None
 
-def handleBlock(db: 'psycopg2.connection', fidx: int, eidx: int,
-		stripeCount: int, stripe: int) -> Iterator[Dict[str, Any]]:
-	for c in FFNFicContent.fetchWidRange(db, fidx, eidx, stripeCount, stripe):
-		if c.content is None or len(c.content) < 1:
+def convertWorker(conn: Any) -> None:
+	while True:
+		try:
+			task = conn.recv()
+		except EOFError:
+			break
+		if task is None:
+			break
+		seq, id_, content = task
+		try:
+			conn.send((seq, contentToMd(content, id_), None))
+		except SystemExit as e:
+			raise
+		except:
+			conn.send((seq, None, traceback.format_exc()))
+
+# one worker process and the task it's working on, if any
+class ConvertWorker:
+	def __init__(self) -> None:
+		self.conn, child = multiprocessing.Pipe()
+		self.proc = multiprocessing.Process(target = convertWorker,
+				args = (child,), daemon = True)
+		self.proc.start()
+		child.close()
+		self.seq: Optional[int] = None
+		self.started = 0.0
+		self.done = 0
+
+	def send(self, seq: int, id_: str, content: bytes) -> None:
+		self.conn.send((seq, id_, content))
+		self.seq = seq
+		self.started = time.monotonic()
+
+	def stop(self, kill: bool = False) -> None:
+		if kill:
+			self.proc.kill()
+		else:
+			try:
+				self.conn.send(None)
+			except (BrokenPipeError, OSError):
+				pass
+		self.proc.join()
+		self.conn.close()
+
+# converts chapters to markdown in worker processes. every chapter gets a
+# wall-clock deadline; a worker that misses it is killed and replaced, and
+# the chapter comes back as an error. results come back in input order
+class ConvertPool:
+	def __init__(self, workerCount: int, deadline: float = convertDeadline,
+			tasksPerWorker: int = tasksPerWorker) -> None:
+		self.deadline = deadline
+		self.tasksPerWorker = tasksPerWorker
+		self.workers = [ConvertWorker() for _ in range(workerCount)]
+
+	def replace(self, i: int, kill: bool = False) -> None:
+		self.workers[i].stop(kill)
+		self.workers[i] = ConvertWorker()
+
+	def close(self) -> None:
+		for w in self.workers:
+			w.stop(kill = w.seq is not None)
+		self.workers = []
+
+	# (key, id, content) => (key, markdown, error)
+	def map(self, tasks: Iterable[Tuple[Any, str, bytes]]
+			) -> Iterator[Tuple[Any, Optional[str], Optional[str]]]:
+		it = iter(tasks)
+		keys: Dict[int, Any] = {}
+		results: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+		seq, nextSeq = 0, 0
+		exhausted = False
+		try:
+			while True:
+				for i, w in enumerate(self.workers):
+					if exhausted or w.seq is not None:
+						continue
+					if w.done >= self.tasksPerWorker:
+						self.replace(i)
+						w = self.workers[i]
+					task = next(it, None)
+					if task is None:
+						exhausted = True
+						break
+					keys[seq] = task[0]
+					w.send(seq, task[1], task[2])
+					seq += 1
+
+				while nextSeq in results:
+					md, err = results.pop(nextSeq)
+					yield (keys.pop(nextSeq), md, err)
+					nextSeq += 1
+
+				busy = [i for i, w in enumerate(self.workers) if w.seq is not None]
+				if len(busy) == 0:
+					if exhausted:
+						return
+					continue
+
+				firstDeadline = min(self.workers[i].started for i in busy) \
+						+ self.deadline
+				ready = multiprocessing.connection.wait(
+						[self.workers[i].conn for i in busy],
+						timeout = max(0.0, firstDeadline - time.monotonic()))
+				for i in busy:
+					w = self.workers[i]
+					assert(w.seq is not None)
+					if w.conn in ready:
+						try:
+							rseq, md, err = w.conn.recv()
+						except EOFError:
+							results[w.seq] = (None, 'worker died')
+							self.replace(i, kill = True)
+							continue
+						results[rseq] = (md, err)
+						w.seq = None
+						w.done += 1
+					elif time.monotonic() - w.started > self.deadline:
+						results[w.seq] = (None,
+								f'timed out after {self.deadline}s')
+						self.replace(i, kill = True)
+		finally:
+			# abandoned part way (a failed bulk request); drop work in flight
+			for i, w in enumerate(self.workers):
+				if w.seq is not None:
+					self.replace(i, kill = True)
+
+def handleBlock(db: 'psycopg2.connection', pool: Optional[ConvertPool],
+		cache: Optional[MdCache], fidx: int, eidx: int, stripeCount: int,
+		stripe: int) -> Iterator[Dict[str, Any]]:
+	# with a stored hash, cached chapters are never decompressed
+	contents = (c for c in
+			FFNFicContent.fetchWidRange(db, fidx, eidx, stripeCount, stripe,
+				fetchSize = contentFetchSize)
+			if (c.storedSize is not None or c.content is not None)
+				and c.getHash() != emptyHash)
+	if pool is None:
+		for c in contents:
+			d = handleContent(db, cache, c)
+			if d is None:
+				continue
+			yield d
+		if cache is not None:
+			cache.flush()
+		return
+
+	# cache hits go straight out, misses go through the pool a fetch's worth
+	# at a time so neither piles up; elasticsearch doesn't care about order.
+	# misses are grouped by hash so a chapter body is only converted once
+	misses: Dict[bytes, List[FFNFicContent]] = {}
+	for c in contents:
+		hash_ = c.getHash()
+		assert(hash_ is not None)
+		if hash_ in misses:
+			misses[hash_] += [c]
 			continue
-		d = handleContent(db, c)
-		if d is None:
+		md = None if cache is None else cache.get(hash_)
+		if md is not None:
+			yield contentDoc(c, md)
 			continue
-		yield d
+		misses[hash_] = [c]
+		if len(misses) >= contentFetchSize:
+			yield from convertMisses(pool, cache, misses)
+			misses = {}
+	yield from convertMisses(pool, cache, misses)
+	if cache is not None:
+		cache.flush()
+
+def convertMisses(pool: ConvertPool, cache: Optional[MdCache],
+		misses: Dict[bytes, List[FFNFicContent]]) -> Iterator[Dict[str, Any]]:
+	tasks: List[Tuple[bytes, str, bytes]] = []
+	for hash_, cs in misses.items():
+		assert(cs[0].content is not None)
+		tasks += [(hash_, f'{cs[0].fid}/{cs[0].cid}', cs[0].content)]
+	for hash_, md, err in pool.map(tasks):
+		if md is None:
+			for c in misses[hash_]:
+				dumpBroken(c, err or 'no output')
+			continue
+		if cache is not None:
+			cache.put(hash_, md)
+		for c in misses[hash_]:
+			yield contentDoc(c, md)
 
 def main(db: 'psycopg2.connection', es: Any) -> None:
-	if len(sys.argv) not in {1, 2, 4}:
-		print(f"usage: {sys.argv[0]} [start [stripeCount stripe]]")
+	if len(sys.argv) not in {1, 2, 4, 5}:
+		print(f"usage: {sys.argv[0]} [start [stripeCount stripe [workerCount]]]")
 		sys.exit(1)
 	
-	if len(sys.argv) == 4:
+	if len(sys.argv) >= 4:
 		global logFileName
 		logFileName = f"./reindex_story_content_{sys.argv[2]}_{sys.argv[3]}.log"
 
@@ -119,8 +326,17 @@ def main(db: 'psycopg2.connection', es: Any) -> None:
 		stripeCount = int(sys.argv[2])
 		stripe = int(sys.argv[3])
 
+	# leave a core for reading content and feeding elasticsearch
+	workerCount = max(1, (os.cpu_count() or 1) - 1)
+	if len(sys.argv) >= 5:
+		workerCount = int(sys.argv[4])
+
 	plog(f"stripe: {stripe}")
 	plog(f"stripeCount: {stripeCount}")
+	plog(f"workerCount: {workerCount}")
+	# 0 converts in-process under a SIGALRM timeout instead
+	pool = ConvertPool(workerCount) if workerCount > 0 else None
+	cache = MdCache(mdCachePath, mdCacheMaxBytes)
 
 	plog(f"from {start} to {end}")
 	blockSize = 5000 * stripeCount
@@ -140,7 +356,9 @@ def main(db: 'psycopg2.connection', es: Any) -> None:
 				time.sleep(5)
 			try:
 				elasticsearch.helpers.bulk(client=es, index='ffn',
-						actions=handleBlock(db, fidx, eidx, stripeCount, stripe))
+						actions=handleBlock(db, pool, cache, fidx, eidx, stripeCount,
+							stripe))
+				plog(f"  cache: {cache.hits} hits, {cache.misses} misses")
 				cnt += 1
 				success = True
 			except SystemExit as e:
@@ -152,6 +370,10 @@ def main(db: 'psycopg2.connection', es: Any) -> None:
 			plog(f"  permanent trouble in ids [{fidx}, {eidx})")
 			raise Exception('block failed')
 
+	if pool is not None:
+		pool.close()
+	cache.close()
+
 if __name__ == '__main__':
 	if not os.path.exists('./edump/'):
 		os.makedirs('./edump/')
@@ -75,6 +75,25 @@ create table FFNFic (
 create index FFNUserFic_idx on FFNFic (authorId, id);
 create index FFNFicChapterCount_idx on FFNFic (chapterCount, id);
 
+create index if not exists FFNCharacterFandomName_idx
+	on FFNCharacter (fandomId, name);
+
+create table if not exists FFNFicGenre (
+	fid bigint not null references FFNFic(id),
+	genreId smallint not null references FFNGenre(id),
+
+	primary key(fid, genreId)
+);
+
+-- pairing is 0 for loose characters, n for the nth [A, B] pairing
+create table if not exists FFNFicCharacter (
+	fid bigint not null references FFNFic(id),
+	characterId bigint not null references FFNCharacter(id),
+	pairing smallint not null default(0),
+
+	primary key(fid, characterId)
+);
+
 create table FFNFicGraveyard (
 	id bigint not null primary key,
 	code smallint not null,
@@ -120,6 +139,40 @@ create table if not exists FFNFicCrossoverDelayed (
 	fandomId2 bigint
 );
 
+-- compression dictionaries for FFNFicContent, trained per stripe or era
+create table if not exists FFNContentCodec (
+	id smallserial primary key,
+	kind varchar(16) not null, -- 'zstd' or 'zlib'
+	level smallint not null,
+	stripe smallint, -- null for codecs trained across stripes
+	label varchar(256),
+	dict bytea not null,
+	created oil_timestamp not null
+);
+
+-- FFNFicContent is hash partitioned on fid with a "hash" that makes
+-- partition r of n hold fids where fid % n = r, the same striping
+-- process_story_content.py uses, so each writer fills its own partition.
+-- postgres adds 0x49a0f4dd15e5a8e3 to a single column's hash before taking
+-- the modulus; this takes it back off. creating the operator class needs a
+-- superuser
+create or replace function FFNFidStripeHash(fid int8, seed int8)
+returns int8 language sql immutable parallel safe as $$
+	select fid - 5305509591434766563
+$$;
+
+do $$ begin
+	if not exists (select 1 from pg_opclass where opcname = 'ffnfidstripeops')
+	then
+		create operator class FFNFidStripeOps for type int8 using hash as
+			operator 1 =,
+			function 2 FFNFidStripeHash(int8, int8);
+	end if;
+end $$;
+
+-- partitions are FFNFicContent_{stripe}, all of one stripeCount, created by
+-- partition_story_content.py stripeCount (which also converts a table created
+-- before partitioning and attaches the old stripe tables)
 create table if not exists FFNFicContent (
 	fid bigint not null,
 	cid int4 not null,
@@ -127,10 +180,52 @@ create table if not exists FFNFicContent (
 	wid bigint,
 
 	content bytea,
+	-- null for plain oil.util.compress
+	codecId smallint references FFNContentCodec(id),
+	-- blake2b (20 bytes) of the uncompressed content; rows written with blobs
+	-- have a null content and codecId and find their content by it in
+	-- FFNContentBlob
+	hash bytea,
 
 	primary key(fid, cid)
 	-- fetched oil_timestamp not null,
 	-- updated oil_timestamp not null,
 	-- published oil_timestamp not null,
+) partition by hash (fid FFNFidStripeOps) tablespace ffn_archive;
+
+-- for tables created before FFNContentCodec
+alter table FFNFicContent add column if not exists
+	codecId smallint references FFNContentCodec(id);
+-- and before content hashes
+alter table FFNFicContent add column if not exists hash bytea;
+
+-- for reindexing and exporting by wid range
+create index if not exists FFNFicContentWid_idx on FFNFicContent (wid);
+
+-- earlier revisions of FFNFicContent rows, kept in history mode. each is a
+-- delta ('zstd' or 'zlib') of its content against the current content of
+-- the row, which has hash baseHash
+create table if not exists FFNFicContentRevision (
+	id bigserial primary key,
+	fid bigint not null,
+	cid int4 not null,
+	wid bigint,
+	kind varchar(16) not null,
+	delta bytea not null,
+	hash bytea not null,
+	baseHash bytea not null,
+	size int not null, -- of the content
+	storedSize int not null, -- of the row it was before it was replaced
+	created oil_timestamp not null
+) tablespace ffn_archive;
+
+create index if not exists FFNFicContentRevision_idx
+	on FFNFicContentRevision (fid, cid);
+
+-- chapter bodies stored once however many FFNFicContent rows share them
+create table if not exists FFNContentBlob (
+	hash bytea primary key,
+	content bytea not null,
+	codecId smallint references FFNContentCodec(id)
 ) tablespace ffn_archive;
 
@@ -1,15 +1,26 @@
 from minerva.ffn import (
+	FFNBatchWriter,
 	FFNCategory,
 	FFNCharacter,
 	FFNCommunity,
 	FFNFandomDeltaResult,
+	FFNDeathRules, extractFFNDeathCode, extractFFNUserDeathCode,
+	extractFFNCommunityDeathCode,
 	FFNFandom,
-	FFNFic, extractFFNDeathCode,
+	FFNFandomResolver,
+	FFNFic,
 	FFNFicGraveyard,
 	FFNFicContent,
+	FFNContentCodec,
+	FFNContentWriter,
+	FFNContentArchive,
+	FFNContentRevision,
 	FFNGenre,
 	FFNLanguage,
+	FFNListingEntry,
+	FFNMetaSpan,
 	FFNParser,
+	FFNStoryPage,
 	FFNUser,
 )
 from minerva.status import Status
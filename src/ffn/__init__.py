@@ -1,12 +1,23 @@
+from minerva.ffn.batch_writer import FFNBatchWriter
 from minerva.ffn.category import FFNCategory
 from minerva.ffn.character import FFNCharacter
 from minerva.ffn.community import FFNCommunity
 from minerva.ffn.fandom_delta_result import FFNFandomDeltaResult
+from minerva.ffn.death_code import FFNDeathRules, extractFFNDeathCode, \
+		extractFFNUserDeathCode, extractFFNCommunityDeathCode
 from minerva.ffn.fandom import FFNFandom
-from minerva.ffn.fic import FFNFic, extractFFNDeathCode
+from minerva.ffn.fandom_resolver import FFNFandomResolver
+from minerva.ffn.fic import FFNFic
 from minerva.ffn.graveyard import FFNFicGraveyard
 from minerva.ffn.content import FFNFicContent
+from minerva.ffn.content_codec import FFNContentCodec
+from minerva.ffn.content_writer import FFNContentWriter
+from minerva.ffn.content_archive import FFNContentArchive
+from minerva.ffn.content_revision import FFNContentRevision
 from minerva.ffn.genre import FFNGenre
 from minerva.ffn.language import FFNLanguage
+from minerva.ffn.listing import FFNListingEntry
+from minerva.ffn.meta import FFNMetaSpan
 from minerva.ffn.parser import FFNParser
+from minerva.ffn.story_page import FFNStoryPage
 from minerva.ffn.user import FFNUser
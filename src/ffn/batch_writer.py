@@ -0,0 +1,58 @@
+from typing import TYPE_CHECKING, Iterable, List, Tuple
+if TYPE_CHECKING:
+	import psycopg2
+from minerva.ffn.fandom_resolver import FFNFandomResolver
+from minerva.ffn.fic import FFNFic
+from minerva.ffn.user import FFNUser
+
+# buffers parsed fic/author records (see FFNParser.parseMany) and persists
+# them in grouped statements instead of one round trip per fic; with a
+# resolver, fandom ids are filled in from each fic's pre_story_links first
+class FFNBatchWriter:
+	def __init__(self, db: 'psycopg2.connection', batchSize: int = 1000,
+			resolver: FFNFandomResolver = None) -> None:
+		self.db = db
+		self.batchSize = batchSize
+		self.resolver = resolver
+		self.fics: List[FFNFic] = []
+		self.authors: List[FFNUser] = []
+		self.ficCount = 0
+		self.authorCount = 0
+
+	def add(self, fic: FFNFic, author: FFNUser) -> None:
+		self.fics += [fic]
+		self.authors += [author]
+		if len(self.fics) >= self.batchSize:
+			self.flush()
+
+	def addMany(self, records: Iterable[Tuple[FFNFic, FFNUser]]) -> None:
+		for fic, author in records:
+			self.add(fic, author)
+
+	def flush(self) -> int:
+		if len(self.fics) == 0:
+			return 0
+		if self.resolver is not None:
+			self.resolveFandoms()
+		# authors first, fics reference them
+		self.authorCount += FFNUser.upsertMany(self.db, self.authors)
+		written = FFNFic.upsertMany(self.db, self.fics)
+		self.ficCount += written
+		self.fics, self.authors = [], []
+		return written
+
+	def resolveFandoms(self) -> None:
+		assert(self.resolver is not None)
+		unresolved = [f for f in self.fics if not self.resolver.resolve(f)]
+		# write any new fandoms in one go, then pick up their ids
+		self.resolver.flush()
+		for f in unresolved:
+			self.resolver.resolve(f)
+
+	def __enter__(self) -> 'FFNBatchWriter':
+		return self
+
+	def __exit__(self, exc_type: object, exc_value: object, traceback: object
+			) -> None:
+		if exc_type is None:
+			self.flush()
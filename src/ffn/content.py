@@ -1,48 +1,163 @@
-from typing import TYPE_CHECKING, Any, Iterator
+from typing import TYPE_CHECKING, IO, Any, Dict, Iterable, Iterator, List, \
+		Optional, Set, Tuple
 if TYPE_CHECKING:
 	import psycopg2
-from oil.util import compress, uncompress
+import io
+import re
+import struct
+import itertools
+from minerva.ffn.content_codec import FFNContentCodec, contentHash
+from minerva.ffn.content_revision import FFNContentRevision
 
+# rows written with blobs have a null content and codecId; theirs are looked up
+# in FFNContentBlob by hash, and only for those rows
+blobContent = '''coalesce(ffc.content, (select ffb.content
+	from FFNContentBlob ffb where ffb.hash = ffc.hash))'''
+blobCodecId = '''case when ffc.content is not null then ffc.codecId
+	else (select ffb.codecId from FFNContentBlob ffb where ffb.hash = ffc.hash)
+	end'''
+
+contentColumns = \
+		f'ffc.fid, ffc.cid, ffc.wid, {blobContent}, {blobCodecId}, ffc.hash'
+# the same row shape without reading content, just its stored size
+skipContentColumns = f'''ffc.fid, ffc.cid, ffc.wid, null, {blobCodecId},
+	ffc.hash, octet_length({blobContent})'''
+# just what's in the row itself
+rowColumns = 'ffc.fid, ffc.cid, ffc.wid, ffc.content, ffc.codecId, ffc.hash'
+
+# rows fetched per round trip by the scans below; each is a whole compressed
+# chapter, so this is what bounds their memory
+defaultFetchSize = 100
+scanIds = itertools.count()
+
+# a named cursor, so rows stay on the server until they're iterated to
+def scanCursor(db: 'psycopg2.connection', fetchSize: int) -> Any:
+	curs = db.cursor(name = f'ffnficcontent_scan_{next(scanIds)}')
+	curs.itersize = fetchSize
+	return curs
+
+# a pre-partitioning FFNFicContent is renamed to this while its rows are moved
+# into the partitioned table
+unpartitionedTable = 'FFNFicContent_unpartitioned'
+
+# COPY's binary format: a header, then per row a field count and each field
+# as its length (-1 for null) and network order value, then a -1 trailer
+copyHeader = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+copyFields = struct.pack('!h', 6)
+copyNull = struct.pack('!i', -1)
+copyBigint = struct.Struct('!iq')
+copyInt = struct.Struct('!ii')
+copySmallint = struct.Struct('!ih')
+copyLength = struct.Struct('!i')
+
+# (fid, cid, wid, content, codecId, hash) rows
+def copyBinary(rows: Iterable[Tuple[int, int, Optional[int], Optional[bytes],
+		Optional[int], bytes]]) -> bytes:
+	buf = [copyHeader]
+	for fid, cid, wid, content, codecId, hash_ in rows:
+		buf += [copyFields, copyBigint.pack(8, fid), copyInt.pack(4, cid),
+				copyNull if wid is None else copyBigint.pack(8, wid),
+				copyNull if content is None else copyLength.pack(len(content)),
+				content or b'',
+				copyNull if codecId is None else copySmallint.pack(2, codecId),
+				copyLength.pack(len(hash_)), hash_]
+	buf += [struct.pack('!h', -1)]
+	return b''.join(buf)
+
+# content is kept as a view of the compressed column until it's first read
 class FFNFicContent:
 	def __init__(self, fid_: int = None, cid_: int = None, wid_: int = None,
-			content_: bytes = None):
+			content_: bytes = None, codecId_: int = None,
+			compressed_: memoryview = None, codec_: FFNContentCodec = None,
+			storedSize_: int = None, hash_: bytes = None):
 		self.fid = fid_
 		self.cid = cid_
 		self.wid = wid_
-		self.content = content_
+		self.__content = content_
+		self.codecId = codecId_
+		self.compressed = compressed_
+		self.codec = codec_
+		# bytes in the content column, also known for rows fetched without it
+		self.storedSize = storedSize_
+		self.hash = hash_
 
+	@property
+	def content(self) -> Optional[bytes]:
+		if self.__content is None and self.compressed is not None:
+			self.__content = FFNContentCodec.unpack(self.codec, self.compressed)
+			self.compressed = None
+		return self.__content
+
+	@content.setter
+	def content(self, content: Optional[bytes]) -> None:
+		self.__content = content
+		self.compressed = None
+		self.hash = None
+
+	# the stored hash, or for rows written before there was one the hash of
+	# content (which means decompressing it)
+	def getHash(self) -> Optional[bytes]:
+		if self.hash is None and self.content is not None:
+			self.hash = contentHash(self.content)
+		return self.hash
+
+	# decompress into out a piece at a time without keeping the result; if
+	# content has already been read it's written as is. returns its length
+	def writeContent(self, out: IO[bytes]) -> int:
+		if self.compressed is None:
+			if self.__content is None:
+				return 0
+			out.write(self.__content)
+			return len(self.__content)
+		return FFNContentCodec.unpackTo(self.codec, self.compressed, out)
+
+	# db is only used to load a codec this process hasn't seen yet
 	@staticmethod
-	def fromRow(row: Any) -> 'FFNFicContent':
+	def fromRow(row: Any, db: 'psycopg2.connection' = None
+			) -> 'FFNFicContent':
 		return FFNFicContent(
 				fid_ = row[0],
 				cid_ = row[1],
 				wid_ = row[2],
-				content_ = None if row[3] is None else uncompress(row[3].tobytes()),
+				codecId_ = row[4],
+				compressed_ = row[3],
+				codec_ = None if row[4] is None \
+					else FFNContentCodec.get(db, row[4]),
+				storedSize_ = len(row[3]) if row[3] is not None \
+					else row[6] if len(row) > 6 else None,
+				hash_ = None if row[5] is None else bytes(row[5]),
 			)
 
+	# fid is cast to match the partition key, so only its partition is read
 	@staticmethod
-	def fetch(db: 'psycopg2.connection', fid: int) -> Iterator['FFNFicContent']:
-		with db, db.cursor() as curs:
-			curs.execute('''
-				select * from FFNFicContent ffc
-				where ffc.fid = %s
+	def fetch(db: 'psycopg2.connection', fid: int, withContent: bool = True,
+			fetchSize: int = defaultFetchSize) -> Iterator['FFNFicContent']:
+		columns = contentColumns if withContent else skipContentColumns
+		with db, scanCursor(db, fetchSize) as curs:
+			curs.execute(f'''
+				select {columns} from FFNFicContent ffc
+				where ffc.fid = %s::bigint
 				order by ffc.cid asc
 			''', (fid,))
 			for r in curs:
-				yield FFNFicContent.fromRow(r)
+				yield FFNFicContent.fromRow(r, db)
 
+	# withContent=False leaves content None (see storedSize) for scans that
+	# don't need it
 	@staticmethod
 	def fetchWidRange(db: 'psycopg2.connection', beg: int, end: int,
-			stripeCount: int = 1, stripe: int = 0) -> Iterator['FFNFicContent']:
-		with db, db.cursor() as curs:
-			curs.execute('''
-				select * from FFNFicContent ffc
+			stripeCount: int = 1, stripe: int = 0, withContent: bool = True,
+			fetchSize: int = defaultFetchSize) -> Iterator['FFNFicContent']:
+		columns = contentColumns if withContent else skipContentColumns
+		with db, scanCursor(db, fetchSize) as curs:
+			curs.execute(f'''
+				select {columns} from FFNFicContent ffc
 				where (ffc.wid between %s and %s)
 					and (ffc.wid %% %s = %s)
 				order by ffc.wid asc
 			''', (beg, end, stripeCount, stripe))
 			for r in curs:
-				yield FFNFicContent.fromRow(r)
+				yield FFNFicContent.fromRow(r, db)
 
 	@staticmethod
 	def maxWid(db: 'psycopg2.connection') -> int:
@@ -52,31 +167,484 @@ class FFNFicContent:
 			return 0 if r is None else int(r[0])
 
 	@staticmethod
-	def createStripeTable(db: 'psycopg2.connection', stripe: int) -> None:
+	def isPartitioned(db: 'psycopg2.connection') -> bool:
 		with db, db.cursor() as curs:
+			curs.execute('''
+				select exists(select 1 from pg_partitioned_table
+					where partrelid = to_regclass('FFNFicContent'))''')
+			r = curs.fetchone()
+			return r is not None and bool(r[0])
+
+	# {stripe: modulus} of FFNFicContent's partitions
+	@staticmethod
+	def partitions(db: 'psycopg2.connection') -> Dict[int, int]:
+		with db, db.cursor() as curs:
+			curs.execute('''
+				select pg_get_expr(c.relpartbound, c.oid) from pg_inherits i
+				join pg_class c on c.oid = i.inhrelid
+				where i.inhparent = to_regclass('FFNFicContent')''')
+			res: Dict[int, int] = {}
+			for r in curs.fetchall():
+				m = re.search('modulus ([0-9]+), remainder ([0-9]+)', str(r[0]))
+				if m is None:
+					raise Exception(f"unexpected FFNFicContent partition: {r[0]}")
+				res[int(m.group(2))] = int(m.group(1))
+			return res
+
+	# the stripeCount FFNFicContent is partitioned into, or None if it doesn't
+	# have a partition for every stripe of one yet
+	@staticmethod
+	def partitionStripeCount(db: 'psycopg2.connection') -> Optional[int]:
+		parts = FFNFicContent.partitions(db)
+		counts = set(parts.values())
+		if len(counts) != 1:
+			return None
+		stripeCount = counts.pop()
+		return stripeCount if len(parts) == stripeCount else None
+
+	# create whichever partitions of stripeCount don't exist yet, in one go;
+	# the ones there, attached old stripe tables say, must be of stripeCount too
+	@staticmethod
+	def createPartitions(db: 'psycopg2.connection', stripeCount: int) -> None:
+		if not FFNFicContent.isPartitioned(db):
+			raise Exception("FFNFicContent isn't partitioned yet")
+		parts = FFNFicContent.partitions(db)
+		if any(m != stripeCount for m in parts.values()):
+			raise Exception("FFNFicContent is already partitioned into "
+					+ f"{sorted(set(parts.values()))} stripes, not {stripeCount}")
+		with db, db.cursor() as curs:
+			for stripe in range(stripeCount):
+				if stripe in parts:
+					continue
+				curs.execute(f'''
+					create table {FFNFicContent.tableName(stripe)}
+					partition of FFNFicContent
+					for values with (modulus %s, remainder %s)
+					tablespace ffn_archive''', (stripeCount, stripe))
+
+	# rename a plain FFNFicContent out of the way (see unpartitionedTable) and
+	# create the partitioned one in its place
+	@staticmethod
+	def createPartitioned(db: 'psycopg2.connection') -> None:
+		with db, db.cursor() as curs:
+			curs.execute('''
+				alter table FFNFicContent add column if not exists hash bytea''')
+			curs.execute(f'alter table FFNFicContent rename to {unpartitionedTable}')
+			curs.execute(f'''
+				alter index if exists FFNFicContent_pkey
+				rename to {unpartitionedTable}_pkey''')
 			curs.execute(f'''
-				create table if not exists FFNFicContent_{stripe} (
+				alter index if exists FFNFicContentWid_idx
+				rename to {unpartitionedTable}_wid_idx''')
+			curs.execute('''
+				create table FFNFicContent (
 					fid bigint not null,
 					cid int4 not null,
 					wid bigint,
 					content bytea,
+					codecId smallint references FFNContentCodec(id),
+					hash bytea,
 
 					primary key(fid, cid)
-				) tablespace ffn_archive;''')
+				) partition by hash (fid FFNFidStripeOps)
+				tablespace ffn_archive''')
+			curs.execute('''
+				create index FFNFicContentWid_idx on FFNFicContent (wid)''')
+
+	# make an old stripe table the partition it already holds the rows for.
+	# this scans it to check; if any row belongs elsewhere (it was written with
+	# a different stripeCount, say) the table is renamed with an _old suffix
+	# instead and the new name returned so its rows can be moved
+	@staticmethod
+	def attachPartition(db: 'psycopg2.connection', stripeCount: int,
+			stripe: int) -> Optional[str]:
+		import psycopg2
+		table = FFNFicContent.tableName(stripe)
+		with db, db.cursor() as curs:
+			curs.execute(f'''
+				alter table {table}
+				add column if not exists
+					codecId smallint references FFNContentCodec(id),
+				add column if not exists hash bytea''')
+		if stripe < stripeCount:
+			try:
+				with db, db.cursor() as curs:
+					curs.execute(f'''
+						alter table FFNFicContent attach partition {table}
+						for values with (modulus %s, remainder %s)''',
+						(stripeCount, stripe))
+				return None
+			except psycopg2.errors.CheckViolation:
+				pass
+		with db, db.cursor() as curs:
+			curs.execute(f'alter table {table} rename to {table}_old')
+			curs.execute(f'''
+				alter index if exists {table}_pkey rename to {table}_old_pkey''')
+		return f'{table}_old'
+
+	# FFNFicContent_* tables that aren't partitions: stripe tables from before
+	# partitioning, and tables partition_story_content.py is moving rows out of
+	@staticmethod
+	def looseTables(db: 'psycopg2.connection') -> List[str]:
+		with db, db.cursor() as curs:
+			curs.execute('''
+				select c.relname from pg_class c
+				where c.relname like 'ffnficcontent\\_%'
+					and c.relkind = 'r' and not c.relispartition
+					and c.relnamespace = to_regnamespace(current_schema())
+				order by c.relname''')
+			return [str(r[0]) for r in curs.fetchall()]
+
+	# move up to limit rows after (fid, cid) with fid % stripeCount = stripe
+	# from source into FFNFicContent, where postgres routes them to their
+	# partition. when a row is already there the one with the later wid wins,
+	# and the revisions of one it replaces are kept up (see keepReplaced).
+	# returns the number of rows moved and the last (fid, cid) looked at, or
+	# None when there are none left
+	@staticmethod
+	def moveRows(db: 'psycopg2.connection', source: str, fid: int, cid: int,
+			limit: int, stripeCount: int = 1, stripe: int = 0
+			) -> Tuple[int, Optional[Tuple[int, int]]]:
+		batch = f'''
+			select s.fid, s.cid from {source} s
+			where (s.fid, s.cid) > (%s, %s)
+				and s.fid %% %s = %s
+			order by s.fid, s.cid
+			limit %s'''
+		args = (fid, cid, stripeCount, stripe, limit)
+		with db, db.cursor() as curs:
+			curs.execute(f'''
+				with batch as ({batch})
+				select {contentColumns} from {source} ffc
+				join batch b on ffc.fid = b.fid and ffc.cid = b.cid
+				join FFNFicContent t on t.fid = ffc.fid and t.cid = ffc.cid
+				where (t.wid is null or ffc.wid > t.wid)
+					and t.hash is distinct from ffc.hash
+					and exists(select 1 from FFNFicContentRevision ffcr
+						where ffcr.fid = ffc.fid and ffcr.cid = ffc.cid)
+				for update of t''', args)
+			replacing: Dict[Tuple[int, int], bytes] = {}
+			for r in curs.fetchall():
+				c = FFNFicContent.fromRow(r, db)
+				assert(c.fid is not None and c.cid is not None)
+				if c.content is not None:
+					replacing[(c.fid, c.cid)] = c.content
+			FFNFicContent.keepReplaced(db, replacing)
+
+			curs.execute(f'''
+				with batch as ({batch}), moved as (
+					delete from {source} s using batch b
+					where s.fid = b.fid and s.cid = b.cid
+					returning s.fid, s.cid, s.wid, s.content, s.codecId, s.hash
+				), merged as (
+					insert into FFNFicContent as ffc(fid, cid, wid, content, codecId,
+						hash)
+					select fid, cid, wid, content, codecId, hash from moved
+					on conflict(fid, cid) do update
+						set wid = excluded.wid, content = excluded.content,
+							codecId = excluded.codecId, hash = excluded.hash
+						where ffc.wid is null or excluded.wid > ffc.wid
+					returning 1
+				)
+				select (select count(*) from moved), b.fid, b.cid
+				from (select 1) one
+				left join (select fid, cid from batch
+					order by fid desc, cid desc limit 1) b on true
+			''', args)
+			r = curs.fetchone()
+			if r is None or r[1] is None:
+				return (0, None)
+			return (int(r[0]), (int(r[1]), int(r[2])))
+
+	# drop source if moveRows has emptied it
+	@staticmethod
+	def dropIfEmpty(db: 'psycopg2.connection', source: str) -> bool:
+		with db, db.cursor() as curs:
+			curs.execute(f'lock table {source}')
+			curs.execute(f'select exists(select 1 from {source})')
+			r = curs.fetchone()
+			if r is None or bool(r[0]):
+				return False
+			curs.execute(f'drop table {source}')
+			return True
+
+	# the whole table, or just the partition holding stripe
+	@staticmethod
+	def tableName(stripe: int = None) -> str:
+		return 'FFNFicContent' if stripe is None else f'FFNFicContent_{stripe}'
 
+	# stripe only picks the codec; postgres puts the row in its partition. a
+	# chapter stored with the same content is left as it is, wid included.
+	# like every write, one that replaces a chapter with revisions keeps its
+	# content as another (see keepReplaced)
 	@staticmethod
 	def upsert(db: 'psycopg2.connection', fid: int, cid: int, wid: int,
 			content: str, stripe: int = None) -> 'FFNFicContent':
-		table = 'FFNFicContent' if stripe is None else f'FFNFicContent_{stripe}'
+		raw = content.encode('utf-8')
+		hash_ = contentHash(raw)
 		with db.cursor() as curs:
+			curs.execute('''
+				select ffc.hash from FFNFicContent ffc
+				where ffc.fid = %s::bigint and ffc.cid = %s
+				for update''', (fid, cid))
+			r = curs.fetchone()
+			if r is not None and r[0] is not None and bytes(r[0]) == hash_:
+				# unchanged, so there's nothing to compress
+				curs.execute(f'''
+					select {contentColumns} from FFNFicContent ffc
+					where ffc.fid = %s::bigint and ffc.cid = %s''', (fid, cid))
+				r = curs.fetchone()
+				if r is None:
+					raise Exception("failed to fetch locked row?")
+				return FFNFicContent.fromRow(r, db)
+			if r is not None:
+				FFNFicContent.keepReplaced(db, { (fid, cid): raw })
+			codec = FFNContentCodec.forWriting(db, stripe)
+			data = FFNContentCodec.encode(codec, raw)
 			curs.execute(f'''
-				insert into {table}(fid, cid, wid, content) values(%s, %s, %s, %s)
+				insert into FFNFicContent as ffc(fid, cid, wid, content, codecId,
+					hash)
+				values(%s, %s, %s, %s, %s, %s)
 				on conflict(fid, cid) do update
-					set wid = excluded.wid, content = excluded.content
-				returning *
-			''', (fid, cid, wid, compress(content.encode('utf-8'))))
+					set wid = excluded.wid, content = excluded.content,
+						codecId = excluded.codecId, hash = excluded.hash
+					where ffc.hash is distinct from excluded.hash
+				returning {rowColumns}
+			''', (fid, cid, wid, data, None if codec is None else codec.id,
+				hash_))
 			r = curs.fetchone()
+			if r is None:
+				curs.execute(f'''
+					select {contentColumns} from FFNFicContent ffc
+					where ffc.fid = %s::bigint and ffc.cid = %s''', (fid, cid))
+				r = curs.fetchone()
 			if r is None:
 				raise Exception(f"failed to insert?")
-			return FFNFicContent.fromRow(r)
+			return FFNFicContent.fromRow(r, db)
+
+	# write many (fid, cid, wid, content) chapters at once: COPY them into a
+	# temp staging table and merge that in with the same conflict handling as
+	# upsert. the last of any duplicate (fid, cid) wins, and chapters whose
+	# content hasn't changed are skipped before they're compressed; the rows
+	# already stored are locked until commit so they can't change underneath.
+	# with blobs the content goes in FFNContentBlob, once per distinct chapter
+	# body (see dropUnusedBlobs). with history the content being replaced is
+	# kept as an FFNContentRevision. like upsert, this leaves committing to the
+	# caller. returns (inserted, updated, skipped) row counts, from what the
+	# merge wrote
+	@staticmethod
+	def upsertMany(db: 'psycopg2.connection',
+			contents: List[Tuple[int, int, int, str]], stripe: int = None,
+			blobs: bool = False, history: bool = False) -> Tuple[int, int, int]:
+		if len(contents) == 0:
+			return (0, 0, 0)
+		latest: Dict[Tuple[int, int], Tuple[int, bytes]] = {}
+		for fid, cid, wid, content in contents:
+			latest[(fid, cid)] = (wid, content.encode('utf-8'))
+		hashes = {k: contentHash(raw) for k, (_, raw) in latest.items()}
+
+		with db.cursor() as curs:
+			curs.execute('''
+				select ffc.fid, ffc.cid, ffc.hash from FFNFicContent ffc
+				join unnest(%s::bigint[], %s::int4[]) k(fid, cid)
+					on ffc.fid = k.fid and ffc.cid = k.cid
+				order by ffc.fid, ffc.cid
+				for update of ffc
+			''', ([k[0] for k in latest], [k[1] for k in latest]))
+			stored = {(int(r[0]), int(r[1])): None if r[2] is None else bytes(r[2])
+					for r in curs.fetchall()}
+			changed = [k for k in latest
+					if k not in stored or stored[k] != hashes[k]]
+			if len(changed) == 0:
+				return (0, 0, len(latest))
+
+			FFNFicContent.keepReplaced(db,
+					{ k: latest[k][1] for k in changed if k in stored }, history)
+
+			# bodies the blob store already has don't need compressing either.
+			# they're locked so dropUnusedBlobs can't take them before this commits
+			have: Set[bytes] = set()
+			if blobs:
+				curs.execute('''
+					select ffb.hash from FFNContentBlob ffb where ffb.hash = any(%s)
+					for key share
+				''', (list({hashes[k] for k in changed}),))
+				have = {bytes(r[0]) for r in curs.fetchall()}
+
+			codec = FFNContentCodec.forWriting(db, stripe)
+			codecId = None if codec is None else codec.id
+			rows: List[Tuple[int, int, Optional[int], Optional[bytes],
+					Optional[int], bytes]] = []
+			for fid, cid in changed:
+				wid, raw = latest[(fid, cid)]
+				hash_ = hashes[(fid, cid)]
+				if hash_ in have:
+					rows += [(fid, cid, wid, None, None, hash_)]
+					continue
+				rows += [(fid, cid, wid, FFNContentCodec.encode(codec, raw), codecId,
+						hash_)]
+				if blobs:
+					have.add(hash_)
+
+			curs.execute('''
+				create temp table if not exists FFNFicContentStage (
+					fid bigint not null,
+					cid int4 not null,
+					wid bigint,
+					content bytea,
+					codecId smallint,
+					hash bytea not null
+				)''')
+			curs.execute('truncate FFNFicContentStage')
+			curs.copy_expert('''
+				copy FFNFicContentStage(fid, cid, wid, content, codecId, hash)
+				from stdin with (format binary)''', io.BytesIO(copyBinary(rows)))
+			if blobs:
+				curs.execute('''
+					insert into FFNContentBlob(hash, content, codecId)
+					select hash, content, codecId from FFNFicContentStage
+					where content is not null
+					on conflict(hash) do nothing''')
+			# a partitioned table can't return xmax to tell an insert from an
+			# update, so they're separate statements: new rows, then changed ones
+			curs.execute('''
+				insert into FFNFicContent as ffc(fid, cid, wid, content, codecId,
+					hash)
+				select fid, cid, wid,
+					case when %(blobs)s then null else content end,
+					case when %(blobs)s then null else codecId end,
+					hash
+				from FFNFicContentStage
+				on conflict(fid, cid) do nothing
+				returning 1''', { 'blobs': blobs })
+			inserted = len(curs.fetchall())
+			curs.execute('''
+				update FFNFicContent ffc
+				set wid = s.wid,
+					content = case when %(blobs)s then null else s.content end,
+					codecId = case when %(blobs)s then null else s.codecId end,
+					hash = s.hash
+				from FFNFicContentStage s
+				where ffc.fid = s.fid and ffc.cid = s.cid
+					and ffc.hash is distinct from s.hash
+				returning 1''', { 'blobs': blobs })
+			updated = len(curs.fetchall())
+			return (inserted, updated, len(latest) - inserted - updated)
 
+	# before rows are replaced with the given new contents: keep the contents
+	# of the ones that have revisions (or of all of them, with history) as
+	# revisions too, moving their older ones onto the new contents. without
+	# this their deltas couldn't be decoded again. the rows should already be
+	# locked. returns the number of revisions kept
+	@staticmethod
+	def keepReplaced(db: 'psycopg2.connection',
+			replacing: Dict[Tuple[int, int], bytes], history: bool = False) -> int:
+		keys = list(replacing)
+		if not history:
+			revised = FFNContentRevision.revised(db, keys)
+			keys = [k for k in keys if k in revised]
+		if len(keys) == 0:
+			return 0
+		with db.cursor() as curs:
+			curs.execute(f'''
+				select {contentColumns} from FFNFicContent ffc
+				join unnest(%s::bigint[], %s::int4[]) k(fid, cid)
+					on ffc.fid = k.fid and ffc.cid = k.cid
+			''', ([k[0] for k in keys], [k[1] for k in keys]))
+			olds = [FFNFicContent.fromRow(r, db) for r in curs.fetchall()]
+		return FFNContentRevision.keep(db, [(old, replacing[(old.fid, old.cid)])
+				for old in olds if old.fid is not None and old.cid is not None])
+
+	# delete FFNContentBlob bodies no FFNFicContent row uses any more, left by
+	# chapters that were rewritten. this scans FFNFicContent holding a lock
+	# that makes writers with blobs wait, so it's for a quiet moment. returns
+	# the number deleted
+	@staticmethod
+	def dropUnusedBlobs(db: 'psycopg2.connection') -> int:
+		with db, db.cursor() as curs:
+			curs.execute('lock table FFNContentBlob in exclusive mode')
+			curs.execute('''
+				delete from FFNContentBlob ffb
+				where not exists (select 1 from FFNFicContent ffc
+					where ffc.hash = ffb.hash and ffc.content is null)''')
+			return int(curs.rowcount)
+
+	# every revision of a chapter as (wid, content), oldest first and ending
+	# with its current content; empty if there's no such chapter
+	@staticmethod
+	def history(db: 'psycopg2.connection', fid: int, cid: int
+			) -> List[Tuple[Optional[int], bytes]]:
+		with db, db.cursor() as curs:
+			curs.execute(f'''
+				select {contentColumns} from FFNFicContent ffc
+				where ffc.fid = %s::bigint and ffc.cid = %s''', (fid, cid))
+			r = curs.fetchone()
+			current = None if r is None else FFNFicContent.fromRow(r, db)
+		if current is None or current.content is None:
+			return []
+		base = current.content
+		return [(rev.wid, rev.rebuild(base))
+				for rev in FFNContentRevision.fetch(db, fid, cid)] \
+				+ [(current.wid, base)]
+
+	# roughly count rows spread over the table, for training a codec
+	@staticmethod
+	def sample(db: 'psycopg2.connection', count: int, stripe: int = None
+			) -> List['FFNFicContent']:
+		table = FFNFicContent.tableName(stripe)
+		with db, db.cursor() as curs:
+			# a partitioned table has no reltuples of its own
+			curs.execute('''
+				select sum(greatest(c.reltuples, 0)) from pg_class c
+				where c.oid = %s::regclass or c.oid in (
+					select inhrelid from pg_inherits where inhparent = %s::regclass)
+			''', (table, table))
+			r = curs.fetchone()
+			rows = 0 if r is None else max(0, int(r[0]))
+			# ask for a few times more than needed; system sampling is by page
+			percent = 100.0 if rows < 1 else min(100.0, 300.0 * count / rows)
+			curs.execute(f'''
+				select {contentColumns} from {table} ffc
+				tablesample system (%s)
+				where ffc.content is not null or ffc.hash is not null
+				limit %s
+			''', (percent, count))
+			return [FFNFicContent.fromRow(r, db) for r in curs.fetchall()]
+
+	# the next limit rows after (fid, cid) that aren't stored with codecId;
+	# rows with their content in FFNContentBlob are passed over
+	@staticmethod
+	def fetchAfter(db: 'psycopg2.connection', fid: int, cid: int, limit: int,
+			stripe: int = None, codecId: int = None) -> List['FFNFicContent']:
+		with db, db.cursor() as curs:
+			curs.execute(f'''
+				select {rowColumns} from {FFNFicContent.tableName(stripe)} ffc
+				where (ffc.fid, ffc.cid) > (%s, %s)
+					and ffc.content is not null
+					and ffc.codecId is distinct from %s
+				order by ffc.fid, ffc.cid
+				limit %s
+			''', (fid, cid, codecId, limit))
+			return [FFNFicContent.fromRow(r, db) for r in curs.fetchall()]
+
+	# store contents again with codec; rows upserted since they were read are
+	# left alone. returns the number of rows rewritten and the compressed size
+	# of the batch
+	@staticmethod
+	def recompress(db: 'psycopg2.connection', contents: List['FFNFicContent'],
+			codec: FFNContentCodec, stripe: int = None) -> Tuple[int, int]:
+		rows = [(c.fid, c.cid, c.wid, codec.compress(c.content), codec.id)
+				for c in contents if c.content is not None]
+		if len(rows) == 0:
+			return (0, 0)
+		from psycopg2.extras import execute_values
+		with db, db.cursor() as curs:
+			execute_values(curs, f'''
+				update {FFNFicContent.tableName(stripe)} ffc
+				set content = v.content, codecId = v.codecId
+				from (values %s) v(fid, cid, wid, content, codecId)
+				where ffc.fid = v.fid and ffc.cid = v.cid
+					and ffc.wid is not distinct from v.wid
+			''', rows, template = '(%s, %s, %s::bigint, %s, %s::smallint)',
+				page_size = len(rows))
+			return (int(curs.rowcount), sum(len(r[3]) for r in rows))
@@ -0,0 +1,266 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import os
+import json
+import mmap
+import heapq
+import struct
+import itertools
+from oil.util import compress
+from minerva.ffn.content_codec import FFNContentCodec
+from minerva.ffn.content import FFNFicContent
+
+archiveVersion = 1
+# fid, cid, wid (-1 for null), codecId (0 for plain oil.util.compress),
+# segment, offset, length
+indexRecord = struct.Struct('<qiqHHQI')
+# a new segment is started rather than grow the last one past this
+segmentMaxBytes = 1024 * 1024 * 1024
+# new index records sorted in memory at a time by append, before they're
+# spilled to a run file to be merged
+runSize = 1024 * 1024
+# index records written at a time
+writeSize = 64 * 1024
+
+def mapFile(fname: str) -> Optional[mmap.mmap]:
+	with open(fname, 'rb') as f:
+		if os.fstat(f.fileno()).st_size == 0:
+			return None
+		return mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+def syncFile(f: Any) -> None:
+	f.flush()
+	os.fsync(f.fileno())
+
+# a copy of FFNFicContent on disk, for reading without a database: compressed
+# chapters exactly as they're stored, appended to segment files, and an index
+# of them sorted by (fid, cid) that's searched in place through mmap. reading
+# a chapter is a slice of its segment and one decompress. codecs are copied
+# alongside the first chapter that needs them. meta.json has the wid watermark
+# rows have been appended up to
+class FFNContentArchive:
+	def __init__(self, path: str) -> None:
+		self.path = path
+		self.watermark = -1
+		self.segmentCount = 0
+		metaName = self.fileName('meta.json')
+		if os.path.exists(metaName):
+			with open(metaName) as f:
+				meta = json.load(f)
+			if meta['version'] != archiveVersion:
+				raise Exception(f"unknown content archive version: {meta['version']}")
+			self.watermark = int(meta['watermark'])
+			self.segmentCount = int(meta['segments'])
+		indexName = self.fileName('index')
+		self.index = mapFile(indexName) if os.path.exists(indexName) else None
+		self.segments: Dict[int, mmap.mmap] = {}
+		self.codecs: Dict[int, FFNContentCodec] = {}
+
+	def fileName(self, name: str) -> str:
+		return os.path.join(self.path, name)
+
+	def segmentName(self, segment: int) -> str:
+		return self.fileName(f'segment_{segment:05}.dat')
+
+	def __len__(self) -> int:
+		return 0 if self.index is None else len(self.index) // indexRecord.size
+
+	def record(self, i: int) -> Tuple[int, int, int, int, int, int, int]:
+		assert(self.index is not None)
+		return indexRecord.unpack_from(self.index, i * indexRecord.size)
+
+	# position of the first record at or after (fid, cid)
+	def lowerBound(self, fid: int, cid: int) -> int:
+		lo, hi = 0, len(self)
+		while lo < hi:
+			mid = (lo + hi) // 2
+			r = self.record(mid)
+			if (r[0], r[1]) < (fid, cid):
+				lo = mid + 1
+			else:
+				hi = mid
+		return lo
+
+	def codec(self, codecId: int) -> Optional[FFNContentCodec]:
+		if codecId == 0:
+			return None
+		codec = self.codecs.get(codecId)
+		if codec is not None:
+			return codec
+		with open(self.fileName(f'codec_{codecId}.json')) as f:
+			meta = json.load(f)
+		with open(self.fileName(f'codec_{codecId}.dict'), 'rb') as f:
+			codec = FFNContentCodec(id_ = codecId, kind_ = meta['kind'],
+					level_ = meta['level'], dict_ = f.read())
+		self.codecs[codecId] = codec
+		return codec
+
+	def segment(self, segment: int) -> mmap.mmap:
+		m = self.segments.get(segment)
+		if m is None:
+			m = mapFile(self.segmentName(segment))
+			if m is None:
+				raise Exception(f"empty content archive segment: {segment}")
+			self.segments[segment] = m
+		return m
+
+	# content is left compressed, as a view of the mapped segment
+	def fromRecord(self, r: Tuple[int, int, int, int, int, int, int]
+			) -> FFNFicContent:
+		fid, cid, wid, codecId, segment, offset, length = r
+		return FFNFicContent(
+				fid_ = fid,
+				cid_ = cid,
+				wid_ = None if wid < 0 else wid,
+				codecId_ = None if codecId == 0 else codecId,
+				compressed_ = memoryview(self.segment(segment))[
+					offset:offset + length],
+				codec_ = self.codec(codecId),
+				storedSize_ = length,
+			)
+
+	def get(self, fid: int, cid: int) -> Optional[FFNFicContent]:
+		i = self.lowerBound(fid, cid)
+		if i >= len(self):
+			return None
+		r = self.record(i)
+		if r[0] != fid or r[1] != cid:
+			return None
+		return self.fromRecord(r)
+
+	# like FFNFicContent.fetch
+	def fetch(self, fid: int) -> Iterator[FFNFicContent]:
+		for i in range(self.lowerBound(fid, -2**31), len(self)):
+			r = self.record(i)
+			if r[0] != fid:
+				break
+			yield self.fromRecord(r)
+
+	def __iter__(self) -> Iterator[FFNFicContent]:
+		for i in range(len(self)):
+			yield self.fromRecord(self.record(i))
+
+	# the maps are closed once the last content viewing them is gone too
+	def close(self) -> None:
+		self.index = None
+		self.segments = {}
+
+	def saveCodec(self, codec: Optional[FFNContentCodec]) -> None:
+		if codec is None or codec.id is None or codec.dict is None:
+			raise Exception("content with a codecId but no codec")
+		if os.path.exists(self.fileName(f'codec_{codec.id}.json')):
+			return
+		with open(self.fileName(f'codec_{codec.id}.dict'), 'wb') as f:
+			f.write(codec.dict)
+			syncFile(f)
+		with open(self.fileName(f'codec_{codec.id}.json'), 'w') as f:
+			json.dump({ 'kind': codec.kind, 'level': codec.level }, f)
+			syncFile(f)
+
+	def writeRun(self, n: int,
+			records: List[Tuple[int, int, int, int, int, int, int]]) -> str:
+		records.sort()
+		runName = self.fileName(f'run_{n}.tmp')
+		with open(runName, 'wb') as f:
+			f.write(b''.join(indexRecord.pack(*r) for r in records))
+		return runName
+
+	# merge sorted records and runs with the current index into a new one; of
+	# records for the same (fid, cid) the one with the latest wid, and after
+	# that the latest appended (the furthest into the segments), is kept
+	def mergeIndex(self, runs: List[str],
+			records: List[Tuple[int, int, int, int, int, int, int]]) -> None:
+		sources: List[Iterator[Tuple[Any, ...]]] = [iter(sorted(records))]
+		if self.index is not None:
+			sources += [indexRecord.iter_unpack(self.index)]
+		for runName in runs:
+			m = mapFile(runName)
+			assert(m is not None)
+			sources += [indexRecord.iter_unpack(m)]
+
+		tmpName = self.fileName('index.tmp')
+		with open(tmpName, 'wb') as f:
+			buf: List[bytes] = []
+			for _, group in itertools.groupby(heapq.merge(*sources),
+					key = lambda r: (r[0], r[1])):
+				r = max(group, key = lambda r: (r[2], r[4], r[5]))
+				buf += [indexRecord.pack(*r)]
+				if len(buf) >= writeSize:
+					f.write(b''.join(buf))
+					buf = []
+			f.write(b''.join(buf))
+			syncFile(f)
+		os.replace(tmpName, self.fileName('index'))
+		self.index = mapFile(self.fileName('index'))
+
+	def writeMeta(self) -> None:
+		tmpName = self.fileName('meta.json.tmp')
+		with open(tmpName, 'w') as f:
+			json.dump({ 'version': archiveVersion, 'watermark': self.watermark,
+				'segments': self.segmentCount }, f)
+			syncFile(f)
+		os.replace(tmpName, self.fileName('meta.json'))
+
+	# add contents (from FFNFicContent.fetchWidRange, say) and move the
+	# watermark to the wid they were read up to. chapters are copied as they
+	# were stored, not recompressed; one already in the archive is replaced
+	# by a later wid, leaving its old copy unreferenced in its segment.
+	# segments are synced before the new index replaces the old one, so a
+	# failed append leaves the archive as it was. returns the number of
+	# chapters written
+	def append(self, contents: Iterable[FFNFicContent], watermark: int) -> int:
+		os.makedirs(self.path, exist_ok = True)
+		runs: List[str] = []
+		records: List[Tuple[int, int, int, int, int, int, int]] = []
+		added = 0
+		segment = max(0, self.segmentCount - 1)
+		first = segment
+		out = open(self.segmentName(segment), 'ab')
+		try:
+			offset = out.tell()
+			for c in contents:
+				if c.fid is None or c.cid is None:
+					continue
+				if c.compressed is not None:
+					data: Any = c.compressed
+					codecId = c.codecId or 0
+				elif c.content is not None:
+					data = compress(c.content)
+					codecId = 0
+				else:
+					continue
+				if codecId != 0 and codecId not in self.codecs:
+					self.saveCodec(c.codec)
+					assert(c.codec is not None)
+					self.codecs[codecId] = c.codec
+
+				if offset > 0 and offset + len(data) > segmentMaxBytes:
+					syncFile(out)
+					out.close()
+					segment += 1
+					out = open(self.segmentName(segment), 'ab')
+					offset = out.tell()
+				out.write(data)
+				records += [(c.fid, c.cid, -1 if c.wid is None else c.wid, codecId,
+						segment, offset, len(data))]
+				offset += len(data)
+				added += 1
+				if len(records) >= runSize:
+					runs += [self.writeRun(len(runs), records)]
+					records = []
+			syncFile(out)
+		finally:
+			out.close()
+
+		try:
+			self.mergeIndex(runs, records)
+		finally:
+			for runName in runs:
+				os.remove(runName)
+		self.segmentCount = segment + 1
+		self.watermark = watermark
+		self.writeMeta()
+		# maps of the segments written to end where they used to; contents
+		# already read keep theirs alive
+		for s in range(first, segment + 1):
+			self.segments.pop(s, None)
+		return added
@@ -0,0 +1,238 @@
+from typing import TYPE_CHECKING, IO, Any, Dict, List, Optional, Union
+if TYPE_CHECKING:
+	import psycopg2
+import time
+import zlib
+import hashlib
+from oil.util import compress, uncompress
+
+# FFNFicContent rows with a null codecId are plain oil.util.compress
+zstdKind = 'zstd'
+zlibKind = 'zlib'
+
+defaultLevels = { zstdKind: 9, zlibKind: 9 }
+# zlib only looks back 32KiB, so a longer preset dictionary is wasted
+dictSizes = { zstdKind: 112 * 1024, zlibKind: 32 * 1024 }
+# compressed bytes fed to a decompressor at a time when streaming
+streamChunkSize = 64 * 1024
+
+# what FFNFicContent.hash holds, of a chapter's uncompressed content
+def contentHash(content: bytes) -> bytes:
+	return hashlib.blake2b(content, digest_size = 20).digest()
+
+def haveZstd() -> bool:
+	try:
+		import zstandard # type: ignore
+		return True
+	except ImportError:
+		return False
+
+# pieces of markup and text that show up in more than one sample, most
+# valuable last since zlib encodes nearer matches in fewer bits
+def trainZlibDict(samples: List[bytes], size: int) -> bytes:
+	seen: Dict[bytes, int] = {}
+	for sample in samples:
+		for piece in set(sample.replace(b'<', b'\n<').split(b'\n')):
+			if 4 <= len(piece) <= 256:
+				seen[piece] = seen.get(piece, 0) + 1
+	common = sorted((p for p, n in seen.items() if n > 1),
+			key = lambda p: seen[p] * len(p), reverse = True)
+	picked: List[bytes] = []
+	total = 0
+	for piece in common:
+		if total + len(piece) > size:
+			continue
+		picked += [piece]
+		total += len(piece)
+	return b''.join(reversed(picked))
+
+# a compression dictionary trained on a sample of chapters (from one stripe
+# or era, say), referenced by FFNFicContent.codecId
+class FFNContentCodec:
+	# codecs by id; rows only ever refer to codecs that exist and codecs are
+	# never changed, so they're loaded once per process
+	cache: Dict[int, 'FFNContentCodec'] = {}
+	# stripe => codec new content is written with, picked once per process
+	writeCodecs: Dict[Optional[int], Optional['FFNContentCodec']] = {}
+
+	def __init__(self, id_: int = None, kind_: str = None, level_: int = None,
+			stripe_: int = None, label_: str = None, dict_: bytes = None,
+			created_: int = None) -> None:
+		self.id = id_
+		self.kind = kind_
+		self.level = level_
+		self.stripe = stripe_
+		self.label = label_
+		self.dict = dict_
+		self.created = created_
+		self.compressor: Any = None
+		self.decompressor: Any = None
+
+	@staticmethod
+	def fromRow(row: Any) -> 'FFNContentCodec':
+		return FFNContentCodec(
+				id_ = int(row[0]),
+				kind_ = row[1],
+				level_ = int(row[2]),
+				stripe_ = None if row[3] is None else int(row[3]),
+				label_ = row[4],
+				dict_ = row[5].tobytes(),
+				created_ = int(row[6]),
+			)
+
+	# train a codec on samples without saving it
+	@staticmethod
+	def build(samples: List[bytes], kind: str = None, level: int = None,
+			dictSize: int = None) -> 'FFNContentCodec':
+		if kind is None:
+			kind = zstdKind if haveZstd() else zlibKind
+		if kind not in dictSizes:
+			raise Exception(f"unknown codec kind: {kind}")
+		if level is None:
+			level = defaultLevels[kind]
+		if dictSize is None:
+			dictSize = dictSizes[kind]
+		if kind == zstdKind:
+			import zstandard # type: ignore
+			d = zstandard.train_dictionary(dictSize, list(samples)).as_bytes()
+		else:
+			d = trainZlibDict(samples, min(dictSize, dictSizes[zlibKind]))
+		return FFNContentCodec(kind_ = kind, level_ = level, dict_ = d)
+
+	@staticmethod
+	def train(db: 'psycopg2.connection', samples: List[bytes],
+			kind: str = None, level: int = None, stripe: int = None,
+			label: str = None) -> 'FFNContentCodec':
+		codec = FFNContentCodec.build(samples, kind, level)
+		codec.stripe = stripe
+		codec.label = label
+		codec.save(db)
+		return codec
+
+	def save(self, db: 'psycopg2.connection') -> None:
+		assert(self.dict is not None)
+		self.created = int(time.time()) * 1000
+		with db, db.cursor() as curs:
+			curs.execute('''
+				insert into FFNContentCodec(kind, level, stripe, label, dict, created)
+				values(%s, %s, %s, %s, %s, %s)
+				returning id''', (self.kind, self.level, self.stripe, self.label,
+					self.dict, self.created))
+			row = curs.fetchone()
+			if row is None:
+				raise Exception("unable to create FFNContentCodec")
+			self.id = int(row[0])
+		FFNContentCodec.cache[self.id] = self
+
+	# this runs while callers are iterating over content rows, so it stays out
+	# of their transaction handling
+	@staticmethod
+	def get(db: 'psycopg2.connection', id_: int) -> 'FFNContentCodec':
+		codec = FFNContentCodec.cache.get(id_)
+		if codec is not None:
+			return codec
+		with db.cursor() as curs:
+			curs.execute('''
+				select id, kind, level, stripe, label, dict, created
+				from FFNContentCodec where id = %s''', (id_,))
+			row = curs.fetchone()
+			if row is None:
+				raise Exception(f"unknown content codec: {id_}")
+			codec = FFNContentCodec.fromRow(row)
+		FFNContentCodec.cache[id_] = codec
+		return codec
+
+	# newest codec trained for stripe, else the newest general one, else None
+	# for plain oil.util.compress
+	@staticmethod
+	def forWriting(db: 'psycopg2.connection', stripe: int = None
+			) -> Optional['FFNContentCodec']:
+		if stripe in FFNContentCodec.writeCodecs:
+			return FFNContentCodec.writeCodecs[stripe]
+		with db.cursor() as curs:
+			curs.execute('''
+				select id from FFNContentCodec
+				where stripe = %s or stripe is null
+				order by (stripe is null) asc, id desc
+				limit 1''', (stripe,))
+			row = curs.fetchone()
+		codec = None if row is None else FFNContentCodec.get(db, int(row[0]))
+		FFNContentCodec.writeCodecs[stripe] = codec
+		return codec
+
+	def compress(self, data: bytes) -> bytes:
+		assert(self.dict is not None and self.level is not None)
+		if self.kind == zstdKind:
+			if self.compressor is None:
+				import zstandard # type: ignore
+				self.compressor = zstandard.ZstdCompressor(level = self.level,
+						dict_data = zstandard.ZstdCompressionDict(self.dict))
+			return self.compressor.compress(data)
+		if self.kind == zlibKind:
+			c = zlib.compressobj(self.level, zdict = self.dict)
+			return c.compress(data) + c.flush()
+		raise Exception(f"unknown codec kind: {self.kind}")
+
+	def getDecompressor(self) -> Any:
+		assert(self.dict is not None)
+		if self.decompressor is None:
+			try:
+				import zstandard # type: ignore
+			except ImportError:
+				raise Exception(f"zstandard is needed to read codec {self.id}")
+			self.decompressor = zstandard.ZstdDecompressor(
+					dict_data = zstandard.ZstdCompressionDict(self.dict))
+		return self.decompressor
+
+	# data may be any buffer (a memoryview of a fetched row, say)
+	def decompress(self, data: Union[bytes, memoryview]) -> bytes:
+		assert(self.dict is not None)
+		if self.kind == zstdKind:
+			return bytes(self.getDecompressor().decompress(data))
+		if self.kind == zlibKind:
+			d = zlib.decompressobj(zdict = self.dict)
+			return d.decompress(data) + d.flush()
+		raise Exception(f"unknown codec kind: {self.kind}")
+
+	# decompress into out a chunk at a time; returns the decompressed length
+	def decompressTo(self, data: Union[bytes, memoryview], out: IO[bytes]
+			) -> int:
+		assert(self.dict is not None)
+		if self.kind == zstdKind:
+			d = self.getDecompressor().decompressobj()
+		elif self.kind == zlibKind:
+			d = zlib.decompressobj(zdict = self.dict)
+		else:
+			raise Exception(f"unknown codec kind: {self.kind}")
+		view = memoryview(data)
+		total = 0
+		for i in range(0, len(view), streamChunkSize):
+			piece = d.decompress(view[i:i + streamChunkSize])
+			out.write(piece)
+			total += len(piece)
+		if self.kind == zlibKind:
+			piece = d.flush()
+			out.write(piece)
+			total += len(piece)
+		return total
+
+	@staticmethod
+	def encode(codec: Optional['FFNContentCodec'], data: bytes) -> bytes:
+		return compress(data) if codec is None else codec.compress(data)
+
+	# plain oil.util.compress data is copied out of the view first, the
+	# trained codecs read the buffer in place
+	@staticmethod
+	def unpack(codec: Optional['FFNContentCodec'], data: memoryview) -> bytes:
+		if codec is None:
+			return uncompress(bytes(data))
+		return codec.decompress(data)
+
+	@staticmethod
+	def unpackTo(codec: Optional['FFNContentCodec'], data: memoryview,
+			out: IO[bytes]) -> int:
+		if codec is None:
+			content = uncompress(bytes(data))
+			out.write(content)
+			return len(content)
+		return codec.decompressTo(data, out)
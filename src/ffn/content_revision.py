@@ -0,0 +1,195 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Set, Tuple
+if TYPE_CHECKING:
+	import psycopg2
+	from minerva.ffn.content import FFNFicContent
+import time
+import zlib
+from minerva.ffn.content_codec import contentHash, haveZstd, zlibKind, \
+		zstdKind
+
+# deltas are small and only written when a chapter changes, so they're
+# worth the slower levels
+deltaLevels = { zstdKind: 19, zlibKind: 9 }
+# zlib can't look further back than this into its dictionary
+zlibWindow = 32 * 1024
+
+revisionColumns = '''ffcr.id, ffcr.fid, ffcr.cid, ffcr.wid, ffcr.kind,
+	ffcr.delta, ffcr.hash, ffcr.baseHash, ffcr.size, ffcr.storedSize,
+	ffcr.created'''
+
+# old compressed against base: zstd uses all of base as a raw content
+# dictionary, zlib only its first zlibWindow bytes
+def encodeDelta(old: bytes, base: bytes, kind: str = None
+		) -> Tuple[str, bytes]:
+	if kind is None:
+		kind = zstdKind if haveZstd() else zlibKind
+	if kind == zstdKind:
+		import zstandard # type: ignore
+		d = zstandard.ZstdCompressionDict(base,
+				dict_type = zstandard.DICT_TYPE_RAWCONTENT)
+		return (kind, zstandard.ZstdCompressor(level = deltaLevels[kind],
+				dict_data = d).compress(old))
+	if kind == zlibKind:
+		c = zlib.compressobj(deltaLevels[kind], zdict = base[:zlibWindow])
+		return (kind, c.compress(old) + c.flush())
+	raise Exception(f"unknown delta kind: {kind}")
+
+def decodeDelta(kind: str, delta: bytes, base: bytes) -> bytes:
+	if kind == zstdKind:
+		try:
+			import zstandard # type: ignore
+		except ImportError:
+			raise Exception("zstandard is needed to read zstd deltas")
+		d = zstandard.ZstdCompressionDict(base,
+				dict_type = zstandard.DICT_TYPE_RAWCONTENT)
+		return bytes(zstandard.ZstdDecompressor(dict_data = d).decompress(delta))
+	if kind == zlibKind:
+		c = zlib.decompressobj(zdict = base[:zlibWindow])
+		return c.decompress(delta) + c.flush()
+	raise Exception(f"unknown delta kind: {kind}")
+
+# an earlier revision of an FFNFicContent row, kept when it's replaced by
+# FFNFicContent.upsertMany in history mode, and by any write after that. it's
+# stored as a delta against the chapter's current content (baseHash), and
+# moved onto the new content each time that's replaced in turn, so any
+# revision is one decode away
+class FFNContentRevision:
+	def __init__(self, id_: int = None, fid_: int = None, cid_: int = None,
+			wid_: int = None, kind_: str = None, delta_: bytes = None,
+			hash_: bytes = None, baseHash_: bytes = None, size_: int = None,
+			storedSize_: int = None, created_: int = None) -> None:
+		self.id = id_
+		self.fid = fid_
+		self.cid = cid_
+		self.wid = wid_
+		self.kind = kind_
+		self.delta = delta_
+		self.hash = hash_
+		self.baseHash = baseHash_
+		# length of the content
+		self.size = size_
+		# what it took as a full row before it was replaced
+		self.storedSize = storedSize_
+		self.created = created_
+
+	@staticmethod
+	def fromRow(row: Any) -> 'FFNContentRevision':
+		return FFNContentRevision(
+				id_ = int(row[0]),
+				fid_ = int(row[1]),
+				cid_ = int(row[2]),
+				wid_ = None if row[3] is None else int(row[3]),
+				kind_ = row[4],
+				delta_ = bytes(row[5]),
+				hash_ = bytes(row[6]),
+				baseHash_ = bytes(row[7]),
+				size_ = int(row[8]),
+				storedSize_ = int(row[9]),
+				created_ = int(row[10]),
+			)
+
+	# revisions of a chapter, oldest first
+	@staticmethod
+	def fetch(db: 'psycopg2.connection', fid: int, cid: int
+			) -> List['FFNContentRevision']:
+		with db, db.cursor() as curs:
+			curs.execute(f'''
+				select {revisionColumns} from FFNFicContentRevision ffcr
+				where ffcr.fid = %s and ffcr.cid = %s
+				order by ffcr.id asc''', (fid, cid))
+			return [FFNContentRevision.fromRow(r) for r in curs.fetchall()]
+
+	# the (fid, cid) of keys that have revisions, which every write replacing
+	# their content has to keep moving onto the new content
+	@staticmethod
+	def revised(db: 'psycopg2.connection', keys: List[Tuple[int, int]]
+			) -> Set[Tuple[int, int]]:
+		if len(keys) == 0:
+			return set()
+		with db.cursor() as curs:
+			curs.execute('''
+				select distinct ffcr.fid, ffcr.cid from FFNFicContentRevision ffcr
+				join unnest(%s::bigint[], %s::int4[]) k(fid, cid)
+					on ffcr.fid = k.fid and ffcr.cid = k.cid
+			''', ([k[0] for k in keys], [k[1] for k in keys]))
+			return {(int(r[0]), int(r[1])) for r in curs.fetchall()}
+
+	# this revision's content, from the chapter's current content
+	def rebuild(self, base: bytes) -> bytes:
+		assert(self.kind is not None and self.delta is not None)
+		if contentHash(base) != self.baseHash:
+			raise Exception(f"revision {self.id} of {self.fid}/{self.cid} isn't "
+					+ "based on this content")
+		return decodeDelta(self.kind, self.delta, base)
+
+	# keep the current content of rows about to be replaced, given as (the
+	# current row, its new content) pairs, and move their older revisions onto
+	# the new content. like upsertMany this leaves committing to the caller.
+	# returns the number of revisions kept
+	@staticmethod
+	def keep(db: 'psycopg2.connection',
+			replaced: List[Tuple['FFNFicContent', bytes]], kind: str = None
+			) -> int:
+		replaced = [(old, new) for old, new in replaced
+				if old.content is not None]
+		if len(replaced) == 0:
+			return 0
+		from psycopg2.extras import execute_values
+		with db.cursor() as curs:
+			curs.execute(f'''
+				select {revisionColumns} from FFNFicContentRevision ffcr
+				join unnest(%s::bigint[], %s::int4[]) k(fid, cid)
+					on ffcr.fid = k.fid and ffcr.cid = k.cid
+				order by ffcr.id asc
+			''', ([old.fid for old, _ in replaced],
+				[old.cid for old, _ in replaced]))
+			revisions: Dict[Tuple[int, int], List[FFNContentRevision]] = {}
+			for r in curs.fetchall():
+				rev = FFNContentRevision.fromRow(r)
+				assert(rev.fid is not None and rev.cid is not None)
+				revisions.setdefault((rev.fid, rev.cid), []).append(rev)
+
+			created = int(time.time()) * 1000
+			moved: List[Tuple[int, str, bytes, bytes]] = []
+			kept: List[Tuple[Any, ...]] = []
+			for old, new in replaced:
+				assert(old.fid is not None and old.cid is not None
+						and old.content is not None)
+				newHash = contentHash(new)
+				for rev in revisions.get((old.fid, old.cid), []):
+					assert(rev.id is not None)
+					kind_, delta = encodeDelta(rev.rebuild(old.content), new, kind)
+					moved += [(rev.id, kind_, delta, newHash)]
+				kind_, delta = encodeDelta(old.content, new, kind)
+				kept += [(old.fid, old.cid, old.wid, kind_, delta, old.getHash(),
+						newHash, len(old.content), old.storedSize or 0, created)]
+
+			if len(moved) > 0:
+				execute_values(curs, '''
+					update FFNFicContentRevision ffcr
+					set kind = v.kind, delta = v.delta, baseHash = v.baseHash
+					from (values %s) v(id, kind, delta, baseHash)
+					where ffcr.id = v.id
+				''', moved, page_size = len(moved))
+			execute_values(curs, '''
+				insert into FFNFicContentRevision(fid, cid, wid, kind, delta, hash,
+					baseHash, size, storedSize, created)
+				values %s''', kept, page_size = len(kept))
+			return len(kept)
+
+	# (revisions, bytes they took as full rows, bytes their deltas take), for
+	# one fic or all of them
+	@staticmethod
+	def savings(db: 'psycopg2.connection', fid: int = None
+			) -> Tuple[int, int, int]:
+		with db, db.cursor() as curs:
+			curs.execute('''
+				select count(*), coalesce(sum(ffcr.storedSize), 0),
+					coalesce(sum(octet_length(ffcr.delta)), 0)
+				from FFNFicContentRevision ffcr
+				where %(fid)s is null or ffcr.fid = %(fid)s
+			''', { 'fid': fid })
+			r = curs.fetchone()
+			if r is None:
+				return (0, 0, 0)
+			return (int(r[0]), int(r[1]), int(r[2]))
@@ -0,0 +1,53 @@
+from typing import TYPE_CHECKING, Iterable, List, Tuple
+if TYPE_CHECKING:
+	import psycopg2
+from minerva.ffn.content import FFNFicContent
+
+# buffers extracted chapters and writes them to a content table with
+# FFNFicContent.upsertMany, a batch at a time, instead of one upsert (and
+# returned row) per chapter. skipped counts chapters that were already stored
+# as they are. with blobs, bodies go in FFNContentBlob and are left there when
+# their chapters are rewritten, until FFNFicContent.dropUnusedBlobs. with
+# history, updated chapters keep their old content as revisions (as ones
+# that already have revisions do anyway). committing is left to the caller
+class FFNContentWriter:
+	def __init__(self, db: 'psycopg2.connection', stripe: int = None,
+			batchSize: int = 1000, blobs: bool = False, history: bool = False
+			) -> None:
+		self.db = db
+		self.stripe = stripe
+		self.batchSize = batchSize
+		self.blobs = blobs
+		self.history = history
+		self.contents: List[Tuple[int, int, int, str]] = []
+		self.inserted = 0
+		self.updated = 0
+		self.skipped = 0
+
+	def add(self, fid: int, cid: int, wid: int, content: str) -> None:
+		self.contents += [(fid, cid, wid, content)]
+		if len(self.contents) >= self.batchSize:
+			self.flush()
+
+	def addMany(self, contents: Iterable[Tuple[int, int, int, str]]) -> None:
+		for fid, cid, wid, content in contents:
+			self.add(fid, cid, wid, content)
+
+	def flush(self) -> int:
+		if len(self.contents) == 0:
+			return 0
+		inserted, updated, skipped = FFNFicContent.upsertMany(self.db,
+				self.contents, self.stripe, self.blobs, self.history)
+		self.inserted += inserted
+		self.updated += updated
+		self.skipped += skipped
+		self.contents = []
+		return inserted + updated
+
+	def __enter__(self) -> 'FFNContentWriter':
+		return self
+
+	def __exit__(self, exc_type: object, exc_value: object, traceback: object
+			) -> None:
+		if exc_type is None:
+			self.flush()
@@ -0,0 +1,134 @@
+from typing import Dict, List, Optional, Tuple
+import re
+from minerva.ffn.story_page import spanContents, textOf
+
+messageSpanRe = re.compile(
+		r'''<span\s[^>]*class=['"]?(?:[^'">]*\s)?(gui_warning|gui_normal)[\s'">]''')
+
+# how to tell a dead page from a live one for one kind of page: any healthy
+# marker means alive, otherwise a gui_warning span that is exactly one of the
+# messages or a gui_normal span containing one gives its code
+class FFNDeathRules:
+	def __init__(self, healthyId: str, codes: List[Tuple[str, int]],
+			emptyCode: int = None, defaultCode: int = -1) -> None:
+		self.healthyId = healthyId
+		self.codes = codes
+		self.emptyCode = emptyCode
+		self.defaultCode = defaultCode
+		self.healthyRe = re.compile(
+				r'''\sid=['"]?''' + re.escape(healthyId) + r'''['"\s>]''')
+		self.warningCodes: Dict[str, int] = {}
+		for msg, code in codes:
+			self.warningCodes.setdefault(msg, code)
+		self.normalRe = re.compile('|'.join(re.escape(m) for m, _ in codes)) \
+				if len(codes) > 0 else None
+
+	def normalCode(self, text: str) -> Optional[int]:
+		# first matching rule in table order, like a scan over self.codes
+		if self.normalRe is None or self.normalRe.search(text) is None:
+			return None
+		for msg, code in self.codes:
+			if text.find(msg) >= 0:
+				return code
+		return None
+
+ficDeathRules = FFNDeathRules('profile_top', [
+		# probably deleted by user
+		('Story Not FoundUnable to locate story. Code 1.', 1),
+		# probably deleted by admin
+		('Story Not FoundUnable to locate story. Code 2.', 2),
+		# unknown
+		('Story Not FoundStory is unavailable for reading. (A)', 3),
+		# unknown
+		('Story Not FoundStory is unavailable for reading. (B)', 4),
+		# category disabled
+		('Category for this story has been disabled.', 5),
+		# no chapters
+		('Story does not have any chapters.', 6),
+		# Chapter not found.
+	])
+
+userDeathRules = FFNDeathRules('content_wrapper', [
+		# probably never created
+		('User does not exist or is no longer an active member.', 0),
+		# probably deleted
+		('User is no longer an active member.', 1),
+	])
+
+# communities are only known to die by serving an empty page
+communityDeathRules = FFNDeathRules('content_wrapper', [],
+		emptyCode = 1, defaultCode = 0)
+
+def classifyDeathCodeSoup(html: str, rules: FFNDeathRules) -> int:
+	if len(html) < 1 and rules.emptyCode is not None:
+		return rules.emptyCode
+
+	from bs4 import BeautifulSoup # type: ignore
+	soup = BeautifulSoup(html, 'html5lib')
+	if soup.find(id=rules.healthyId) is not None:
+		return 0
+
+	gui_warnings = soup.find_all('span', { 'class': 'gui_warning' })
+	for gui_warning in gui_warnings:
+		for dc in rules.codes:
+			if gui_warning.get_text() == dc[0]:
+				return dc[1]
+
+	gui_normal = soup.find_all('span', { 'class': 'gui_normal' })
+	for msg in gui_normal:
+		for dc in rules.codes:
+			if msg.get_text().find(dc[0]) >= 0:
+				return dc[1]
+
+	return rules.defaultCode
+
+def classifyDeathCodeRaw(html: str, rules: FFNDeathRules) -> int:
+	if len(html) < 1 and rules.emptyCode is not None:
+		return rules.emptyCode
+	if rules.healthyRe.search(html) is not None:
+		return 0
+
+	warnings: List[str] = []
+	normals: List[str] = []
+	for m in messageSpanRe.finditer(html):
+		contents = spanContents(html, m.start())
+		if contents is None:
+			# where html5lib closes an unclosed span depends on what's around it,
+			# so leave these rare pages to it
+			return classifyDeathCodeSoup(html, rules)
+		if m.group(1) == 'gui_warning':
+			warnings += [textOf(contents)]
+		else:
+			normals += [textOf(contents)]
+
+	for text in warnings:
+		code = rules.warningCodes.get(text)
+		if code is not None:
+			return code
+	for text in normals:
+		ncode = rules.normalCode(text)
+		if ncode is not None:
+			return ncode
+
+	return rules.defaultCode
+
+# classify a page straight from the raw html; with verify the html5lib
+# classification is computed as well and any disagreement raises
+def classifyDeathCode(html: str, rules: FFNDeathRules, verify: bool = False
+		) -> int:
+	code = classifyDeathCodeRaw(html, rules)
+	if verify:
+		soupCode = classifyDeathCodeSoup(html, rules)
+		if soupCode != code:
+			raise Exception(
+					f'death code mismatch: raw {code} != soup {soupCode}')
+	return code
+
+def extractFFNDeathCode(html: str, verify: bool = False) -> int:
+	return classifyDeathCode(html, ficDeathRules, verify)
+
+def extractFFNUserDeathCode(html: str, verify: bool = False) -> int:
+	return classifyDeathCode(html, userDeathRules, verify)
+
+def extractFFNCommunityDeathCode(html: str, verify: bool = False) -> int:
+	return classifyDeathCode(html, communityDeathRules, verify)
@@ -39,6 +39,12 @@ class FFNFandom:
 			r = curs.fetchone()
 			return int(r[0]) if r is not None else -1
 
+	@staticmethod
+	def getAll(db: 'psycopg2.connection') -> List['FFNFandom']:
+		with db, db.cursor() as curs:
+			curs.execute('select * from FFNFandom order by id asc')
+			return [FFNFandom.fromRow(r) for r in curs.fetchall()]
+
 	@staticmethod
 	def lookupRemoteId(db: 'psycopg2.connection', remoteId: int
 			) -> Optional['FFNFandom']:
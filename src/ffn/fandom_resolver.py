@@ -0,0 +1,140 @@
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+if TYPE_CHECKING:
+	import psycopg2
+import oil.util as util
+from minerva.ffn.category import FFNCategory
+from minerva.ffn.fandom import FFNFandom
+from minerva.ffn.fic import FFNFic
+
+# resolves pre_story_links to fandom ids from an in-memory copy of the
+# category and fandom tables; unknown fandoms are queued and written back in
+# one batch by flush, unknown crossover remote ids go to FFNFicCrossoverDelayed
+class FFNFandomResolver:
+	def __init__(self, db: 'psycopg2.connection') -> None:
+		self.db = db
+		self.categories: Dict[str, FFNCategory] = {}
+		self.fandoms: Dict[Tuple[int, str], FFNFandom] = {}
+		self.remoteIds: Dict[int, FFNFandom] = {}
+		# category stub => name, (category stub, fandom stub) => name
+		self.missingCategories: Dict[str, Optional[str]] = {}
+		self.missingFandoms: Dict[Tuple[str, str], Optional[str]] = {}
+		# fid => (stub, name, remoteId1, remoteId2)
+		self.delayedCrossovers: Dict[int, Tuple[str, str, int, int]] = {}
+		self.load()
+
+	def load(self) -> None:
+		for category in FFNCategory.getAll(self.db):
+			assert(category.stub is not None)
+			self.categories[category.stub] = category
+		for fandom in FFNFandom.getAll(self.db):
+			self.addFandom(fandom)
+
+	def addFandom(self, fandom: FFNFandom) -> None:
+		assert(fandom.categoryId is not None and fandom.stub is not None)
+		self.fandoms[(fandom.categoryId, fandom.stub)] = fandom
+		if fandom.remoteId is not None:
+			self.remoteIds.setdefault(fandom.remoteId, fandom)
+
+	def lookup(self, catStub: str, stub: str) -> Optional[FFNFandom]:
+		category = self.categories.get(catStub)
+		if category is None or category.id is None:
+			return None
+		return self.fandoms.get((category.id, stub))
+
+	# fill in fic.fandomId1/fandomId2 from fic.preStoryLinks; returns False if
+	# a fandom was missing and has been queued, in which case resolving again
+	# after flush will succeed
+	def resolve(self, fic: FFNFic) -> bool:
+		if fic.preStoryLinks is None:
+			return True
+		resolved = True
+		for href, text in fic.preStoryLinks:
+			hrefParts = href.split('/')
+
+			# if it's a top level category
+			if len(hrefParts) == 3 \
+					and len(hrefParts[0]) == 0 and len(hrefParts[2]) == 0:
+				if hrefParts[1] not in self.categories:
+					self.missingCategories[hrefParts[1]] = text
+				continue
+
+			# if it's a crossover /Fandom1_and_Fandm2_Crossovers/f1id/f2id/
+			if len(hrefParts) == 5 and hrefParts[1].endswith("_Crossovers") \
+					and len(hrefParts[0]) == 0 and len(hrefParts[4]) == 0:
+				self.resolveCrossover(fic, hrefParts[1], text,
+						int(hrefParts[2]), int(hrefParts[3]))
+				continue
+
+			# if it's a regular fandom in some category
+			if len(hrefParts) == 4 \
+					and len(hrefParts[0]) == 0 and len(hrefParts[3]) == 0:
+				fandom = self.lookup(hrefParts[1], hrefParts[2])
+				if fandom is None:
+					self.missingFandoms[(hrefParts[1], hrefParts[2])] = text
+					resolved = False
+					continue
+				fic.fandomId1 = fandom.id
+				continue
+
+			util.logMessage('unknown fandom {0}: {1}'.format(fic.id, href))
+		return resolved
+
+	def resolveCrossover(self, fic: FFNFic, stub: str, name: str,
+			remoteId1: int, remoteId2: int) -> None:
+		assert(fic.id is not None)
+		f1 = self.remoteIds.get(remoteId1)
+		f2 = self.remoteIds.get(remoteId2)
+		if f1 is None or f2 is None:
+			self.delayedCrossovers[fic.id] = (stub, name, remoteId1, remoteId2)
+			return
+		fic.fandomId1 = f1.id
+		fic.fandomId2 = f2.id
+
+	def flush(self) -> int:
+		written = 0
+		if len(self.missingFandoms) > 0:
+			written += self.flushFandoms()
+		if len(self.delayedCrossovers) > 0:
+			from psycopg2.extras import execute_values
+			with self.db, self.db.cursor() as curs:
+				execute_values(curs, '''
+				insert into FFNFicCrossoverDelayed(fid, stub, name, fandomId1, fandomId2)
+				values %s
+				on conflict(fid) do update set stub = excluded.stub,
+					name = excluded.name, fandomId1 = excluded.fandomId1,
+					fandomId2 = excluded.fandomId2
+				''', [(fid, s, n, r1, r2)
+					for fid, (s, n, r1, r2) in self.delayedCrossovers.items()])
+			self.delayedCrossovers = {}
+		return written
+
+	def flushFandoms(self) -> int:
+		# categories are few and rarely new, look them up one at a time
+		for catStub, _ in self.missingFandoms:
+			if catStub not in self.categories:
+				self.categories[catStub] = FFNCategory.lookup(self.db, catStub,
+						self.missingCategories.get(catStub))
+		self.missingCategories = {}
+
+		rows: List[Tuple[int, str, Optional[str]]] = []
+		for (catStub, stub), name in self.missingFandoms.items():
+			categoryId = self.categories[catStub].id
+			assert(categoryId is not None)
+			rows += [(categoryId, stub, name)]
+
+		from psycopg2.extras import execute_values
+		with self.db, self.db.cursor() as curs:
+			execute_values(curs, '''
+			insert into FFNFandom(categoryId, stub, name) values %s
+			on conflict(categoryId, stub) do update set name = excluded.name
+				where excluded.name is not null and FFNFandom.name is null
+			''', rows)
+			fetched = execute_values(curs, '''
+			select ff.* from FFNFandom ff
+			join (values %s) v(categoryId, stub)
+				on ff.categoryId = v.categoryId and ff.stub = v.stub
+			''', [(c, s) for c, s, _ in rows], fetch=True)
+		for row in fetched:
+			self.addFandom(FFNFandom.fromRow(row))
+		self.missingFandoms = {}
+		return len(fetched)
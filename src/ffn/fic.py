@@ -1,48 +1,7 @@
-from typing import TYPE_CHECKING, Any, Optional, List
+from typing import TYPE_CHECKING, Any, Optional, List, Dict, Tuple
 if TYPE_CHECKING:
 	import psycopg2
 
-def extractFFNDeathCode(html: str) -> int:
-	if html.find('<div id=profile_top') >= 0:
-		return 0
-	deletedCodes = [
-			# probably deleted by user
-			('Story Not FoundUnable to locate story. Code 1.', 1),
-			# probably deleted by admin
-			('Story Not FoundUnable to locate story. Code 2.', 2),
-			# unknown
-			('Story Not FoundStory is unavailable for reading. (A)', 3),
-			# unknown
-			('Story Not FoundStory is unavailable for reading. (B)', 4),
-			# category disabled
-			('Category for this story has been disabled.', 5),
-			# no chapters
-			('Story does not have any chapters.', 6),
-		]
-	# Chapter not found.
-
-	from bs4 import BeautifulSoup # type: ignore
-	soup = BeautifulSoup(html, 'html5lib')
-	profile_top = soup.find(id='profile_top')
-	if profile_top is not None:
-		return 0
-
-	# story might've been deleted
-	gui_warnings = soup.find_all('span', { 'class': 'gui_warning' })
-	for gui_warning in gui_warnings:
-		for dc in deletedCodes:
-			if gui_warning.get_text() == dc[0]:
-				return dc[1]
-
-	# might be in the abbreviated page message box
-	gui_normal = soup.find_all('span', { 'class': 'gui_normal' })
-	for msg in gui_normal:
-		for dc in deletedCodes:
-			if msg.get_text().find(dc[0]) >= 0:
-				return dc[1]
-
-	return -1 # retry later
-
 class FFNFic:
 	def __init__(self, id_: int = None, authorId_: int = None,
 			fetched_: int = None, title_: str = None, ageRating_: str = None,
@@ -50,7 +9,10 @@ class FFNFic:
 			reviewCount_: int = None, favoriteCount_: int = None,
 			followCount_: int = None, updated_: int = None, published_: int = None,
 			status_: str = None, description_: str = None,
-			fandomId1_: int = None, fandomId2_: int = None):
+			fandomId1_: int = None, fandomId2_: int = None,
+			genreIds_: List[int] = None,
+			characters_: List[Tuple[str, int]] = None,
+			preStoryLinks_: List[Tuple[str, str]] = None):
 		self.id = id_
 		self.authorId = authorId_
 		self.fetched = fetched_
@@ -67,6 +29,11 @@ class FFNFic:
 		self.description = description_
 		self.fandomId1 = fandomId1_
 		self.fandomId2 = fandomId2_
+		# parsed from the meta span, None if unknown; see upsertTags
+		self.genreIds = genreIds_
+		self.characters = characters_
+		# (href, text) category/fandom links; see FFNFandomResolver
+		self.preStoryLinks = preStoryLinks_
 
 	@staticmethod
 	def maxChapterCount(db: 'psycopg2.connection') -> int:
@@ -110,6 +77,9 @@ class FFNFic:
 			row = curs.fetchone()
 			return FFNFic.fromRow(row) if row is not None else None
 
+	# a fic parsed without fandoms (fandomId1 null, from a crossover listing or
+	# an unresolved pre_story_links) keeps the ones it has; otherwise both are
+	# replaced, so a fic that stops being a crossover loses its fandomId2
 	def upsert(self, db: 'psycopg2.connection') -> bool:
 		with db, db.cursor() as curs:
 			curs.execute('''
@@ -127,7 +97,9 @@ class FFNFic:
 					followCount = excluded.followCount,
 					updated = excluded.updated, published = excluded.published,
 					status = excluded.status, description = excluded.description,
-					fandomId1 = excluded.fandomId1, fandomId2 = excluded.fandomId2
+					fandomId1 = coalesce(excluded.fandomId1, FFNFic.fandomId1),
+					fandomId2 = case when excluded.fandomId1 is null
+						then FFNFic.fandomId2 else excluded.fandomId2 end
 				where FFNFic.fetched <= excluded.fetched
 			returning fetched
 			''', (self.id, self.authorId, self.fetched, self.title, self.ageRating,
@@ -136,6 +108,8 @@ class FFNFic:
 				self.description, self.fandomId1, self.fandomId2,))
 			r = curs.fetchone()
 			z = False if r is None else int(r[0]) == self.fetched
+			if z:
+				FFNFic.upsertTags(curs, [self])
 
 			if self.description is not None:
 				curs.execute('''
@@ -145,6 +119,91 @@ class FFNFic:
 				''', (self.description, self.id))
 			return z
 
+	@staticmethod
+	def upsertMany(db: 'psycopg2.connection', fics: List['FFNFic']) -> int:
+		# a statement may only touch each row once, so keep the newest per id
+		latest: Dict[int, FFNFic] = {}
+		for f in fics:
+			assert(f.id is not None and f.fetched is not None)
+			e = latest.get(f.id)
+			if e is None or (e.fetched is not None and e.fetched <= f.fetched):
+				latest[f.id] = f
+		if len(latest) == 0:
+			return 0
+
+		from psycopg2.extras import execute_values
+		with db, db.cursor() as curs:
+			rows = execute_values(curs, '''
+			insert into FFNFic(
+				id, authorId, fetched, title, ageRating, chapterCount, wordCount,
+				reviewCount, favoriteCount, followCount, updated, published,
+				status, description, fandomId1, fandomId2)
+			values %s
+			on conflict(id)
+				do update set id = excluded.id, authorId = excluded.authorId,
+					fetched = excluded.fetched, title = excluded.title,
+					ageRating = excluded.ageRating, chapterCount = excluded.chapterCount,
+					wordCount = excluded.wordCount, reviewCount = excluded.reviewCount,
+					favoriteCount = excluded.favoriteCount,
+					followCount = excluded.followCount,
+					updated = excluded.updated, published = excluded.published,
+					status = excluded.status, description = excluded.description,
+					fandomId1 = coalesce(excluded.fandomId1, FFNFic.fandomId1),
+					fandomId2 = case when excluded.fandomId1 is null
+						then FFNFic.fandomId2 else excluded.fandomId2 end
+				where FFNFic.fetched <= excluded.fetched
+			returning id
+			''', [(f.id, f.authorId, f.fetched, f.title, f.ageRating,
+				f.chapterCount, f.wordCount, f.reviewCount, f.favoriteCount,
+				f.followCount, f.updated, f.published, f.status, f.description,
+				f.fandomId1, f.fandomId2) for f in latest.values()], fetch=True)
+			FFNFic.upsertTags(curs, [latest[int(r[0])] for r in rows])
+
+			descriptions = [(f.id, f.description) for f in latest.values()
+					if f.description is not None]
+			if len(descriptions) > 0:
+				execute_values(curs, '''
+				update FFNFic
+				set description = v.description
+				from (values %s) v(id, description)
+				where FFNFic.id = v.id and FFNFic.description is null
+				''', descriptions)
+			return len(rows)
+
+	# replace the genre and character rows of freshly written fics; characters
+	# are matched by name within the fic's fandoms
+	@staticmethod
+	def upsertTags(curs: 'psycopg2.cursor', fics: List['FFNFic']) -> None:
+		from psycopg2.extras import execute_values
+		genreFics = [f.id for f in fics if f.genreIds is not None]
+		if len(genreFics) > 0:
+			curs.execute('delete from FFNFicGenre where fid = any(%s)', (genreFics,))
+			genres = [(f.id, g) for f in fics if f.genreIds is not None
+					for g in f.genreIds]
+			if len(genres) > 0:
+				execute_values(curs, '''
+				insert into FFNFicGenre(fid, genreId) values %s
+				on conflict do nothing
+				''', genres)
+
+		charFics = [f.id for f in fics if f.characters is not None]
+		if len(charFics) > 0:
+			curs.execute('delete from FFNFicCharacter where fid = any(%s)',
+					(charFics,))
+			chars = [(f.id, n, p) for f in fics if f.characters is not None
+					for n, p in f.characters]
+			if len(chars) > 0:
+				execute_values(curs, '''
+				insert into FFNFicCharacter(fid, characterId, pairing)
+				select v.fid, c.id, max(v.pairing)
+				from (values %s) v(fid, name, pairing)
+				join FFNFic f on f.id = v.fid
+				join FFNCharacter c on c.name = v.name
+					and c.fandomId in (f.fandomId1, f.fandomId2)
+				group by v.fid, c.id
+				on conflict do nothing
+				''', chars)
+
 	@staticmethod
 	def isDead(db: 'psycopg2.connection', fid: int) -> int:
 		with db, db.cursor() as curs:
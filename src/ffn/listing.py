@@ -0,0 +1,82 @@
+from typing import Dict, List, Optional
+import re
+import html
+from minerva.ffn.user import FFNUser
+from minerva.ffn.story_page import authorRe, textOf
+
+zListRe = re.compile(r'''<div class=['"]?z-list[\s'"][^>]*>''')
+dataAttrRe = re.compile(r'''data-([a-z]+)=(?:"([^"]*)"|'([^']*)'|([^'" >]+))''')
+stitleRe = re.compile(
+		r'''<a\s+class=['"]?stitle['"]?[^>]*>(?:<img[^>]*>)?(.*?)</a>''', re.DOTALL)
+zPadtopRe = re.compile(r'''<div class=['"]?z-indent z-padtop['"]?>(.*?)<div''',
+		re.DOTALL)
+zMetaRe = re.compile(r'''<div class=['"]?z-padtop2 xgray['"]?>(.*?)</div>''',
+		re.DOTALL)
+
+# one story entry on a fandom, community, or author listing page; the data-*
+# attributes on the z-list div already carry most of the metadata
+class FFNListingEntry:
+	def __init__(self, id_: int, attrs_: Dict[str, str] = None,
+			title_: str = None, author_: FFNUser = None,
+			description_: str = None, metaSpan_: str = None) -> None:
+		self.id = id_
+		self.attrs: Dict[str, str] = {} if attrs_ is None else attrs_
+		self.title = title_
+		self.author = author_
+		self.description = description_
+		self.metaSpan = metaSpan_
+
+	def intAttr(self, name: str) -> Optional[int]:
+		v = self.attrs.get(name)
+		if v is None or not v.isnumeric():
+			return None
+		return int(v)
+
+	@staticmethod
+	def fromHtml(entryHtml: str, author: FFNUser = None
+			) -> Optional['FFNListingEntry']:
+		tag = zListRe.match(entryHtml)
+		if tag is None:
+			return None
+		attrs: Dict[str, str] = {}
+		for m in dataAttrRe.finditer(tag.group(0)):
+			v = m.group(2) if m.group(2) is not None \
+					else m.group(3) if m.group(3) is not None else m.group(4)
+			attrs[m.group(1)] = html.unescape(v)
+		sid = attrs.get('storyid')
+		if sid is None or not sid.isnumeric():
+			return None
+
+		# author listing pages omit the link for the page's own stories
+		am = authorRe.search(entryHtml)
+		if am is not None:
+			author = FFNUser(id_ = int(am.group(2)), name_ = textOf(am.group(3)))
+		if author is None:
+			return None
+
+		title = attrs.get('title')
+		if title is None:
+			sm = stitleRe.search(entryHtml)
+			title = None if sm is None else textOf(sm.group(1)).strip()
+
+		description = None
+		dm = zPadtopRe.search(entryHtml)
+		if dm is not None and len(dm.group(1).strip()) > 0:
+			description = textOf(dm.group(1)).strip()
+		mm = zMetaRe.search(entryHtml)
+		return FFNListingEntry(int(sid), attrs, title, author, description,
+				None if mm is None else mm.group(1))
+
+	# split a whole listing page into entries in a single pass; entries that
+	# don't look like stories are skipped
+	@staticmethod
+	def parseListing(pageHtml: str, author: FFNUser = None
+			) -> List['FFNListingEntry']:
+		starts = [m.start() for m in zListRe.finditer(pageHtml)]
+		entries: List[FFNListingEntry] = []
+		for i, s in enumerate(starts):
+			e = starts[i + 1] if i + 1 < len(starts) else len(pageHtml)
+			entry = FFNListingEntry.fromHtml(pageHtml[s:e], author)
+			if entry is not None:
+				entries += [entry]
+		return entries
@@ -0,0 +1,173 @@
+from typing import Dict, List, Optional, Tuple
+import re
+import html
+from minerva.status import Status
+
+# the meta span is a ' - ' separated list of fields, some keyed and some not:
+#   story page:
+#     Rated: <a>Fiction T</a> - English - Romance/Drama - Harry P., Hermione G.
+#     - Chapters: 2 - Words: 1,234 - Reviews: <a>5</a> - Favs: 6 - Follows: 7
+#     - Updated: <span data-xutime='..'>..</span>
+#     - Published: <span data-xutime='..'>..</span> - Status: Complete - id: 123
+#   z-list entry:
+#     [Crossover - A & B - | Fandom - ]Rated: T - English - Romance/Drama
+#     - Chapters: 2 - Words: 1,234 - Reviews: 5 - Favs: 6 - Follows: 7
+#     - Updated: <span data-xutime=..>..</span>
+#     - Published: <span data-xutime=..>..</span> - Harry P., Hermione G.
+#     - Complete
+splitRe = re.compile(r'\s+-\s+')
+keyRe = re.compile(
+		r'^(Rated|Chapters|Words|Reviews|Favs|Follows|Updated|Published|Status|id):\s*',
+	)
+tagRe = re.compile(r'<[^>]*>')
+xutimeRe = re.compile(r'''data-xutime=['"]?(\d+)''')
+
+characterRe = re.compile(r'\[([^\]]*)\]|([^,\[\]]+)')
+
+countKeys = {
+		'Chapters': 'chapters',
+		'Words': 'words',
+		'Reviews': 'reviews',
+		'Favs': 'favorites',
+		'Follows': 'follows',
+	}
+
+# FFN's own genre ids, as used by the genreid filters (see ffnmeta.py)
+genreIds = {"General": 1, "Romance": 2, "Humor": 3, "Drama": 4, "Poetry": 5,
+		"Adventure": 6, "Mystery": 7, "Horror": 8, "Parody": 9, "Angst": 10,
+		"Supernatural": 11, "Suspense": 12, "Sci-Fi": 13, "Fantasy": 14,
+		"Spiritual": 15, "Tragedy": 16, "Western": 17, "Crime": 18, "Family": 19,
+		"Hurt/Comfort": 20, "Friendship": 21}
+
+# every valid genre field, single or paired; Hurt/Comfort has its own slash
+# so the field can't simply be split
+genreLookup: Dict[str, Tuple[int, ...]] = {}
+for g1, i1 in genreIds.items():
+	genreLookup[g1] = (i1,)
+	for g2, i2 in genreIds.items():
+		genreLookup[f'{g1}/{g2}'] = (i1, i2)
+
+# split a characters field into (name, pairing) where pairing is 0 for loose
+# characters and n for members of the nth [A, B] pairing:
+#   [Harry P., Draco M.] Hermione G. => Harry P./1, Draco M./1, Hermione G./0
+def splitCharacters(text: str) -> List[Tuple[str, int]]:
+	res: List[Tuple[str, int]] = []
+	pairing = 0
+	for m in characterRe.finditer(text):
+		if m.group(1) is None:
+			name = m.group(2).strip()
+			if len(name) > 0:
+				res += [(name, 0)]
+			continue
+		pairing += 1
+		for name in m.group(1).split(','):
+			name = name.strip()
+			if len(name) > 0:
+				res += [(name, pairing)]
+	return res
+
+ratings = ['K', 'K+', 'T', 'M']
+genres = set(genreIds.keys())
+
+class FFNMetaSpan:
+
+	def __init__(self) -> None:
+		self.prefix: List[str] = [] # z-list only: category or crossover fandoms
+		self.rated: Optional[str] = None
+		self.language: Optional[str] = None
+		self.genres: Optional[str] = None
+		self.characters: Optional[str] = None
+		self.genreIds: List[int] = []
+		self.characterList: List[Tuple[str, int]] = []
+		self.chapters: Optional[int] = None
+		self.words: Optional[int] = None
+		self.reviews: Optional[int] = None
+		self.favorites: Optional[int] = None
+		self.follows: Optional[int] = None
+		self.updated: Optional[int] = None # xutime
+		self.published: Optional[int] = None # xutime
+		self.updatedText: Optional[str] = None
+		self.publishedText: Optional[str] = None
+		self.status: Status = Status.ongoing
+		self.id: Optional[int] = None
+
+	@staticmethod
+	def parse(metaSpan: str) -> 'FFNMetaSpan':
+		res = FFNMetaSpan()
+		unkeyed: List[str] = []
+		seenRated = False
+		seenKeyed = False
+
+		for part in splitRe.split(metaSpan.strip()):
+			m = keyRe.match(part)
+			if m is None:
+				text = html.unescape(tagRe.sub('', part)).strip()
+				if not seenRated:
+					res.prefix.append(text)
+				elif not seenKeyed:
+					unkeyed.append(text)
+				elif text == 'Complete':
+					res.status = Status.complete
+				elif len(text) > 0:
+					res.characters = text
+				continue
+
+			key = m.group(1)
+			raw = part[m.end():]
+			val = html.unescape(tagRe.sub('', raw)).strip()
+			if key == 'Rated':
+				seenRated = True
+				if val.startswith('Fiction'):
+					val = val[len('Fiction'):].strip()
+				if val not in ratings:
+					raise Exception(f'error: unknown rating {val} in {metaSpan}')
+				res.rated = val
+				continue
+
+			seenKeyed = True
+			if key in countKeys:
+				setattr(res, countKeys[key], int(val.replace(',', '')))
+			elif key == 'Updated' or key == 'Published':
+				xm = xutimeRe.search(raw)
+				xutime = None if xm is None else int(xm.group(1))
+				if key == 'Updated':
+					res.updated, res.updatedText = xutime, val
+				else:
+					res.published, res.publishedText = xutime, val
+			elif key == 'Status':
+				if val != 'Complete':
+					raise Exception(f'unknown status: {val}')
+				res.status = Status.complete
+			elif key == 'id':
+				res.id = int(val)
+
+		if res.rated is None:
+			raise Exception(f'error: cannot find rated in {metaSpan}')
+		if res.words is None:
+			raise Exception(f'error: cannot find words in {metaSpan}')
+		if res.publishedText is None:
+			raise Exception(f'error: cannot find published in {metaSpan}')
+
+		if len(unkeyed) > 0:
+			res.language = unkeyed[0]
+		rest = [u for u in unkeyed[1:] if len(u) > 0]
+		if len(rest) > 1:
+			res.genres = rest[0]
+			res.characters = ' - '.join(rest[1:])
+		elif len(rest) == 1:
+			if FFNMetaSpan.isGenres(rest[0]):
+				res.genres = rest[0]
+			else:
+				res.characters = rest[0]
+
+		if res.genres is not None and res.genres in genreLookup:
+			res.genreIds = list(genreLookup[res.genres])
+		if res.characters is not None:
+			res.characterList = splitCharacters(res.characters)
+
+		return res
+
+	@staticmethod
+	def isGenres(text: str) -> bool:
+		# we have either an option genre(/genre) OR an optional chars
+		return text in genreLookup
@@ -1,42 +1,6 @@
-from typing import TYPE_CHECKING, List, Dict, Tuple, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Tuple, Iterable, Any, Optional
 if TYPE_CHECKING:
 	import psycopg2
-import re
-
-# used to extract values from text given regex and types
-class RegexMatcher:
-	def __init__(self, text: str, patterns: Dict[str, Tuple[str, type]]) -> None:
-		self.text = text
-		self.patterns = patterns
-
-	def matchAll(self, target: Any) -> None:
-		for which in self.patterns:
-			self.match(which, target)
-
-	def match(self, which: str, target: Any) -> None:
-		val = self.get(which)
-		if val is None:
-			return
-		ttype = self.patterns[which][1]
-		if ttype == int:
-			int_val = int(val.replace(',', ''))
-			target.__setattr__(which.rstrip('?'), int_val)
-		elif ttype == str:
-			target.__setattr__(which.rstrip('?'), val)
-		elif ttype != str:
-			raise Exception('unknown type: {}'.format(ttype.__name__))
-
-	def get(self, which: str) -> Optional[str]:
-		match = re.search(self.patterns[which][0], self.text)
-		if match is not None:
-			return match.group(1)
-
-		if which.endswith('?'):
-			return None
-		else:
-			raise Exception('error: cannot find {} ({}) in {}'.format(
-				which, self.patterns[which], self.text))
-
 
 import time
 ficCache: Dict[int, 'Fic'] = {}
@@ -61,6 +25,9 @@ class Fic:
 		self.author: Optional[str] = None
 		self.authorId: Optional[int] = None
 		self.writeStatus: Optional[Status] = None
+		self.genreIds: Optional[List[int]] = None
+		self.characters: Optional[List[Tuple[str, int]]] = None
+		self.preStoryLinks: Optional[List[Tuple[str, str]]] = None
 
 	@staticmethod
 	def new() -> 'Fic':
@@ -80,12 +47,16 @@ class Fic:
 
 
 
+import traceback
 import oil.util as util
 from minerva.status import Status
 from minerva.ffn.user import FFNUser
-from minerva.ffn.category import FFNCategory
-from minerva.ffn.fandom import FFNFandom
+from minerva.ffn.fandom_resolver import FFNFandomResolver
 from minerva.ffn.fic import FFNFic
+from minerva.ffn.listing import FFNListingEntry
+import minerva.ffn.meta as ffnMeta
+from minerva.ffn.meta import FFNMetaSpan
+from minerva.ffn.story_page import FFNStoryPage
 
 class FFNParser:
 	languages = ["Afrikaans", "Bahasa Indonesia", "Bahasa Melayu", "Català",
@@ -96,40 +67,46 @@ class FFNParser:
 			"Türkçe", "Íslenska", "čeština", "Ελληνικά", "България", "Русский",
 			"Українська", "српски", "עברית", "العربية", "فارسی", "देवनागरी", "हिंदी",
 			"ภาษาไทย", "中文", "日本語", "한국어"]
-	ratings = ['K', 'K+', 'T', 'M']
-	genres = {"Adventure", "Angst", "Crime", "Drama", "Family", "Fantasy",
-			"Friendship", "General", "Horror", "Humor", "Hurt/Comfort", "Mystery",
-			"Parody", "Poetry", "Romance", "Sci-Fi", "Spiritual", "Supernatural",
-			"Suspense", "Tragedy", "Western"}
+	ratings = ffnMeta.ratings
+	genres = ffnMeta.genres
 
 	def __init__(self) -> None:
 		self.ftype = 1
 		self.baseUrl = 'https://www.fanfiction.net'
+		self.fandomResolver: Optional[FFNFandomResolver] = None
 
 	def get(self, db: 'psycopg2.connection', localId: int, ts: int, soup: Any
 			) -> Fic:
 		fic = Fic.select(localId)
 		return self.create(db, fic, ts, soup)
 
+	def getFromHtml(self, db: 'psycopg2.connection', localId: int, ts: int,
+			html: str) -> Fic:
+		fic = Fic.select(localId)
+		return self.createFromStoryPage(db, fic, ts, self.extractStoryPage(html))
+
+	def extractStoryPage(self, html: str) -> FFNStoryPage:
+		page = FFNStoryPage.fromHtml(html)
+		if page is None:
+			# fall back to a full parse if the fast path can't find everything
+			from bs4 import BeautifulSoup # type: ignore
+			page = FFNStoryPage.fromSoup(BeautifulSoup(html, 'html5lib'))
+		return page
+
 	def extractStoryAuthor(self, soup: Any) -> FFNUser:
-		profile_top = soup.find(id='profile_top')
-		if profile_top is None:
-			raise Exception('unable to find author')
-		for a in profile_top.find_all('a'):
-			a_href = a.get('href')
-			if a_href.startswith('/u/'):
-				author = a.get_text()
-				authorId = a_href.split('/')[2]
-				return FFNUser(id_ = int(authorId), name_ = author)
-		raise Exception('unable to find author')
+		return FFNStoryPage.extractAuthor(soup)
 
 	def create(self, db: 'psycopg2.connection', fic: Fic, ts: int, soup: Any
 			) -> Fic:
-		author = self.extractStoryAuthor(soup)
-		fic.author = author.name
-		fic.authorId = author.id
+		return self.createFromStoryPage(db, fic, ts, FFNStoryPage.fromSoup(soup))
+
+	def createFromStoryPage(self, db: 'psycopg2.connection', fic: Fic, ts: int,
+			page: FFNStoryPage) -> Fic:
+		assert(page.author is not None)
+		fic.author = page.author.name
+		fic.authorId = page.author.id
 
-		fic = self.parseInfoInto(db, fic, ts, soup)
+		fic = self.parseStoryPageInto(db, fic, ts, page)
 		return fic
 
 	def extractZListLocalId(self, zl: Any) -> int:
@@ -167,288 +144,122 @@ class FFNParser:
 		fic = self.parseZListInfoInto(db, fic, ts, zlSoup)
 		return fic
 
-	def handleFandom(self, db: 'psycopg2.connection', fic: Fic, cat: FFNCategory,
-			stub: str, name: str) -> None:
-		assert(cat.id is not None)
-		fandom = FFNFandom.lookup(db, cat.id, stub, name)
-		if fandom is None:
-			raise Exception(f"unable to find fandom {stub}:{name} in {cat.stub}")
-		fic.fandomId1 = fandom.id
-
-	def handleCrossoverFandom(self, fic: Fic, fandom: str, fIds: List[int],
-			href: str, text: str) -> None:
-		pass
-
 	def parseInfoInto(self, db: 'psycopg2.connection', fic: Fic, ts: int,
 			soup: Any) -> Fic:
-		FFNUser(id_=fic.authorId, name_=fic.author, fetched_=ts*1000).upsert(db)
+		return self.parseStoryPageInto(db, fic, ts, FFNStoryPage.fromSoup(soup))
 
-		profile_top = soup.find(id='profile_top')
-		if profile_top is None:
-			raise Exception('unable to find author')
+	def parseStoryPageInto(self, db: 'psycopg2.connection', fic: Fic, ts: int,
+			page: FFNStoryPage) -> Fic:
+		FFNUser(id_=fic.authorId, name_=fic.author, fetched_=ts*1000).upsert(db)
 
-		text = profile_top.getText()
-		pt_str = str(profile_top)
+		fic = self.parseStoryPage(fic, ts, page)
 
-		fic.fetched = int(ts)
-
-		# default optional fields
-		fic.reviews = 0
-		fic.favorites = 0
-		fic.follows = 0
+		fb = self.toFFNFic(fic)
+		resolver = self.getFandomResolver(db)
+		if not resolver.resolve(fb):
+			resolver.flush()
+			resolver.resolve(fb)
+		fic.fandomId1, fic.fandomId2 = fb.fandomId1, fb.fandomId2
+		fb.upsert(db)
+		resolver.flush()
+		return fic
 
-		titleFound = False
-		for b in profile_top.find_all('b'):
-			b_class = b.get('class')
-			if len(b_class) == 1 and b_class[0] == 'xcontrast_txt':
-				fic.title = b.getText().strip()
-				titleFound = True
-				break
-		if titleFound == False:
-			raise Exception('error: unable to find title:\n{}\n'.format(pt_str))
+	def getFandomResolver(self, db: 'psycopg2.connection'
+			) -> FFNFandomResolver:
+		if self.fandomResolver is None or self.fandomResolver.db is not db:
+			self.fandomResolver = FFNFandomResolver(db)
+		return self.fandomResolver
 
-		descriptionFound = False
-		for div in profile_top.find_all('div'):
-			div_class = div.get('class')
-			if div.get('style') == 'margin-top:2px' \
-					and len(div_class) == 1 and div_class[0] == 'xcontrast_txt':
-				fic.description = div.getText().strip()
-				descriptionFound = True
-				break
-		if descriptionFound == False:
-			raise Exception('error: unable to find description:\n{}\n'.format(pt_str))
-
-		# category/fandom is in pre_story_links
-		preStoryLinks = soup.find(id='pre_story_links')
-		preStoryLinksLinks = [] if preStoryLinks is None else preStoryLinks.find_all('a')
-		preStoryLinksLinks = []
-		fcat = None # fic category
-		for a in preStoryLinksLinks:
-			text = a.getText().strip()
-			href = a.get('href')
-			hrefParts = href.split('/')
-
-			# if it's a top level category
-			if len(hrefParts) == 3 \
-					and len(hrefParts[0]) == 0 and len(hrefParts[2]) == 0:
-				cat = hrefParts[1]
-				fcat = FFNCategory.lookup(cat, text)
-				if fcat is None:
-					raise Exception('unknown category: {}:{}'.format(cat, text))
-				continue # skip categories
-
-			# if it's a crossover /Fandom1_and_Fandm2_Crossovers/f1id/f2id/
-			if len(hrefParts) == 5 and hrefParts[1].endswith("_Crossovers") \
-					and len(hrefParts[0]) == 0 and len(hrefParts[4]) == 0:
-				fIds = [int(hrefParts[2]), int(hrefParts[3])]
-				self.handleCrossoverFandom(fic, hrefParts[1], fIds, href, text)
-				continue
-
-			# if it's a regular fandom in some category
-			if len(hrefParts) == 4 \
-					and len(hrefParts[0]) == 0 and len(hrefParts[3]) == 0:
-				if fcat is None:
-					raise Exception('unknown category: {}'.format(hrefParts[1]))
-
-				self.handleFandom(db, fic, fcat, hrefParts[2], text)
-				continue
-
-			util.logMessage('unknown fandom {0}: {1}'.format(fic.lid, href))
-
-		metaSpan = profile_top.find('span', { 'class': 'xgray' })
-		if metaSpan is None:
-			raise Exception('unable to find meta span')
-
-		self.parseFicMetaSpan(metaSpan.decode_contents())
-
-		text = metaSpan.getText()
-
-		matcher = RegexMatcher(text, {
-			'ageRating': ('Rated:\s+(?:Fiction)?\s*(K|K\+|T|M)\s', str),
-			'chapterCount?': ('Chapters:\s+(\d+)', int),
-			'wordCount': ('Words:\s+(\S+)', int),
-			'reviews?': ('Reviews:\s+(\S+)', int),
-			'favorites?': ('Favs:\s+(\S+)', int),
-			'follows?': ('Follows:\s+(\S+)', int),
-			'updated?': ('Updated:\s+(\S+)', str),
-			'published': ('Published:\s+([^-]+)', str),
-		})
-		matcher.matchAll(fic)
-		assert(fic.published is not None)
-
-		if fic.published is not None:
-			fic.published = util.parseDateAsUnix(fic.published, fic.fetched)
+	def parseStoryPage(self, fic: Fic, ts: int, page: FFNStoryPage) -> Fic:
+		fic.fetched = int(ts)
+		fic.title = page.title
+		fic.description = page.description
+		fic.preStoryLinks = page.preStoryLinks
+
+		assert(page.metaSpan is not None)
+		meta = FFNMetaSpan.parse(page.metaSpan)
+		if meta.published is None:
+			raise Exception('error: cannot find published xutime in {}'.format(
+				page.metaSpan))
+		self.applyMeta(fic, meta)
+		return fic
 
-		if fic.updated is None:
-			fic.updated = fic.published # default
-		elif fic.updated is not None:
-			fic.updated = util.parseDateAsUnix(fic.updated, fic.fetched)
-		assert(fic.updated is not None)
-
-		matcher = RegexMatcher(str(metaSpan), {
-			'updated' + ('?' if text.find('Updated:') < 0 else ''): ("Updated: <span data-xutime=['\"](\d+)['\"]>", int),
-			'published': ("Published: <span data-xutime=['\"](\d+)['\"]>", int),
-		})
-		matcher.matchAll(fic)
-
-		if fic.chapterCount is None:
-			fic.chapterCount = 1 # default
-
-		match = re.search('(Rated|Chapters|Words|Updated|Published):.*Status:\s+(\S+)', text)
-		if match is None:
-			fic.writeStatus = Status.ongoing
-		else:
-			status = match.group(2)
-			if status == 'Complete':
-				fic.writeStatus = Status.complete
-			else:
-				raise Exception('unknown status: {}'.format(status))
-
-		assert(fic.authorId is not None)
-		ffnFic = FFNFic(fic.lid, fic.authorId, ts * 1000,
+	def toFFNFic(self, fic: Fic) -> FFNFic:
+		assert(fic.authorId is not None and fic.fetched is not None)
+		assert(fic.updated is not None and fic.published is not None)
+		assert(fic.writeStatus is not None)
+		return FFNFic(fic.lid, fic.authorId, fic.fetched * 1000,
 				fic.title, fic.ageRating, fic.chapterCount, fic.wordCount,
 				fic.reviews, fic.favorites, fic.follows, fic.updated * 1000,
 				fic.published * 1000, fic.writeStatus.name,
-				fic.description, fic.fandomId1, fic.fandomId2)
-
-		fb = ffnFic.upsert(db)
-		return fic
-
-	def parseFicMetaSpan(self, metaSpan: str) -> Dict[str, str]:
-		res = self._parseFicMetaSpan(metaSpan)
-
-		# reconstruct
-		fields = [
-				('rated', 'Rated: <>Fiction ZZZ</>'),
-				('language', 'ZZZ'),
-				('genres', 'ZZZ'),
-				('characters', 'ZZZ'),
-				('chapters', 'Chapters: ZZZ'),
-				('words', 'Words: ZZZ'),
-				('reviews', 'Reviews: <>ZZZ</>'),
-				('favorites', 'Favs: ZZZ'),
-				('follows', 'Follows: ZZZ'),
-				('updated', 'Updated: <span data-xutime="ZZZ">TODO</span>'),
-				('published', 'Published: <span data-xutime="ZZZ">TODO</span>'),
-				('status', 'Status: ZZZ'),
-				('id', 'id: ZZZ'),
-			]
-		rmeta = ' - '.join([
-			f[1].replace('ZZZ', res[f[0]]) for f in fields if f[0] in res])
-
-		# reparse
-		res2 = self._parseFicMetaSpan(rmeta)
-
-		# compare
-		assert(res == res2)
+				fic.description, fic.fandomId1, fic.fandomId2,
+				fic.genreIds, fic.characters, fic.preStoryLinks)
 
+	def parseHtml(self, localId: int, ts: int, html: str
+			) -> Tuple[FFNFic, FFNUser]:
+		page = self.extractStoryPage(html)
+		assert(page.author is not None)
+		fic = Fic.select(localId)
+		fic.author = page.author.name
+		fic.authorId = page.author.id
+		fic = self.parseStoryPage(fic, ts, page)
+		return (self.toFFNFic(fic),
+				FFNUser(id_=fic.authorId, name_=fic.author, fetched_=ts*1000))
+
+	# parse (fid, ts, html) story pages without touching the database; if
+	# errors is given, broken pages are recorded there and skipped
+	def parseMany(self, pages: Iterable[Tuple[int, int, str]],
+			errors: List[Tuple[int, str]] = None) -> List[Tuple[FFNFic, FFNUser]]:
+		res: List[Tuple[FFNFic, FFNUser]] = []
+		for fid, ts, html in pages:
+			try:
+				res += [self.parseHtml(fid, ts, html)]
+			except SystemExit as e:
+				raise
+			except:
+				if errors is None:
+					raise
+				errors += [(fid, traceback.format_exc())]
 		return res
 
-	def _parseFicMetaSpan(self, metaSpan: str) -> Dict[str, str]:
-		print(metaSpan)
-		#   Rated: (ageRating)
-		#   language
-		#   optional genre(/genre)
-		#   optional chars
-		#   optional Chapters: (chapterCount)
-		#   Words: (commaWords)
-		#   optional Reviews: (commaReviews)
-		#   optional Favs: (commaFavs)
-		#   optional Follows: (commaFollows)
-		#   optional Updated: (texty date)
-		#   Published: (texty date)
-		#   optional Status: Complete
-		#   id: (fid)
-
-		res: Dict[str, str] = {}
-
-		text = metaSpan.strip()
-		res = {}
-
-		keys = [
-				('rated', "Rated:\s+<[^>]*>Fiction\s*(K|K\+|T|M)<[^>]*>"),
-			]
-
-		for n, kre in keys:
-			optional = n.endswith('?')
-			n = n.rstrip('?')
-			kre = f'^{kre}($| - )'
-			#print(n, kre)
-
-			match = re.search(kre, text)
-			if match is not None:
-				res[n] = match.group(1)
-				text = text[len(match.group(0)):].strip()
-			elif not optional:
-				raise Exception(f'error: cannot find {n} in {text}')
-
-		tend = text.find(' - ')
-		language, text = text[:tend], text[tend + len(' - '):]
-		res['language'] = language
-
-		rkeys = [
-				('id', "id:\s+(\d+)"),
-				('status?', "Status:\s+(\S+)"),
-				('published', "Published:\s+<span data-xutime=['\"](\d+)['\"]>(\S+)</span>"),
-				('updated?', "Updated:\s+<span data-xutime=['\"](\d+)['\"]>(\S+)</span>"),
-				('follows?', "Follows:\s+(\S+)"),
-				('favorites?', "Favs:\s+(\S+)"),
-				('reviews?', "Reviews:\s+<[^>]*>(\S+)<[^>]*>"),
-				('words', "Words:\s+(\S+)"),
-				('chapters?', "Chapters:\s+(\S+)"),
-			]
-
-		for n, kre in rkeys:
-			optional = n.endswith('?')
-			n = n.rstrip('?')
-			kre = f'(^| - ){kre}$'
-			#print(n, kre)
-
-			match = re.search(kre, text)
-			if match is not None:
-				res[n] = match.group(2)
-				text = text[:-len(match.group(0))].strip()
-			elif not optional:
-				raise Exception(f'error: cannot find {n} in {text}')
-
-		if text.find(' - ') >= 0:
-			tend = text.find(' - ')
-			genres, chars = text[:tend], text[tend + len(' - '):]
-			res['genres'] = genres.strip()
-			res['characters'] = chars.strip()
-			text = ''
-		elif len(text) > 0 and text in FFNParser.genres:
-			res['genres'] = text
-			text = ''
-		elif len(text) > 0:
-			# we have either an option genre(/genre) OR an optional chars
-			for g1 in FFNParser.genres:
-				if len(text) < 1:
-					break
-				for g2 in FFNParser.genres:
-					if text == f'{g1}/{g2}':
-						res['genres'] = text
-						text = ''
-						break
-
-		if len(text) > 0:
-			res['characters'] = text
+	def applyMeta(self, fic: Fic, meta: FFNMetaSpan) -> None:
+		assert(fic.fetched is not None)
+		fic.ageRating = meta.rated
+		fic.chapterCount = 1 if meta.chapters is None else meta.chapters
+		fic.wordCount = meta.words
+		fic.reviews = 0 if meta.reviews is None else meta.reviews
+		fic.favorites = 0 if meta.favorites is None else meta.favorites
+		fic.follows = 0 if meta.follows is None else meta.follows
+
+		# prefer the exact xutime, fall back to the displayed date
+		fic.published = meta.published
+		if fic.published is None:
+			assert(meta.publishedText is not None)
+			fic.published = util.parseDateAsUnix(meta.publishedText, fic.fetched)
+
+		fic.updated = meta.updated
+		if fic.updated is None and meta.updatedText is not None:
+			fic.updated = util.parseDateAsUnix(meta.updatedText, fic.fetched)
+		if fic.updated is None:
+			fic.updated = fic.published # default
 
-		return res
+		fic.writeStatus = meta.status
+		fic.genreIds = meta.genreIds
+		fic.characters = meta.characterList
 
 	def parseZListInfoInto(self, db: 'psycopg2.connection', fic: Fic, ts: int,
 			zlSoup: Any) -> Fic:
 		FFNUser(id_=fic.authorId, name_=fic.author, fetched_=ts*1000).upsert(db)
-		text = zlSoup.find('div', {'class': 'xgray'}).getText()
+		fic = self.parseZList(fic, ts, zlSoup)
+		fb = self.toFFNFic(fic).upsert(db)
+		return fic
+
+	def parseZList(self, fic: Fic, ts: int, zlSoup: Any) -> Fic:
+		metaSpan = zlSoup.find('div', {'class': 'xgray'}).decode_contents()
 		pt_str = str(zlSoup)
 
 		fic.fetched = int(ts)
 
-		# default optional fields
-		fic.reviews = 0
-		fic.favorites = 0
-		fic.follows = 0
-
 		titleFound = False
 		for a in zlSoup.find_all('a', { 'class': 'stitle' }):
 			fic.title = a.getText().strip()
@@ -501,35 +312,7 @@ class FFNParser:
 		#   optional chars
 		# d optional Complete
 
-		matcher = RegexMatcher(text, {
-			'ageRating': ('Rated:\s+(?:Fiction)?\s*(\S+)', str),
-			'chapterCount?': ('Chapters:\s+(\d+)', int),
-			'wordCount': ('Words:\s+(\S+)', int),
-			'reviews?': ('Reviews:\s+(\S+)', int),
-			'favorites?': ('Favs:\s+(\S+)', int),
-			'follows?': ('Follows:\s+(\S+)', int),
-			'updated?': ('Updated:\s+(\S+)', str),
-			'published': ('Published:\s+([^-]+)', str),
-		})
-		matcher.matchAll(fic)
-		assert(fic.published is not None)
-
-		if fic.published is not None:
-			fic.published = util.parseDateAsUnix(fic.published, fic.fetched)
-
-		if fic.updated is None:
-			fic.updated = fic.published # default
-		elif fic.updated is not None:
-			fic.updated = util.parseDateAsUnix(fic.updated, fic.fetched)
-		assert(fic.updated is not None)
-
-		if fic.chapterCount is None:
-			fic.chapterCount = 1 # default
-
-		if text.endswith(' - Complete'):
-			fic.writeStatus = Status.complete
-		else:
-			fic.writeStatus = Status.ongoing
+		self.applyMeta(fic, FFNMetaSpan.parse(metaSpan))
 
 		zl = zlSoup.find('div', { 'class': 'z-list' })
 		fan = None if zl is None else zl.get('data-category')
@@ -537,13 +320,61 @@ class FFNParser:
 			pass # self.handleFandom(fic, fan)
 			# TODO: crossovers?
 
-		assert(fic.authorId is not None)
-		ffnFic = FFNFic(fic.lid, fic.authorId, ts * 1000,
-				fic.title, fic.ageRating, fic.chapterCount, fic.wordCount,
-				fic.reviews, fic.favorites, fic.follows, fic.updated * 1000,
-				fic.published * 1000, fic.writeStatus.name,
-				fic.description, fic.fandomId1, fic.fandomId2)
+		return fic
 
-		fb = ffnFic.upsert(db)
+	# every story on a fandom, community, or author listing page without
+	# touching the database; fandomId1 is only known for plain fandom listings.
+	# if errors is given, broken entries are recorded there and skipped
+	def parseListing(self, ts: int, pageHtml: str, fandomId1: int = None,
+			author: FFNUser = None, errors: List[Tuple[int, str]] = None
+			) -> List[Tuple[FFNFic, FFNUser]]:
+		res: List[Tuple[FFNFic, FFNUser]] = []
+		for entry in FFNListingEntry.parseListing(pageHtml, author):
+			try:
+				fic = self.parseListingEntry(Fic.select(entry.id), ts, entry)
+				fic.fandomId1 = fandomId1
+				res += [(self.toFFNFic(fic),
+					FFNUser(id_=fic.authorId, name_=fic.author, fetched_=ts*1000))]
+			except SystemExit as e:
+				raise
+			except:
+				if errors is None:
+					raise
+				errors += [(entry.id, traceback.format_exc())]
+		return res
+
+	def parseListingEntry(self, fic: Fic, ts: int, entry: FFNListingEntry
+			) -> Fic:
+		assert(entry.author is not None)
+		fic.fetched = int(ts)
+		fic.author = entry.author.name
+		fic.authorId = entry.author.id
+		fic.title = entry.title
+		fic.description = entry.description
+
+		# rating, favs, and follows are only in the gray text
+		if entry.metaSpan is None:
+			raise Exception(f'error: unable to find meta for {entry.id}')
+		self.applyMeta(fic, FFNMetaSpan.parse(entry.metaSpan))
+
+		# the exact values from the data-* attributes win
+		wordCount = entry.intAttr('wordcount')
+		if wordCount is not None:
+			fic.wordCount = wordCount
+		chapterCount = entry.intAttr('chaptercount')
+		if chapterCount is not None:
+			fic.chapterCount = chapterCount
+		reviews = entry.intAttr('ratingtimes')
+		if reviews is not None:
+			fic.reviews = reviews
+		published = entry.intAttr('datesubmit')
+		if published is not None:
+			fic.published = published
+		updated = entry.intAttr('dateupdate')
+		if updated is not None:
+			fic.updated = updated
+		statusId = entry.intAttr('statusid')
+		if statusId is not None:
+			fic.writeStatus = Status.complete if statusId == 2 else Status.ongoing
 		return fic
 
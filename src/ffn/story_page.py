@@ -0,0 +1,150 @@
+from typing import Any, List, Optional, Tuple
+import re
+import html
+from minerva.ffn.user import FFNUser
+
+tagRe = re.compile(r'<[^>]*>')
+titleRe = re.compile(r'''<b class=['"]?xcontrast_txt['"]?>(.*?)</b>''', re.DOTALL)
+authorRe = re.compile(
+		r'''<a [^>]*href=['"]?(/u/(\d+)[^'" >]*)['"]?[^>]*>(.*?)</a>''', re.DOTALL)
+descriptionRe = re.compile(
+		r'''<div style=['"]?margin-top:2px['"]? class=['"]?xcontrast_txt['"]?>(.*?)</div>''',
+		re.DOTALL)
+metaSpanRe = re.compile(r'''<span class=['"]?xgray xcontrast_txt['"]?>''')
+linkRe = re.compile(
+		r'''<a [^>]*href=(?:'([^']*)'|"([^"]*)"|([^'" >]+))[^>]*>(.*?)</a>''',
+		re.DOTALL)
+spanRe = re.compile(r'<(/?)span[\s>]', re.IGNORECASE)
+
+def textOf(fragment: str) -> str:
+	return html.unescape(tagRe.sub('', fragment))
+
+# the contents of the span starting at start, accounting for nested spans
+def spanContents(text: str, start: int) -> Optional[str]:
+	depth = 0
+	for m in spanRe.finditer(text, start):
+		if m.group(1) == '':
+			depth += 1
+			continue
+		depth -= 1
+		if depth == 0:
+			return text[text.find('>', start) + 1:m.start()]
+	return None
+
+# the parts of a story page FFNParser reads; either sliced straight out of
+# the raw html or pulled from a full html5lib soup
+class FFNStoryPage:
+	def __init__(self, author_: FFNUser = None, title_: str = None,
+			description_: str = None, metaSpan_: str = None,
+			preStoryLinks_: List[Tuple[str, str]] = None) -> None:
+		self.author = author_
+		self.title = title_
+		self.description = description_
+		self.metaSpan = metaSpan_
+		self.preStoryLinks: List[Tuple[str, str]] = \
+				[] if preStoryLinks_ is None else preStoryLinks_
+
+	@staticmethod
+	def fromHtml(htmlText: str) -> Optional['FFNStoryPage']:
+		# locate the regions the same way dump_minerva_profile_top_fs does
+		realStartIdx = htmlText.find('id=pre_story_links')
+		if realStartIdx < 0:
+			return None
+		realStartIdx = htmlText.rfind('<div', 0, realStartIdx)
+		if realStartIdx < 0:
+			return None
+		startIdx = htmlText.find('<div id=profile_top', realStartIdx)
+		if startIdx < 0:
+			return None
+		endIdx = htmlText.find("class='lc-wrapper'", startIdx)
+		if endIdx < 0:
+			endIdx = htmlText.find("id='storytextp'", startIdx)
+		if endIdx < 0:
+			return None
+
+		links = htmlText[realStartIdx:startIdx]
+		profileTop = htmlText[startIdx:endIdx]
+
+		title = titleRe.search(profileTop)
+		author = authorRe.search(profileTop)
+		description = descriptionRe.search(profileTop)
+		metaSpan = metaSpanRe.search(profileTop)
+		if title is None or author is None or description is None \
+				or metaSpan is None:
+			return None
+		if description.group(1).find('<div') >= 0:
+			return None # nested markup; let html5lib sort it out
+		metaSpanContents = spanContents(profileTop, metaSpan.start())
+		if metaSpanContents is None:
+			return None
+
+		preStoryLinks: List[Tuple[str, str]] = []
+		for m in linkRe.finditer(links):
+			href = m.group(1) or m.group(2) or m.group(3) or ''
+			preStoryLinks += [(html.unescape(href), textOf(m.group(4)).strip())]
+
+		return FFNStoryPage(
+				author_ = FFNUser(id_ = int(author.group(2)),
+					name_ = textOf(author.group(3))),
+				title_ = textOf(title.group(1)).strip(),
+				description_ = textOf(description.group(1)).strip(),
+				metaSpan_ = metaSpanContents,
+				preStoryLinks_ = preStoryLinks,
+			)
+
+	@staticmethod
+	def extractAuthor(soup: Any) -> FFNUser:
+		profile_top = soup.find(id='profile_top')
+		if profile_top is None:
+			raise Exception('unable to find author')
+		for a in profile_top.find_all('a'):
+			a_href = a.get('href')
+			if a_href.startswith('/u/'):
+				author = a.get_text()
+				authorId = a_href.split('/')[2]
+				return FFNUser(id_ = int(authorId), name_ = author)
+		raise Exception('unable to find author')
+
+	@staticmethod
+	def fromSoup(soup: Any) -> 'FFNStoryPage':
+		page = FFNStoryPage(author_ = FFNStoryPage.extractAuthor(soup))
+
+		profile_top = soup.find(id='profile_top')
+		if profile_top is None:
+			raise Exception('unable to find author')
+
+		pt_str = str(profile_top)
+
+		titleFound = False
+		for b in profile_top.find_all('b'):
+			b_class = b.get('class')
+			if len(b_class) == 1 and b_class[0] == 'xcontrast_txt':
+				page.title = b.getText().strip()
+				titleFound = True
+				break
+		if titleFound == False:
+			raise Exception('error: unable to find title:\n{}\n'.format(pt_str))
+
+		descriptionFound = False
+		for div in profile_top.find_all('div'):
+			div_class = div.get('class')
+			if div.get('style') == 'margin-top:2px' \
+					and len(div_class) == 1 and div_class[0] == 'xcontrast_txt':
+				page.description = div.getText().strip()
+				descriptionFound = True
+				break
+		if descriptionFound == False:
+			raise Exception('error: unable to find description:\n{}\n'.format(pt_str))
+
+		# category/fandom is in pre_story_links
+		preStoryLinks = soup.find(id='pre_story_links')
+		if preStoryLinks is not None:
+			page.preStoryLinks = [(a.get('href'), a.getText().strip())
+					for a in preStoryLinks.find_all('a')]
+
+		metaSpan = profile_top.find('span', { 'class': 'xgray' })
+		if metaSpan is None:
+			raise Exception('unable to find meta span')
+		page.metaSpan = metaSpan.decode_contents()
+
+		return page
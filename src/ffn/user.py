@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING, Optional, Any
+from typing import TYPE_CHECKING, Optional, Any, Dict, List
 if TYPE_CHECKING:
 	import psycopg2
 
@@ -49,6 +49,29 @@ class FFNUser:
 			r = curs.fetchone()
 			return False if r is None else int(r[0]) == self.fetched
 
+	@staticmethod
+	def upsertMany(db: 'psycopg2.connection', users: List['FFNUser']) -> int:
+		# a statement may only touch each row once, so keep the newest per id
+		latest: Dict[int, FFNUser] = {}
+		for u in users:
+			assert(u.id is not None and u.fetched is not None)
+			e = latest.get(u.id)
+			if e is None or (e.fetched is not None and e.fetched < u.fetched):
+				latest[u.id] = u
+		if len(latest) == 0:
+			return 0
+
+		from psycopg2.extras import execute_values
+		with db, db.cursor() as curs:
+			rows = execute_values(curs, '''
+			insert into FFNUser(id, name, fetched) values %s
+			on conflict(id)
+				do update set name = excluded.name, fetched = excluded.fetched
+				where FFNUser.fetched < excluded.fetched
+			returning id
+			''', [(u.id, u.name, u.fetched) for u in latest.values()], fetch=True)
+			return len(rows)
+
 	@staticmethod
 	def isDead(db: 'psycopg2.connection', uid: int) -> int:
 		with db, db.cursor() as curs:
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 # just try to parse all ffn meta and see what breaks
 import sys
-from bs4 import BeautifulSoup # type: ignore
 import minerva
 from minerva import extractFFNDeathCode, FFNFic
 from weaver import Web, RemoteWebScraper
@@ -16,9 +15,9 @@ def plog(msg: str, fname: str = "./test_parse.log") -> None:
 		f.write(msg + '\n')
 		print(msg)
 
-def testLid(db: 'psycopg2.connection', lid: int) -> None:
+def testLid(db: 'psycopg2.connection', scraper: RemoteWebScraper, lid: int
+		) -> None:
 	url = f'https://www.fanfiction.net/s/{lid}/1'
-	scraper = RemoteWebScraper(db)
 	w = scraper.softScrape(url)
 	assert(w.created is not None)
 
@@ -32,15 +31,15 @@ def testLid(db: 'psycopg2.connection', lid: int) -> None:
 		plog(f"  {url} is freshly dead: {code}")
 		return
 
-	soup = BeautifulSoup(html, 'html5lib')
-	parser = minerva.ffn.parser.FFNParser()
-	fic = parser.get(db, lid, w.created // 1000, soup)
+	fic = parser.getFromHtml(db, lid, w.created // 1000, html)
 	print(fic.__dict__)
 
+parser = minerva.ffn.parser.FFNParser()
 qlids = [11575324, 13865144]
 with oil.open() as db:
+	scraper = RemoteWebScraper(db)
 	for lid in qlids:
-		testLid(db, lid)
+		testLid(db, scraper, lid)
 
 	start = 0
 	start = 286387
@@ -50,6 +49,6 @@ with oil.open() as db:
 		ei = start + 10000
 		for fid in FFNFic.getLiveFids(db, start, ei, 1):
 			print(fid)
-			testLid(db, fid)
+			testLid(db, scraper, fid)
 		start = ei
 